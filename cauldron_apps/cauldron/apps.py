@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class CauldronConfig(AppConfig):
     name = 'cauldron_apps.cauldron'
+
+    def ready(self):
+        from .tracker import track_projects
+        # Keep the analysis counters of each project updated
+        track_projects()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from ...tracker import count_projects, reconcile_projects
+
+
+class Command(BaseCommand):
+    help = 'Fix the analysis counters of the projects out of sync with their intentions. ' \
+           'Run it periodically, e.g. from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Recompute the counters of every project')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            count_projects()
+            self.stdout.write('Counters of all the projects recomputed')
+        else:
+            fixed = reconcile_projects()
+            self.stdout.write(f'{fixed} projects recomputed')
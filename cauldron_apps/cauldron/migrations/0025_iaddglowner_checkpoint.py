@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cauldron', '0024_project_sbom'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iaddglowner',
+            name='checkpoint',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+    ]
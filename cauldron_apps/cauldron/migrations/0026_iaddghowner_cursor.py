@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cauldron', '0025_iaddglowner_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iaddghowner',
+            name='cursor',
+            field=models.CharField(blank=True, default=None, max_length=200, null=True),
+        ),
+    ]
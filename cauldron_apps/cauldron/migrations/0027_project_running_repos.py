@@ -0,0 +1,35 @@
+# Generated by Django 3.2.15 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+from cauldron_apps.cauldron.tracker import count_projects
+
+
+def count(apps, schema_editor):
+    count_projects(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cauldron', '0026_iaddghowner_cursor'),
+        ('poolsched_git', '0006_autorefresh_interval'),
+        ('poolsched_github', '0011_autorefresh_interval'),
+        ('poolsched_gitlab', '0013_autorefresh_interval'),
+        ('poolsched_meetup', '0006_autorefresh_interval'),
+        ('poolsched_stackexchange', '0005_autorefresh_interval'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='pending_owners',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='running_repos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,8 @@
 from .project import Project
 from .project import ProjectRole
 from .repository import Repository, GitRepository, GitHubRepository, \
-                        GitLabRepository, MeetupRepository, StackExchangeRepository
+                        GitLabRepository, MeetupRepository, StackExchangeRepository, \
+                        refresh_repositories
 from .results import RepositoryMetrics
 from .ighowner import IAddGHOwner, IAddGHOwnerArchived
 from .iglowner import IAddGLOwner, IAddGLOwnerArchived
@@ -9,12 +9,8 @@ from cauldron_apps.cauldron.models import Project, GitHubRepository, GitReposito
 from cauldron_apps.poolsched_github.models import GHToken, GHInstance
 from cauldron_apps.poolsched_git.api import analyze_git_repo_obj
 from cauldron_apps.poolsched_github.api import analyze_gh_repo_obj
-
-try:
-    from github import Github, RateLimitExceededException
-except ImportError:
-    # Github only used when running the intention
-    pass
+from cauldron_apps.poolsched_github.graphql import owner_repositories, RateLimitExceeded
+from cauldron_apps.poolsched_utils.tokens import record_rate
 
 logger = logging.getLogger(__name__)
 global_logger = logging.getLogger()
@@ -66,6 +62,8 @@ class IAddGHOwner(Intention):
     forks = models.BooleanField(default=False)
     # Start analysis after retrieving the list
     analyze = models.BooleanField(default=True)
+    # Cursor of the last page of repositories processed, to resume the listing
+    cursor = models.CharField(max_length=200, null=True, default=None, blank=True)
 
     @property
     def process_name(self):
@@ -145,41 +143,55 @@ class IAddGHOwner(Intention):
             return job
         return None
 
+    def _add_repository(self, repo_gh):
+        """Add a repository from the GitHub listing to the project"""
+        if repo_gh['fork'] and not self.forks:
+            return
+        name = f'GitHub {self.owner}/{repo_gh["name"]}'
+        result, _ = RepositoryMetrics.objects.get_or_create(name=name)
+        if self.issues:
+            logger.info(f"Adding GitHub {self.owner}/{repo_gh['name']} to project {self.project.id}")
+            repo, created = GitHubRepository.objects.get_or_create(owner=self.owner,
+                                                                   repo=repo_gh['name'],
+                                                                   defaults={'metrics': result})
+            if not repo.repo_sched:
+                repo.link_sched_repo()
+            repo.projects.add(self.project)
+            if self.analyze:
+                logger.info(f"Create intention for {repo}")
+                analyze_gh_repo_obj(self.project.creator, repo.repo_sched)
+        if self.commits:
+            logger.info(f"Adding Git {repo_gh['clone_url']} to project {self.project.id}")
+            repo, created = GitRepository.objects.get_or_create(url=repo_gh['clone_url'],
+                                                                defaults={'metrics': result})
+            if not repo.repo_sched:
+                repo.link_sched_repo()
+            repo.projects.add(self.project)
+            if self.analyze:
+                logger.info(f"Create intention for {repo}")
+                analyze_git_repo_obj(self.project.creator, repo.repo_sched)
+
     def _run_owner(self, token):
-        github = Github(token)
+        """Add the repositories of the owner to the project.
+
+        The listing starts after the cursor stored in the intention, which
+        is updated after every page, so a run stopped by the rate limit
+        continues from the last page processed.
+        Return the seconds to wait for the rate limit reset, or None if finished.
+        """
+        if self.cursor:
+            logger.info(f"Resume listing of {self.owner} repositories")
         try:
-            repositories = github.get_user(self.owner).get_repos()
-            for repo_gh in repositories:
-                name = f'GitHub {self.owner}/{repo_gh.name}'
-                result, _ = RepositoryMetrics.objects.get_or_create(name=name)
-                if repo_gh.fork and not self.forks:
-                    continue
-                if self.issues:
-                    logger.info(f"Adding GitHub {self.owner}/{repo_gh.name} to project {self.project.id}")
-                    repo, created = GitHubRepository.objects.get_or_create(owner=self.owner,
-                                                                           repo=repo_gh.name,
-                                                                           defaults={'metrics': result})
-                    if not repo.repo_sched:
-                        repo.link_sched_repo()
-                    repo.projects.add(self.project)
-                    if self.analyze:
-                        logger.info(f"Create intention for {repo}")
-                        analyze_gh_repo_obj(self.project.creator, repo.repo_sched)
-                if self.commits:
-                    logger.info(f"Adding Git {repo_gh.clone_url} to project {self.project.id}")
-                    repo, created = GitRepository.objects.get_or_create(url=repo_gh.clone_url,
-                                                                        defaults={'metrics': result})
-                    if not repo.repo_sched:
-                        repo.link_sched_repo()
-                    repo.projects.add(self.project)
-                    if self.analyze:
-                        logger.info(f"Create intention for {repo}")
-                        analyze_git_repo_obj(self.project.creator, repo.repo_sched)
-        except RateLimitExceededException:
-            utcnow = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0).timestamp()
-            time_to_reset = github.rate_limiting_resettime - (utcnow + 1)
-            time_to_reset = 0 if time_to_reset < 0 else time_to_reset
-            return time_to_reset
+            for repositories, cursor in owner_repositories(token, self.owner,
+                                                           endpoint=self.instance.endpoint,
+                                                           cursor=self.cursor):
+                for repo_gh in repositories:
+                    self._add_repository(repo_gh)
+                if self.pk:
+                    self.cursor = cursor
+                    self.save(update_fields=['cursor'])
+        except RateLimitExceeded as e:
+            return e.seconds_to_reset
 
     def run(self, job):
         """Run the code to fulfill this intention
@@ -202,8 +214,7 @@ class IAddGHOwner(Intention):
             time_to_reset = self._run_owner(token.token)
             self.project.update_elastic_role()
             if time_to_reset:
-                token.reset = now() + datetime.timedelta(minutes=time_to_reset)
-                token.save()
+                record_rate(token, 0, reset=now() + datetime.timedelta(seconds=time_to_reset))
                 logger.error(f"Rate Limit reached. Retry at {token.reset}")
                 return False
             return True
@@ -1,5 +1,9 @@
+import collections
+import concurrent.futures
 import datetime
 import logging
+import threading
+import time
 
 from django.db import models, transaction
 from django.utils.timezone import now
@@ -8,6 +12,7 @@ from cauldron_apps.cauldron.models import Project, GitRepository, GitLabReposito
 from cauldron_apps.poolsched_git.api import analyze_git_repo_obj
 from cauldron_apps.poolsched_gitlab.api import analyze_gl_repo_obj
 from cauldron_apps.poolsched_gitlab.models.base import GLToken, GLInstance
+from cauldron_apps.poolsched_utils.tokens import record_rate
 from poolsched.models import Intention, Job, ArchivedIntention
 
 try:
@@ -19,6 +24,61 @@ except ImportError:
 logger = logging.getLogger(__name__)
 global_logger = logging.getLogger()
 
+# Number of groups retrieved concurrently
+GL_GROUP_WORKERS = 4
+# Number of items requested per page
+GL_PAGE_SIZE = 100
+# Stop sending requests when the remaining rate limit is below this value
+GL_RATE_LIMIT_MARGIN = 10
+# Maximum time (seconds) to wait for a rate limit reset before stopping the job
+GL_MAX_RATE_LIMIT_WAIT = 120
+
+
+class RateLimitReached(Exception):
+    """Raised when the token will not be usable for a long time"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __str__(self):
+        return f"Rate limit reached, reset in {self.seconds} seconds"
+
+
+class _RateLimitThrottle:
+    """Pause the requests when a token is close to its rate limit.
+
+    GitLab includes the RateLimit-Remaining and RateLimit-Reset headers
+    in the responses. They are read with a hook of the session used by
+    the GitLab client, so all the workers share the same state.
+    """
+
+    def __init__(self, gl):
+        self.lock = threading.Lock()
+        self.remaining = None
+        self.reset = None
+        gl.session.hooks['response'].append(self._update)
+
+    def _update(self, response, *args, **kwargs):
+        remaining = response.headers.get('RateLimit-Remaining')
+        reset = response.headers.get('RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+        with self.lock:
+            self.remaining = int(remaining)
+            self.reset = int(reset)
+
+    def wait(self):
+        """Sleep until the rate limit is reset if there are no requests left"""
+        with self.lock:
+            if self.remaining is None or self.remaining > GL_RATE_LIMIT_MARGIN:
+                return
+            seconds = self.reset - time.time()
+        if seconds > GL_MAX_RATE_LIMIT_WAIT:
+            raise RateLimitReached(int(seconds))
+        if seconds > 0:
+            logger.info(f"Rate limit almost reached, waiting {int(seconds)} seconds")
+            time.sleep(seconds)
+
 
 class AddGLOwnerManager(models.Manager):
     """Model manager for instances of IAddGLOwner"""
@@ -66,6 +126,8 @@ class IAddGLOwner(Intention):
     forks = models.BooleanField(default=False)
     # Start analysis after retrieving the list
     analyze = models.BooleanField(default=True)
+    # State of the group traversal, to resume it if the job is interrupted
+    checkpoint = models.JSONField(null=True, default=None, blank=True)
 
     @property
     def process_name(self):
@@ -145,24 +207,100 @@ class IAddGLOwner(Intention):
             return job
         return None
 
-    def _get_group_repositories(self, gl, name):
-        """Recursive function to get the repositories of a group"""
-        logger.info(f"Get repositories from {name}")
-        gl_urls, git_urls = [], []
-        group = gl.groups.get(name)
-        for project in group.projects.list(as_list=False, visibility='public'):
+    def _fetch_group(self, gl, throttle, path):
+        """Get the public projects and subgroups of a single group.
+
+        This method runs in a worker thread, it must not access the database.
+
+        :param gl: GitLab client
+        :param throttle: rate limit throttle shared by all the workers
+        :param path: full path of the group
+        :returns: tuple with a list of (id, gl_url, git_url) and a list of subgroup paths
+        """
+        logger.info(f"Get repositories from {path}")
+        projects, subgroups = [], []
+        # lazy=True avoids a request, we only need the group to list its children
+        group = gl.groups.get(path, lazy=True)
+        throttle.wait()
+        for project in group.projects.list(as_list=False, visibility='public', per_page=GL_PAGE_SIZE):
+            throttle.wait()
             if hasattr(project, 'forked_from_project') and not self.forks:
                 continue
             owner = project.path_with_namespace.split('/')[0]
             repo = '%2F'.join(project.path_with_namespace.split('/')[1:])
-            gl_urls.append(f"{owner}/{repo}")
-            git_urls.append(project.http_url_to_repo)
-        for subgroup in group.subgroups.list(as_list=False, all_available=True):
+            projects.append((project.id, f"{owner}/{repo}", project.http_url_to_repo))
+        throttle.wait()
+        for subgroup in group.subgroups.list(as_list=False, all_available=True, per_page=GL_PAGE_SIZE):
+            throttle.wait()
             if subgroup.visibility != "public":
                 continue
-            sub_gl_urls, sub_git_urls = self._get_group_repositories(gl, subgroup.full_path)
-            gl_urls.extend(sub_gl_urls)
-            git_urls.extend(sub_git_urls)
+            subgroups.append(subgroup.full_path)
+        return projects, subgroups
+
+    def _save_checkpoint(self, pending, visited, projects):
+        """Store the traversal state so an interrupted run can resume"""
+        if not self.pk:
+            # Intentions created on the fly (actions) are not stored
+            return
+        self.checkpoint = {
+            'pending': list(pending),
+            'visited': list(visited),
+            'projects': [[project_id, gl_url, git_url] for project_id, (gl_url, git_url) in projects.items()]
+        }
+        self.save(update_fields=['checkpoint'])
+
+    def _get_group_repositories(self, gl, name):
+        """Get the repositories of a group and all its subgroups.
+
+        Groups are traversed breadth-first with a bounded pool of workers.
+        Projects shared across subgroups are only returned once, and the
+        state of the traversal is stored in the intention to resume it
+        if the run is interrupted.
+        """
+        throttle = _RateLimitThrottle(gl)
+        if self.checkpoint:
+            logger.info(f"Resume traversal of {name} from checkpoint")
+            pending = collections.deque(self.checkpoint['pending'])
+            visited = set(self.checkpoint['visited'])
+            projects = {project_id: (gl_url, git_url)
+                        for project_id, gl_url, git_url in self.checkpoint['projects']}
+        else:
+            pending = collections.deque([name])
+            visited = {name}
+            projects = {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=GL_GROUP_WORKERS) as executor:
+            running = {}
+            try:
+                while pending or running:
+                    while pending and len(running) < GL_GROUP_WORKERS:
+                        path = pending.popleft()
+                        running[executor.submit(self._fetch_group, gl, throttle, path)] = path
+                    done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        path = running.pop(future)
+                        try:
+                            group_projects, subgroups = future.result()
+                        except Exception:
+                            # Retry the group when the traversal is resumed
+                            pending.appendleft(path)
+                            raise
+                        for project_id, gl_url, git_url in group_projects:
+                            projects[project_id] = (gl_url, git_url)
+                        for subgroup in subgroups:
+                            if subgroup not in visited:
+                                visited.add(subgroup)
+                                pending.append(subgroup)
+                    self._save_checkpoint(list(running.values()) + list(pending), visited, projects)
+            except Exception:
+                # Don't start new groups, and keep the ones that were running for the next try
+                for future in running:
+                    future.cancel()
+                self._save_checkpoint(list(running.values()) + list(pending), visited, projects)
+                raise
+
+        gl_urls = [gl_url for gl_url, _ in projects.values()]
+        git_urls = [git_url for _, git_url in projects.values()]
         return gl_urls, git_urls
 
     def _get_user_repositories(self, gl, name):
@@ -192,7 +330,8 @@ class IAddGLOwner(Intention):
             pass
         return None
 
-    def _run_owner(self, token):
+    def owner_repositories(self, token):
+        """Find or create the repositories of the owner"""
         gl = gitlab.Gitlab(url=self.instance.endpoint, oauth_token=token)
         owner_type = self._guess_owner_type(gl)
         if owner_type == 'group':
@@ -214,19 +353,23 @@ class IAddGLOwner(Intention):
                                                                        defaults={'metrics': result})
                 if not repo.repo_sched:
                     repo.link_sched_repo()
-                repo.projects.add(self.project)
-                if self.analyze:
-                    logger.info(f"Create intention for {repo}")
-                    analyze_gl_repo_obj(self.project.creator, repo.repo_sched)
+                yield repo
             if self.commits:
                 logger.info(f"Adding Git {git_url} to project {self.project.id}")
                 repo, created = GitRepository.objects.get_or_create(url=git_url,
                                                                     defaults={'metrics': result})
                 if not repo.repo_sched:
                     repo.link_sched_repo()
-                repo.projects.add(self.project)
-                if self.analyze:
-                    logger.info(f"Create intention for {repo}")
+                yield repo
+
+    def _run_owner(self, token):
+        for repo in self.owner_repositories(token):
+            repo.projects.add(self.project)
+            if self.analyze:
+                logger.info(f"Create intention for {repo}")
+                if isinstance(repo, GitLabRepository):
+                    analyze_gl_repo_obj(self.project.creator, repo.repo_sched)
+                else:
                     analyze_git_repo_obj(self.project.creator, repo.repo_sched)
 
     def run(self, job):
@@ -254,6 +397,10 @@ class IAddGLOwner(Intention):
             self._run_owner(token.token)
             self.project.update_elastic_role()
             return True
+        except RateLimitReached as e:
+            record_rate(token, 0, reset=now() + datetime.timedelta(seconds=e.seconds))
+            logger.error(f"Rate Limit reached. Retry at {token.reset}")
+            return False
         except Exception as e:
             logger.error(f"Error running IAddGLOwner intention {str(e)}")
             raise Job.StopException
@@ -3,7 +3,7 @@ import logging
 from django.db import models, transaction
 
 from poolsched.models import Intention, Job, ArchivedIntention
-from cauldron_apps.cauldron.models import Project
+from cauldron_apps.cauldron.models import Project, refresh_repositories
 
 
 logger = logging.getLogger(__name__)
@@ -101,8 +101,9 @@ class IRefreshProject(Intention):
 
     def create_intentions(self):
         """Create intentions for the current project for the analysis"""
-        for repo in self.project.repository_set.select_subclasses():
-            repo.refresh(self.user)
+        repositories = list(self.project.repository_set.select_subclasses())
+        refreshed = refresh_repositories(self.user, repositories)
+        logger.info(f"{refreshed} of {len(repositories)} repositories refreshed")
 
     def run(self, job):
         """Run the code to fulfill this intention
@@ -5,7 +5,7 @@ import pytz
 from django.apps import apps
 from django.db import models
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import Exists, Q
 
 from .repository import GitHubRepository, GitLabRepository, MeetupRepository, GitRepository, StackExchangeRepository
 from .backends import Backends
@@ -33,6 +33,9 @@ class Project(models.Model):
                                   blank=True,
                                   null=True,
                                   default=None)
+    # Repositories being analyzed and owner intentions pending, see tracker
+    running_repos = models.PositiveIntegerField(default=0)
+    pending_owners = models.PositiveIntegerField(default=0)
 
     class Meta:
         constraints = [
@@ -96,7 +99,7 @@ class Project(models.Model):
         n_kde = GitLabRepository.objects.filter(projects=self, instance='KDE').count()
         n_meetup = MeetupRepository.objects.filter(projects=self).count()
         n_stack_exchange = StackExchangeRepository.objects.filter(projects=self).count()
-        running = self.repos_running()
+        running = self.running_repos
 
         IRefreshActions = apps.get_model('cauldron_actions.IRefreshActions')
         refresh_actions = IRefreshActions.objects.filter(project=self).exists()
@@ -141,6 +144,35 @@ class Project(models.Model):
             .count()
         return git_running + gh_running + gl_running + meetup_running + stack_running
 
+    @staticmethod
+    def pending_intentions(project):
+        """Subqueries for the intentions that analyze a project
+
+        Each one is an Exists expression, so the intentions of several
+        projects can be checked in a single query. The tracker uses them
+        to find projects with counters out of sync.
+
+        :param project: project, or OuterRef to a project
+        :returns:       list of Exists, one for each kind of intention
+        """
+        IAddGHOwner = apps.get_model('cauldron.IAddGHOwner')
+        IAddGLOwner = apps.get_model('cauldron.IAddGLOwner')
+        return [
+            Exists(GitRepository.objects.filter(projects=project)
+                   .filter(Q(repo_sched__igitraw__isnull=False) | Q(repo_sched__igitenrich__isnull=False))),
+            Exists(GitHubRepository.objects.filter(projects=project)
+                   .filter(Q(repo_sched__ighraw__isnull=False) | Q(repo_sched__ighenrich__isnull=False))),
+            Exists(GitLabRepository.objects.filter(projects=project)
+                   .filter(Q(repo_sched__iglraw__isnull=False) | Q(repo_sched__iglenrich__isnull=False))),
+            Exists(MeetupRepository.objects.filter(projects=project)
+                   .filter(Q(repo_sched__imeetupraw__isnull=False) | Q(repo_sched__imeetupenrich__isnull=False))),
+            Exists(StackExchangeRepository.objects.filter(projects=project)
+                   .filter(Q(repo_sched__istackexchangeraw__isnull=False) |
+                           Q(repo_sched__istackexchangeenrich__isnull=False))),
+            Exists(IAddGHOwner.objects.filter(project=project)),
+            Exists(IAddGLOwner.objects.filter(project=project)),
+        ]
+
     def create_es_role(self):
         if hasattr(self, 'projectrole'):
             return
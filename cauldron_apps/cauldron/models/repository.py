@@ -1,9 +1,12 @@
 import ssl
+from collections import defaultdict
+
 from django.db import models
 from django.utils.timezone import now
 from django.apps import apps
 
 from .backends import Backends
+from ..tracker import update_projects
 from cauldron_apps.poolsched_git import models as git_models
 from cauldron_apps.poolsched_git import api as git_api
 from cauldron_apps.poolsched_github import models as github_models
@@ -67,6 +70,12 @@ class Repository(models.Model):
         Return whether the repository is going to be refreshed or not"""
         raise NotImplementedError
 
+    @classmethod
+    def refresh_repositories(cls, user, repositories):
+        """Try to refresh some repositories of this class.
+        Return the number of repositories that are going to be refreshed"""
+        return sum(1 for repo in repositories if repo.refresh(user))
+
     def create_remove_action(self, project):
         """Create action of removing a repository from a project"""
         raise NotImplementedError
@@ -76,6 +85,21 @@ class Repository(models.Model):
         self.save()
 
 
+def refresh_repositories(user, repositories):
+    """Try to refresh some repositories, with a few queries for each backend.
+    Return the number of repositories that are going to be refreshed"""
+    by_class = defaultdict(list)
+    for repo in repositories:
+        by_class[type(repo)].append(repo)
+    refreshed = sum(repo_class.refresh_repositories(user, repos) for repo_class, repos in by_class.items())
+    # Intentions created in bulk do not send signals to the tracker
+    projects = Repository.projects.through.objects\
+        .filter(repository_id__in=[repo.pk for repo in repositories])\
+        .values_list('project_id', flat=True)
+    update_projects(projects)
+    return refreshed
+
+
 class GitRepository(Repository):
     url = models.CharField(max_length=255, unique=True)
     parent = models.OneToOneField(to=Repository, on_delete=models.CASCADE, parent_link=True, related_name='git')
@@ -108,7 +132,12 @@ class GitRepository(Repository):
     def refresh(self, user):
         """Try to refresh the repository.
         Return whether the repository is going to be refreshed or not"""
-        return git_api.analyze_git_repo_obj(user, self.repo_sched)
+        return git_api.refresh_git_repo_obj(user, self.repo_sched)
+
+    @classmethod
+    def refresh_repositories(cls, user, repositories):
+        repos_sched = git_models.GitRepo.objects.filter(pk__in=[repo.repo_sched_id for repo in repositories])
+        return len(git_api.refresh_git_repos(user, repos_sched))
 
     @property
     def status(self):
@@ -193,7 +222,13 @@ class GitHubRepository(Repository):
     def refresh(self, user):
         """Try to refresh the repository.
         Return whether the repository is going to be refreshed or not"""
-        return github_api.analyze_gh_repo_obj(user, self.repo_sched)
+        return github_api.refresh_gh_repo_obj(user, self.repo_sched)
+
+    @classmethod
+    def refresh_repositories(cls, user, repositories):
+        repos_sched = github_models.GHRepo.objects.select_related('instance')\
+            .filter(pk__in=[repo.repo_sched_id for repo in repositories])
+        return len(github_api.refresh_gh_repos(user, repos_sched))
 
     @property
     def status(self):
@@ -285,7 +320,13 @@ class GitLabRepository(Repository):
     def refresh(self, user):
         """Try to refresh the repository.
         Return whether the repository is going to be refreshed or not"""
-        return gitlab_api.analyze_gl_repo_obj(user, self.repo_sched)
+        return gitlab_api.refresh_gl_repo_obj(user, self.repo_sched)
+
+    @classmethod
+    def refresh_repositories(cls, user, repositories):
+        repos_sched = gitlab_models.GLRepo.objects.select_related('instance')\
+            .filter(pk__in=[repo.repo_sched_id for repo in repositories])
+        return len(gitlab_api.refresh_gl_repos(user, repos_sched))
 
     @property
     def status(self):
@@ -368,6 +409,12 @@ class MeetupRepository(Repository):
         Return whether the repository is going to be refreshed or not"""
         return meetup_api.analyze_meetup_repo_obj(user, self.repo_sched)
 
+    @classmethod
+    def refresh_repositories(cls, user, repositories):
+        repos_sched = meetup_models.MeetupRepo.objects\
+            .filter(pk__in=[repo.repo_sched_id for repo in repositories])
+        return len(meetup_api.analyze_meetup_repos(user, repos_sched))
+
     @property
     def status(self):
         """Return status of the repository"""
@@ -453,6 +500,12 @@ class StackExchangeRepository(Repository):
         Return whether the repository is going to be refreshed or not"""
         return stack_api.analyze_stack_repo_obj(user, self.repo_sched)
 
+    @classmethod
+    def refresh_repositories(cls, user, repositories):
+        repos_sched = stack_models.StackExchangeQuestionTag.objects\
+            .filter(pk__in=[repo.repo_sched_id for repo in repositories])
+        return len(stack_api.analyze_stack_repos(user, repos_sched))
+
     @property
     def status(self):
         """Return status of the repository"""
@@ -1,3 +1,238 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from cauldron_apps.poolsched_git.models import IGitRaw, IGitEnrich
+from .models import Project, GitRepository, IAddGHOwner, IAddGLOwner, refresh_repositories
+from .models.iglowner import RateLimitReached, _RateLimitThrottle
+from .tracker import project_completed, reconcile_projects
+
+User = get_user_model()
+
+
+class TestTracker(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='A')
+        self.project = Project.objects.create(name='project', creator=self.user)
+        self.repo = GitRepository.objects.create(url='https://github.com/my-org/project')
+        self.repo.projects.add(self.project)
+        self.repo.link_sched_repo()
+        self.completed = []
+        project_completed.connect(self.project_completed)
+
+    def tearDown(self):
+        project_completed.disconnect(self.project_completed)
+
+    def project_completed(self, sender, project, **kwargs):
+        self.completed.append(project.pk)
+
+    def counters(self):
+        self.project.refresh_from_db()
+        return self.project.running_repos, self.project.pending_owners
+
+    def test_intentions(self):
+        """A repository counts once while it has intentions"""
+        raw = IGitRaw.objects.create(user=self.user, repo=self.repo.repo_sched)
+        self.assertEqual(self.counters(), (1, 0))
+        enrich = IGitEnrich.objects.create(user=self.user, repo=self.repo.repo_sched)
+        self.assertEqual(self.counters(), (1, 0))
+        raw.delete()
+        self.assertEqual(self.counters(), (1, 0))
+        self.assertEqual(self.completed, [])
+        enrich.delete()
+        self.assertEqual(self.counters(), (0, 0))
+        self.assertEqual(self.completed, [self.project.pk])
+
+    def test_link_after_intentions(self):
+        """Linking a scheduler repository with intentions counts the repository"""
+        other = GitRepository.objects.create(url='https://github.com/my-org/other')
+        other.projects.add(self.project)
+        IGitRaw.objects.create(user=self.user, repo=self.repo.repo_sched)
+        other_sched = type(self.repo.repo_sched).objects.create(url=other.url)
+        IGitRaw.objects.create(user=self.user, repo=other_sched)
+        self.assertEqual(self.counters(), (1, 0))
+        other.repo_sched = other_sched
+        other.save()
+        self.assertEqual(self.counters(), (2, 0))
+        other.update_last_refresh()
+        self.assertEqual(self.counters(), (2, 0))
+
+    def test_owners(self):
+        """Owner intentions are counted until they are deleted"""
+        owner = IAddGHOwner.objects.create(user=self.user, owner='my-org', project=self.project)
+        self.assertEqual(self.counters(), (0, 1))
+        owner.delete()
+        self.assertEqual(self.counters(), (0, 0))
+        self.assertEqual(self.completed, [self.project.pk])
+
+    def test_refresh_repositories(self):
+        """Intentions created in bulk update the counters"""
+        self.assertEqual(refresh_repositories(self.user, [self.repo]), 1)
+        self.assertTrue(IGitRaw.objects.filter(repo=self.repo.repo_sched).exists())
+        self.assertEqual(self.counters(), (1, 0))
+
+    def test_projects_changed(self):
+        """Repositories with intentions added to or removed from projects update the counters"""
+        IGitRaw.objects.create(user=self.user, repo=self.repo.repo_sched)
+        other = Project.objects.create(name='other', creator=self.user)
+        idle = GitRepository.objects.create(url='https://github.com/my-org/idle')
+        other.repository_set.add(self.repo, idle)
+        other.refresh_from_db()
+        self.assertEqual(other.running_repos, 1)
+        self.repo.projects.remove(self.project)
+        self.assertEqual(self.counters(), (0, 0))
+        self.assertEqual(self.completed, [self.project.pk])
+        # Not related anymore
+        self.project.repository_set.remove(self.repo)
+        other.repository_set.remove(idle)
+        other.refresh_from_db()
+        self.assertEqual(other.running_repos, 1)
+        self.repo.projects.add(self.project)
+        self.assertEqual(self.counters(), (1, 0))
+
+    def test_reconcile(self):
+        """Projects out of sync are recomputed"""
+        IGitRaw.objects.create(user=self.user, repo=self.repo.repo_sched)
+        other = Project.objects.create(name='other', creator=self.user)
+        Project.objects.filter(pk=self.project.pk).update(running_repos=0)
+        Project.objects.filter(pk=other.pk).update(running_repos=3)
+        self.assertEqual(reconcile_projects(), 2)
+        self.assertEqual(self.counters(), (1, 0))
+        other.refresh_from_db()
+        self.assertEqual(other.running_repos, 0)
+        self.assertEqual(self.completed, [other.pk])
+        self.assertEqual(reconcile_projects(), 0)
+
+
+# Projects and subgroups of the groups of a fake GitLab instance
+GITLAB_GROUPS = {
+    'org': ([(1, 'org/a')], ['org/g1', 'org/g2', 'org/private']),
+    'org/g1': ([(2, 'org/g1/b'), (3, 'org/shared')], ['org/g1/sub']),
+    'org/g2': ([(3, 'org/shared'), (4, 'org/g2/fork')], ['org/g1/sub']),
+    'org/g1/sub': ([(5, 'org/g1/sub/c')], []),
+    'org/private': ([(6, 'org/private/d')], []),
+}
+
+
+def gitlab_project(project_id, path):
+    project = SimpleNamespace(id=project_id, path_with_namespace=path,
+                              http_url_to_repo=f'https://gitlab.com/{path}.git')
+    if path.endswith('fork'):
+        project.forked_from_project = {}
+    return project
+
+
+class FakeGitLab:
+    """GitLab client with the groups of GITLAB_GROUPS"""
+
+    def __init__(self, fail=()):
+        self.session = SimpleNamespace(hooks={'response': []})
+        self.groups = SimpleNamespace(get=self._group)
+        self.fail = set(fail)
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def _group(self, path, lazy=False):
+        with self.lock:
+            self.fetched.append(path)
+            if path in self.fail:
+                self.fail.remove(path)
+                raise RateLimitReached(300)
+        projects, subgroups = GITLAB_GROUPS[path]
+        return SimpleNamespace(
+            projects=SimpleNamespace(list=lambda **kwargs: [gitlab_project(*project) for project in projects]),
+            subgroups=SimpleNamespace(list=lambda **kwargs: [
+                SimpleNamespace(full_path=subgroup,
+                                visibility='private' if subgroup.endswith('private') else 'public')
+                for subgroup in subgroups]))
+
+
+class TestGitLabOwner(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='A')
+        self.project = Project.objects.create(name='project', creator=self.user)
+        self.intention = IAddGLOwner.objects.create(user=self.user, owner='org', project=self.project)
+
+    def test_traversal(self):
+        """Every group is fetched once, and shared projects and forks are not repeated"""
+        gl = FakeGitLab()
+        gl_urls, git_urls = self.intention._get_group_repositories(gl, 'org')
+        self.assertEqual(sorted(gl_urls), ['org/a', 'org/g1%2Fb', 'org/g1%2Fsub%2Fc', 'org/shared'])
+        self.assertEqual(len(git_urls), 4)
+        self.assertEqual(sorted(gl.fetched), ['org', 'org/g1', 'org/g1/sub', 'org/g2'])
+
+    def test_forks(self):
+        """Forks are included if requested"""
+        self.intention.forks = True
+        gl_urls, _ = self.intention._get_group_repositories(FakeGitLab(), 'org')
+        self.assertIn('org/g2%2Ffork', gl_urls)
+        self.assertEqual(len(gl_urls), len(set(gl_urls)))
+
+    def test_resume(self):
+        """An interrupted traversal is resumed from the checkpoint"""
+        with self.assertRaises(RateLimitReached):
+            self.intention._get_group_repositories(FakeGitLab(fail=['org/g2']), 'org')
+        intention = IAddGLOwner.objects.get(pk=self.intention.pk)
+        self.assertIn('org/g2', intention.checkpoint['pending'])
+        self.assertIn([1, 'org/a', 'https://gitlab.com/org/a.git'], intention.checkpoint['projects'])
+
+        gl = FakeGitLab()
+        gl_urls, _ = intention._get_group_repositories(gl, 'org')
+        self.assertEqual(sorted(gl_urls), ['org/a', 'org/g1%2Fb', 'org/g1%2Fsub%2Fc', 'org/shared'])
+        self.assertNotIn('org', gl.fetched)
+        self.assertEqual(len(gl.fetched), len(set(gl.fetched)))
+
+    def test_not_stored(self):
+        """Intentions not stored have no checkpoint"""
+        intention = IAddGLOwner(user=self.user, owner='org', project=self.project)
+        with self.assertRaises(RateLimitReached):
+            intention._get_group_repositories(FakeGitLab(fail=['org']), 'org')
+        self.assertIsNone(intention.checkpoint)
+
+
+class TestRateLimitThrottle(TestCase):
+
+    def setUp(self):
+        self.gl = FakeGitLab()
+        self.throttle = _RateLimitThrottle(self.gl)
+
+    def response(self, remaining, reset):
+        hook, = self.gl.session.hooks['response']
+        hook(SimpleNamespace(headers={'RateLimit-Remaining': str(remaining), 'RateLimit-Reset': str(int(reset))}))
+
+    @mock.patch('time.sleep')
+    def test_no_headers(self, sleep):
+        """Responses without rate limit headers do not throttle"""
+        self.gl.session.hooks['response'][0](SimpleNamespace(headers={}))
+        self.throttle.wait()
+        sleep.assert_not_called()
+
+    @mock.patch('time.sleep')
+    def test_remaining(self, sleep):
+        """Requests are not paused while there are requests left"""
+        self.response(100, time.time() + 60)
+        self.throttle.wait()
+        sleep.assert_not_called()
+
+    @mock.patch('time.sleep')
+    def test_wait_reset(self, sleep):
+        """Requests are paused until the reset when the limit is close"""
+        self.response(5, time.time() + 60)
+        self.throttle.wait()
+        sleep.assert_called_once()
+        self.assertAlmostEqual(sleep.call_args[0][0], 60, delta=2)
+
+    @mock.patch('time.sleep')
+    def test_reset_too_far(self, sleep):
+        """RateLimitReached is raised if the reset is too far"""
+        self.response(0, time.time() + 3600)
+        with self.assertRaises(RateLimitReached) as cm:
+            self.throttle.wait()
+        self.assertGreater(cm.exception.seconds, 3500)
+        sleep.assert_not_called()
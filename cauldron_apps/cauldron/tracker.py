@@ -0,0 +1,287 @@
+"""
+Tracker of the analysis of each project.
+
+Every project keeps the number of its repositories being analyzed
+(with raw or enrich intentions) in `running_repos`, and the number of
+owner intentions adding repositories to it in `pending_owners`, so
+checking whether a project is being analyzed reads the project row
+instead of querying every backend.
+
+The counters are incremented and decremented with F() expressions:
+* when the first intention of a scheduler repository is created, or its
+  last one is deleted (archive() deletes them), for the projects of the
+  repository linked to it
+* when a repository is linked to a scheduler repository with intentions
+* when an owner intention is created or deleted
+* when repositories with intentions are added to or removed from a
+  project
+They are recomputed for the projects affected when all the repositories
+of a project (or all the projects of a repository) are cleared, and
+after creating intentions in bulk, which sends no signals.
+`project_completed` is sent when both counters of a project get to 0.
+
+Concurrent changes can leave the counters out of sync.
+`reconcile_projects` recomputes the counters of the projects that
+disagree with their intentions. Run it periodically with the
+`reconcile_projects` management command.
+"""
+
+import logging
+
+from django.apps import apps as global_apps
+from django.db.models import F, OuterRef, Q
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+# Sent with `project` when it has no intentions pending
+project_completed = Signal()
+
+# Repository models, with the raw and enrich intentions of their scheduler repository
+REPOSITORY_INTENTIONS = {
+    'cauldron.GitRepository': ('poolsched_git.IGitRaw', 'poolsched_git.IGitEnrich'),
+    'cauldron.GitHubRepository': ('poolsched_github.IGHRaw', 'poolsched_github.IGHEnrich'),
+    'cauldron.GitLabRepository': ('poolsched_gitlab.IGLRaw', 'poolsched_gitlab.IGLEnrich'),
+    'cauldron.MeetupRepository': ('poolsched_meetup.IMeetupRaw', 'poolsched_meetup.IMeetupEnrich'),
+    'cauldron.StackExchangeRepository': ('poolsched_stackexchange.IStackExchangeRaw',
+                                         'poolsched_stackexchange.IStackExchangeEnrich'),
+}
+OWNER_INTENTIONS = ('cauldron.IAddGHOwner', 'cauldron.IAddGLOwner')
+
+# Scheduler repository of a repository when it was loaded, not known if deferred
+_UNKNOWN = object()
+
+
+def _related_name(apps, label):
+    return apps.get_model(label)._meta.model_name
+
+
+def _sched_field(apps, label):
+    """Field of an intention with its scheduler repository"""
+    model = apps.get_model(label)
+    return 'question_tag' if hasattr(model, 'question_tag') else 'repo'
+
+
+def _running(apps, repository_label):
+    """Filter of the repositories with raw or enrich intentions"""
+    query = Q()
+    for label in REPOSITORY_INTENTIONS[repository_label]:
+        query |= Q(**{f'repo_sched__{_related_name(apps, label)}__isnull': False})
+    return query
+
+
+def count_running_repos(project, apps=global_apps):
+    """Number of repositories of a project with raw or enrich intentions"""
+    running = 0
+    for repository_label in REPOSITORY_INTENTIONS:
+        running += apps.get_model(repository_label).objects.filter(projects=project)\
+            .filter(_running(apps, repository_label)).distinct().count()
+    return running
+
+
+def _count_running(repository_ids, repository_labels=REPOSITORY_INTENTIONS):
+    """Number of some repositories with raw or enrich intentions"""
+    repository_ids = list(repository_ids)
+    if not repository_ids:
+        return 0
+    return sum(global_apps.get_model(label).objects.filter(pk__in=repository_ids)
+               .filter(_running(global_apps, label)).distinct().count()
+               for label in repository_labels)
+
+
+def count_pending_owners(project, apps=global_apps):
+    """Number of owner intentions adding repositories to a project"""
+    return sum(apps.get_model(label).objects.filter(project=project).count() for label in OWNER_INTENTIONS)
+
+
+def update_projects(project_ids, apps=global_apps):
+    """Recompute the counters of some projects, sending project_completed when they finish"""
+    Project = apps.get_model('cauldron.Project')
+    for project in Project.objects.filter(pk__in=set(project_ids)):
+        was_running = project.running_repos or project.pending_owners
+        project.running_repos = count_running_repos(project, apps)
+        project.pending_owners = count_pending_owners(project, apps)
+        project.save(update_fields=['running_repos', 'pending_owners'])
+        if was_running and not project.running_repos and not project.pending_owners:
+            logger.info(f"Project {project.pk} completed")
+            project_completed.send(sender=Project, project=project)
+
+
+def count_projects(apps=global_apps):
+    """Recompute the counters of all the projects
+
+    Used by migrations, or to fix the counters if they are out of sync.
+    """
+    Project = apps.get_model('cauldron.Project')
+    for project in Project.objects.all():
+        Project.objects.filter(pk=project.pk)\
+            .update(running_repos=count_running_repos(project, apps),
+                    pending_owners=count_pending_owners(project, apps))
+
+
+def reconcile_projects():
+    """Recompute the counters of the projects out of sync with their intentions
+
+    Only the projects whose counters say they are being analyzed without
+    intentions pending, or the other way around, are recomputed.
+
+    :returns: number of projects recomputed
+    """
+    Project = global_apps.get_model('cauldron.Project')
+    pending = Q()
+    for exists in Project.pending_intentions(OuterRef('pk')):
+        pending |= Q(exists)
+    running = Q(running_repos__gt=0) | Q(pending_owners__gt=0)
+    finished = Project.objects.filter(running).exclude(pending).values_list('pk', flat=True)
+    missed = Project.objects.exclude(running).filter(pending).values_list('pk', flat=True)
+    project_ids = list(finished) + list(missed)
+    if project_ids:
+        logger.warning(f"Counters out of sync for projects {project_ids}")
+        update_projects(project_ids)
+    return len(project_ids)
+
+
+def _repository_projects(repository_label, **filters):
+    Repository = global_apps.get_model(repository_label)
+    return [pk for pk in Repository.objects.filter(**filters).values_list('projects', flat=True) if pk]
+
+
+def _has_intentions(repository_label, sched_id, exclude=None):
+    """Whether a scheduler repository has raw or enrich intentions, other than `exclude`"""
+    for label in REPOSITORY_INTENTIONS[repository_label]:
+        field = _sched_field(global_apps, label)
+        if global_apps.get_model(label).objects.filter(**{f'{field}_id': sched_id})\
+                .exclude(pk=exclude).exists():
+            return True
+    return False
+
+
+def _add(project_ids, counter, delta):
+    """Add delta to a counter of some projects, sending project_completed when they finish"""
+    if not project_ids or not delta:
+        return
+    Project = global_apps.get_model('cauldron.Project')
+    if delta > 0:
+        Project.objects.filter(pk__in=project_ids).update(**{counter: F(counter) + delta})
+        return
+    project_ids = list(Project.objects.filter(pk__in=project_ids, **{f'{counter}__gte': -delta})
+                       .values_list('pk', flat=True))
+    if not project_ids:
+        return
+    Project.objects.filter(pk__in=project_ids).update(**{counter: F(counter) + delta})
+    for project in Project.objects.filter(pk__in=project_ids, running_repos=0, pending_owners=0):
+        logger.info(f"Project {project.pk} completed")
+        project_completed.send(sender=Project, project=project)
+
+
+def track_projects():
+    """Keep the counters of the projects updated
+
+    Call it from the `ready` method of the application.
+    """
+    Repository = global_apps.get_model('cauldron.Repository')
+
+    def repository_loaded(sender, instance, **kwargs):
+        instance._tracked_repo_sched_id = instance.__dict__.get('repo_sched_id', _UNKNOWN)
+
+    for repository_label, intention_labels in REPOSITORY_INTENTIONS.items():
+        def repository_saved(sender, instance, repository_label=repository_label, **kwargs):
+            # The scheduler repository can be linked after creating its intentions
+            previous = getattr(instance, '_tracked_repo_sched_id', _UNKNOWN)
+            current = instance.repo_sched_id
+            instance._tracked_repo_sched_id = current
+            if previous == current:
+                return
+            project_ids = list(instance.projects.values_list('pk', flat=True))
+            if not project_ids:
+                return
+            if previous is _UNKNOWN:
+                update_projects(project_ids)
+                return
+            delta = 0
+            if current and _has_intentions(repository_label, current):
+                delta += 1
+            if previous and _has_intentions(repository_label, previous):
+                delta -= 1
+            _add(project_ids, 'running_repos', delta)
+
+        for label in intention_labels:
+            field = _sched_field(global_apps, label)
+
+            def intention_changed(sender, instance, repository_label=repository_label, field=field, **kwargs):
+                created = kwargs.get('created')
+                if created is False:
+                    return
+                sched_id = getattr(instance, f'{field}_id')
+                # Only the first and the last intentions of the scheduler repository count
+                if _has_intentions(repository_label, sched_id, exclude=instance.pk):
+                    return
+                _add(_repository_projects(repository_label, repo_sched_id=sched_id), 'running_repos',
+                     1 if created else -1)
+
+            model = global_apps.get_model(label)
+            post_save.connect(intention_changed, sender=model, weak=False,
+                              dispatch_uid=f'{label}.project_created')
+            post_delete.connect(intention_changed, sender=model, weak=False,
+                                dispatch_uid=f'{label}.project_deleted')
+
+        repository_model = global_apps.get_model(repository_label)
+        post_init.connect(repository_loaded, sender=repository_model, weak=False,
+                          dispatch_uid=f'{repository_label}.project_repository_loaded')
+        post_save.connect(repository_saved, sender=repository_model, weak=False,
+                          dispatch_uid=f'{repository_label}.project_repository_saved')
+
+    def owner_changed(sender, instance, **kwargs):
+        created = kwargs.get('created')
+        if created is False:
+            return
+        _add([instance.project_id], 'pending_owners', 1 if created else -1)
+
+    for label in OWNER_INTENTIONS:
+        model = global_apps.get_model(label)
+        post_save.connect(owner_changed, sender=model, weak=False,
+                          dispatch_uid=f'{label}.project_created')
+        post_delete.connect(owner_changed, sender=model, weak=False,
+                            dispatch_uid=f'{label}.project_deleted')
+
+    def projects_changed(sender, instance, action, reverse, pk_set, **kwargs):
+        if action == 'pre_clear':
+            # pk_set is not available after clearing
+            instance._cleared_projects = list(instance.projects.values_list('pk', flat=True)) \
+                if not reverse else [instance.pk]
+            return
+        if action == 'post_clear':
+            update_projects(getattr(instance, '_cleared_projects', []))
+            return
+        if not pk_set:
+            return
+        if reverse:
+            # project.repository_set.add(*repositories)
+            labels = REPOSITORY_INTENTIONS
+        else:
+            # repository.projects.add(*projects)
+            label = instance._meta.label
+            labels = [label] if label in REPOSITORY_INTENTIONS else REPOSITORY_INTENTIONS
+        if action == 'post_add':
+            # pk_set only has the new relations
+            if reverse:
+                _add([instance.pk], 'running_repos', _count_running(pk_set, labels))
+            else:
+                _add(list(pk_set), 'running_repos', _count_running([instance.pk], labels))
+        elif action == 'pre_remove':
+            # pk_set can have objects not related, count only the related ones
+            if reverse:
+                repository_ids = sender.objects.filter(project_id=instance.pk, repository_id__in=pk_set)\
+                    .values_list('repository_id', flat=True)
+                instance._removed_running = ([instance.pk], _count_running(repository_ids, labels))
+            else:
+                project_ids = sender.objects.filter(repository_id=instance.pk, project_id__in=pk_set)\
+                    .values_list('project_id', flat=True)
+                instance._removed_running = (list(project_ids), _count_running([instance.pk], labels))
+        elif action == 'post_remove':
+            project_ids, running = instance.__dict__.pop('_removed_running', ([], 0))
+            _add(project_ids, 'running_repos', -running)
+
+    m2m_changed.connect(projects_changed, sender=Repository.projects.through, weak=False,
+                        dispatch_uid='cauldron.Repository.projects_changed')
@@ -37,3 +37,7 @@ class Action(models.Model):
 
     def run(self):
         raise NotImplementedError
+
+    def apply(self, repositories):
+        """Apply the action to a set of repository ids, without changing the project"""
+        raise NotImplementedError
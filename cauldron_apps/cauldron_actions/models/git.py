@@ -26,6 +26,9 @@ class AddGitRepoAction(Action):
     def run(self):
         self.repository.projects.add(self.project)
 
+    def apply(self, repositories):
+        repositories.add(self.repository_id)
+
 
 class RemoveGitRepoAction(Action):
     """
@@ -50,3 +53,6 @@ class RemoveGitRepoAction(Action):
 
     def run(self):
         self.repository.projects.remove(self.project)
+
+    def apply(self, repositories):
+        repositories.discard(self.repository_id)
@@ -1,8 +1,8 @@
 import logging
 from django.db import models
-from github import Github
 
 from cauldron_apps.cauldron.models import GitRepository, GitHubRepository, RepositoryMetrics
+from cauldron_apps.poolsched_github.graphql import owner_repositories
 from .action import Action
 
 logger = logging.getLogger(__name__)
@@ -35,30 +35,37 @@ class AddGitHubOwnerAction(Action):
     def data_source_ui(self):
         return 'github'
 
-    def run(self):
+    def _repositories(self):
+        """Find or create the repositories of the owner"""
         token = self.creator.ghtokens.first()
-        github = Github(token.token)
-        repositories = github.get_user(self.owner).get_repos()
-        for repo_gh in repositories:
-            name = f'GitHub {self.owner}/{repo_gh.name}'
-            result, _ = RepositoryMetrics.objects.get_or_create(name=name)
-            if repo_gh.fork and not self.forks:
-                continue
-            if self.issues:
-                logger.info(f"Adding GitHub {self.owner}/{repo_gh.name} to project {self.project.id}")
-                repo, created = GitHubRepository.objects.get_or_create(owner=self.owner,
-                                                                       repo=repo_gh.name,
-                                                                       defaults={'metrics': result})
-                if not repo.repo_sched:
-                    repo.link_sched_repo()
-                repo.projects.add(self.project)
-            if self.commits:
-                logger.info(f"Adding Git {repo_gh.clone_url} to project {self.project.id}")
-                repo, created = GitRepository.objects.get_or_create(url=repo_gh.clone_url,
-                                                                    defaults={'metrics': result})
-                if not repo.repo_sched:
-                    repo.link_sched_repo()
-                repo.projects.add(self.project)
+        for repositories, _ in owner_repositories(token.token, self.owner, endpoint=token.instance.endpoint):
+            for repo_gh in repositories:
+                if repo_gh['fork'] and not self.forks:
+                    continue
+                name = f'GitHub {self.owner}/{repo_gh["name"]}'
+                result, _ = RepositoryMetrics.objects.get_or_create(name=name)
+                if self.issues:
+                    logger.info(f"Adding GitHub {self.owner}/{repo_gh['name']} to project {self.project.id}")
+                    repo, created = GitHubRepository.objects.get_or_create(owner=self.owner,
+                                                                           repo=repo_gh['name'],
+                                                                           defaults={'metrics': result})
+                    if not repo.repo_sched:
+                        repo.link_sched_repo()
+                    yield repo
+                if self.commits:
+                    logger.info(f"Adding Git {repo_gh['clone_url']} to project {self.project.id}")
+                    repo, created = GitRepository.objects.get_or_create(url=repo_gh['clone_url'],
+                                                                        defaults={'metrics': result})
+                    if not repo.repo_sched:
+                        repo.link_sched_repo()
+                    yield repo
+
+    def run(self):
+        for repo in self._repositories():
+            repo.projects.add(self.project)
+
+    def apply(self, repositories):
+        repositories.update(repo.pk for repo in self._repositories())
 
 
 class AddGitHubRepoAction(Action):
@@ -85,6 +92,9 @@ class AddGitHubRepoAction(Action):
     def run(self):
         self.repository.projects.add(self.project)
 
+    def apply(self, repositories):
+        repositories.add(self.repository_id)
+
 
 class RemoveGitHubRepoAction(Action):
     """
@@ -109,3 +119,6 @@ class RemoveGitHubRepoAction(Action):
 
     def run(self):
         self.repository.projects.remove(self.project)
+
+    def apply(self, repositories):
+        repositories.discard(self.repository_id)
@@ -33,12 +33,18 @@ class AddGitLabOwnerAction(Action):
     def data_source_ui(self):
         return self.instance.slug
 
+    def _owner_intention(self):
+        return IAddGLOwner(project=self.project, owner=self.owner, instance=self.instance,
+                           commits=self.commits, issues=self.issues, forks=self.forks,
+                           analyze=False)
+
     def run(self):
-        owner_intention = IAddGLOwner(project=self.project, owner=self.owner, instance=self.instance,
-                                      commits=self.commits, issues=self.issues, forks=self.forks,
-                                      analyze=False)
         token = self.creator.gltokens.filter(instance=self.instance).first()
-        owner_intention._run_owner(token.token)
+        self._owner_intention()._run_owner(token.token)
+
+    def apply(self, repositories):
+        token = self.creator.gltokens.filter(instance=self.instance).first()
+        repositories.update(repo.pk for repo in self._owner_intention().owner_repositories(token.token))
 
 
 class AddGitLabRepoAction(Action):
@@ -65,6 +71,9 @@ class AddGitLabRepoAction(Action):
     def run(self):
         self.repository.projects.add(self.project)
 
+    def apply(self, repositories):
+        repositories.add(self.repository_id)
+
 
 class RemoveGitLabRepoAction(Action):
     """
@@ -89,3 +98,6 @@ class RemoveGitLabRepoAction(Action):
 
     def run(self):
         self.repository.projects.remove(self.project)
+
+    def apply(self, repositories):
+        repositories.discard(self.repository_id)
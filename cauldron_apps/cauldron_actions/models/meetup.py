@@ -26,6 +26,9 @@ class AddMeetupRepoAction(Action):
     def run(self):
         self.repository.projects.add(self.project)
 
+    def apply(self, repositories):
+        repositories.add(self.repository_id)
+
 
 class RemoveMeetupRepoAction(Action):
     """
@@ -50,3 +53,6 @@ class RemoveMeetupRepoAction(Action):
 
     def run(self):
         self.repository.projects.remove(self.project)
+
+    def apply(self, repositories):
+        repositories.discard(self.repository_id)
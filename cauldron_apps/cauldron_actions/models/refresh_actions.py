@@ -1,8 +1,13 @@
+import datetime
 import logging
 
+from django.conf import settings
 from django.db import models, transaction
+from django.db.models import Q
+from django.utils.timezone import now
 
 from poolsched.models import Intention, Job, ArchivedIntention
+from cauldron_apps.cauldron.models import refresh_repositories
 
 logger = logging.getLogger(__name__)
 global_logger = logging.getLogger()
@@ -82,28 +87,40 @@ class IRefreshActions(Intention):
             return None
         return self.job
 
+    def _target_repositories(self):
+        """Ids of the repositories of the project after running every action"""
+        repositories = set()
+        for action in self.project.action_set.order_by('created').select_subclasses():
+            logger.info(f'Apply {action.name_ui}')
+            action.apply(repositories)
+        return repositories
+
     def _refresh_actions(self):
         any_action = self.project.action_set.count() > 0
         if not any_action:
             logger.info('No actions defined for this project')
             # To avoid removing repositories from projects without actions
             return
-        logger.info('Removing all the repositories')
-        for repo in self.project.repository_set.select_subclasses():
-            repo.remove_intentions(self.user)
-        self.project.repository_set.clear()
-        self.project.update_elastic_role()
+        target = self._target_repositories()
+        current = set(self.project.repository_set.values_list('pk', flat=True))
+        added, removed = target - current, current - target
 
-        logger.info('Run every action defined')
-        for action in self.project.action_set.order_by('created').select_subclasses():
-            logger.info(f'Run {action.name_ui}')
-            action.run()
-        self.project.update_elastic_role()
-
-        # Refresh data
-        logging.info('Refresh repositories')
-        for repo in self.project.repository_set.select_subclasses():
-            repo.refresh(self.project.creator)
+        logger.info(f'Removing {len(removed)} repositories, adding {len(added)}')
+        for repo in self.project.repository_set.filter(pk__in=removed).select_subclasses():
+            repo.remove_intentions(self.user)
+        self.project.repository_set.remove(*removed)
+        self.project.repository_set.add(*added)
+        if added or removed:
+            self.project.update_elastic_role()
+
+        # Refresh data of the new repositories, and the ones not refreshed recently
+        limit = now() - datetime.timedelta(hours=settings.REFRESH_ACTIONS_MIN_AGE)
+        repositories = list(self.project.repository_set
+                            .filter(Q(pk__in=added) | Q(last_refresh__isnull=True) | Q(last_refresh__lt=limit))
+                            .select_subclasses())
+        logger.info(f'Refresh {len(repositories)} repositories')
+        refreshed = refresh_repositories(self.project.creator, repositories)
+        logger.info(f"{refreshed} of {len(repositories)} repositories refreshed")
 
     def run(self, job):
         """Run the code to fulfill this intention
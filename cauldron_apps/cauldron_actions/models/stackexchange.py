@@ -26,6 +26,9 @@ class AddStackExchangeRepoAction(Action):
     def run(self):
         self.repository.projects.add(self.project)
 
+    def apply(self, repositories):
+        repositories.add(self.repository_id)
+
 
 class RemoveStackExchangeRepoAction(Action):
     """
@@ -50,3 +53,6 @@ class RemoveStackExchangeRepoAction(Action):
 
     def run(self):
         self.repository.projects.remove(self.project)
+
+    def apply(self, repositories):
+        repositories.discard(self.repository_id)
@@ -1,3 +1,72 @@
+import datetime
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils.timezone import now
+
+from cauldron_apps.cauldron.models import Project, GitRepository
+from cauldron_apps.poolsched_git.models import IGitRaw
+from .models import Action, AddGitRepoAction, RemoveGitRepoAction, IRefreshActions
+
+User = get_user_model()
+
+
+@mock.patch('cauldron_apps.cauldron.models.Project.update_elastic_role')
+class TestRefreshActions(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='A')
+        self.project = Project.objects.create(name='project', creator=self.user)
+        self.repos = []
+        for i in range(2):
+            repo = GitRepository.objects.create(url=f'https://github.com/my-org/project-{i}')
+            repo.link_sched_repo()
+            self.repos.append(repo)
+        self.intention = IRefreshActions.objects.create(user=self.user, project=self.project)
+
+    def action(self, model, repo, minutes):
+        """Create an action, `minutes` after the first one"""
+        action = model.objects.create(creator=self.user, project=self.project, repository=repo)
+        Action.objects.filter(pk=action.pk).update(created=now() + datetime.timedelta(minutes=minutes))
+
+    def project_repos(self):
+        return set(self.project.repository_set.values_list('pk', flat=True))
+
+    def test_add_remove(self, update_elastic_role):
+        """Repositories added and then removed are not in the project"""
+        self.repos[0].projects.add(self.project)
+        IGitRaw.objects.create(user=self.user, repo=self.repos[0].repo_sched)
+        self.action(AddGitRepoAction, self.repos[0], 0)
+        self.action(AddGitRepoAction, self.repos[1], 1)
+        self.action(RemoveGitRepoAction, self.repos[0], 2)
+        self.intention._refresh_actions()
+        self.assertEqual(self.project_repos(), {self.repos[1].pk})
+        self.assertFalse(IGitRaw.objects.filter(repo=self.repos[0].repo_sched).exists())
+        self.assertTrue(IGitRaw.objects.filter(repo=self.repos[1].repo_sched).exists())
+        update_elastic_role.assert_called_once()
+
+    def test_unchanged(self, update_elastic_role):
+        """Projects already up to date are not changed nor refreshed"""
+        for i, repo in enumerate(self.repos):
+            repo.projects.add(self.project)
+            repo.update_last_refresh()
+            self.action(AddGitRepoAction, repo, i)
+        self.intention._refresh_actions()
+        self.assertEqual(self.project_repos(), {repo.pk for repo in self.repos})
+        self.assertFalse(IGitRaw.objects.exists())
+        update_elastic_role.assert_not_called()
 
-# Create your tests here.
+    def test_stale(self, update_elastic_role):
+        """Repositories not refreshed recently are refreshed"""
+        old = now() - datetime.timedelta(hours=settings.REFRESH_ACTIONS_MIN_AGE + 1)
+        for i, repo in enumerate(self.repos):
+            repo.projects.add(self.project)
+            repo.update_last_refresh()
+            self.action(AddGitRepoAction, repo, i)
+        GitRepository.objects.filter(pk=self.repos[0].pk).update(last_refresh=old)
+        self.intention._refresh_actions()
+        self.assertTrue(IGitRaw.objects.filter(repo=self.repos[0].repo_sched).exists())
+        self.assertFalse(IGitRaw.objects.filter(repo=self.repos[1].repo_sched).exists())
+        update_elastic_role.assert_not_called()
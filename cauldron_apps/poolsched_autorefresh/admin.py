@@ -1,3 +1,26 @@
 from django.contrib import admin
+from django.utils.html import format_html
 
-# Register your models here.
+from .models import IAutorefreshAll, IAutorefreshAllArchived
+
+
+@admin.register(IAutorefreshAll)
+class AutoRefreshIntentionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created', 'job', 'last_autorefresh', 'scheduled')
+    list_filter = ('created', 'last_autorefresh', 'scheduled')
+    ordering = ('-scheduled', )
+
+
+@admin.register(IAutorefreshAllArchived)
+class AutoRefreshArchivedIntentionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created', 'completed', 'status', 'arch_job', 'logs')
+    list_filter = ('status', 'created', 'completed')
+    ordering = ('-completed', )
+
+    def logs(self, obj):
+        try:
+            log_id = obj.arch_job.logs.id
+            url = "/logs/" + str(log_id)
+            return format_html("<a href='{url}'>Show</a>", url=url)
+        except AttributeError:
+            return None
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.15 on 2026-10-19 15:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('poolsched', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IAutorefreshAll',
+            fields=[
+                ('intention_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='poolsched.intention')),
+                ('last_autorefresh', models.DateTimeField(null=True)),
+                ('scheduled', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Autorefresh',
+                'db_table': 'poolsched_autorefresh_all',
+            },
+            bases=('poolsched.intention',),
+        ),
+        migrations.CreateModel(
+            name='IAutorefreshAllArchived',
+            fields=[
+                ('archivedintention_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='poolsched.archivedintention')),
+                ('last_autorefresh', models.DateTimeField(null=True)),
+                ('scheduled', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Autorefresh Archived',
+                'db_table': 'poolsched_autorefresh_all_archived',
+            },
+            bases=('poolsched.archivedintention',),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_autorefresh', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iautorefreshall',
+            name='refresh_progress',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='iautorefreshall',
+            name='refresh_until',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.15 on 2026-10-19 17:20
+
+from django.db import migrations
+from django.utils.timezone import now
+
+# Autorefresh intentions of each backend, replaced by IAutorefreshAll
+BACKEND_AUTOREFRESH = [
+    ('poolsched_git', 'IGitAutoRefresh'),
+    ('poolsched_github', 'IGHIssueAutoRefresh'),
+    ('poolsched_github', 'IGHRepoAutoRefresh'),
+    ('poolsched_github', 'IGH2IssueAutoRefresh'),
+    ('poolsched_gitlab', 'IGLIssueAutoRefresh'),
+    ('poolsched_gitlab', 'IGLMergeAutoRefresh'),
+    ('poolsched_meetup', 'IMeetupAutoRefresh'),
+    ('poolsched_stackexchange', 'IStackExchangeAutoRefresh'),
+]
+
+
+def create_autorefresh_all(apps, schema_editor):
+    """Schedule IAutorefreshAll from the oldest window of the backends"""
+    IAutorefreshAll = apps.get_model('poolsched_autorefresh', 'IAutorefreshAll')
+    if IAutorefreshAll.objects.exists():
+        return
+    pending = []
+    for app_label, model_name in BACKEND_AUTOREFRESH:
+        pending += apps.get_model(app_label, model_name).objects.filter(job=None)
+    windows = [intention.last_autorefresh for intention in pending if intention.last_autorefresh]
+    IAutorefreshAll.objects.create(user=pending[0].user if pending else None,
+                                   scheduled=now(),
+                                   last_autorefresh=min(windows) if windows else None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_autorefresh', '0003_autorefresh_interval'),
+        ('poolsched_git', '0006_autorefresh_interval'),
+        ('poolsched_github', '0011_autorefresh_interval'),
+        ('poolsched_gitlab', '0013_autorefresh_interval'),
+        ('poolsched_meetup', '0006_autorefresh_interval'),
+        ('poolsched_stackexchange', '0005_autorefresh_interval'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_autorefresh_all, migrations.RunPython.noop),
+    ]
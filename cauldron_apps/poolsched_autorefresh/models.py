@@ -12,11 +12,35 @@ from django.db import models, transaction
 from django.utils.timezone import now
 
 from poolsched.models import Intention, Job, ArchivedIntention
-from .mordred import SHAutoRefresh
+from .mordred import SHAutoRefresh, SHAutoRefreshAll
 
 logger = logging.getLogger(__name__)
 global_logger = logging.getLogger()
 
+# Minutes between autorefreshes: default, and limits of the adaptive interval
+AUTOREFRESH_INTERVAL = 60
+AUTOREFRESH_MIN_INTERVAL = 10
+AUTOREFRESH_MAX_INTERVAL = 24 * 60
+# Identities modified in a window above which the interval is shortened
+AUTOREFRESH_BACKLOG = 5000
+
+# Sections refreshed by IAutorefreshAll
+AUTOREFRESH_SECTIONS = ['git', 'github:issue', 'github:repo', 'github2:issue',
+                        'gitlab:issue', 'gitlab:merge', 'meetup', 'stackexchange']
+
+
+def next_interval(interval, modified):
+    """Minutes until the next autorefresh after a window with `modified` identities
+
+    The interval doubles while there are no changes, and is halved when
+    there is a backlog, so the cost follows the volume of changes.
+    """
+    if modified == 0:
+        return min(interval * 2, AUTOREFRESH_MAX_INTERVAL)
+    if modified > AUTOREFRESH_BACKLOG:
+        return max(interval // 2, AUTOREFRESH_MIN_INTERVAL)
+    return interval
+
 
 class AutoRefreshManager(models.Manager):
     """Model manager for instances of IAutorefresh"""
@@ -33,6 +57,9 @@ class AutoRefreshManager(models.Manager):
         :param max:  maximum number of intentions to return
         :returns:    list of IGHRaw intentions
         """
+        if self.replaced():
+            logger.debug('Autorefresh replaced by IAutorefreshAll')
+            return []
         # Don't select if exists an intention running
         if self.filter(job__isnull=False, job__worker__isnull=False):
             return []
@@ -41,6 +68,17 @@ class AutoRefreshManager(models.Manager):
                                  scheduled__lte=now())
         return intentions.all()[:max]
 
+    def replaced(self):
+        """Whether IAutorefreshAll refreshes the sections of this model"""
+        return IAutorefreshAll.objects.exists()
+
+
+class AutoRefreshAllManager(AutoRefreshManager):
+    """Model manager for IAutorefreshAll"""
+
+    def replaced(self):
+        return False
+
 
 class IAutorefresh(Intention):
     """Intention to refresh indices with SortingHat data"""
@@ -49,6 +87,12 @@ class IAutorefresh(Intention):
     last_autorefresh = models.DateTimeField(null=True)
     # Time at which this intentions should run
     scheduled = models.DateTimeField()
+    # Time at which the window being refreshed started, if it was interrupted
+    refresh_until = models.DateTimeField(null=True)
+    # Last chunk of identities refreshed in that window, by section
+    refresh_progress = models.JSONField(default=dict)
+    # Minutes until the next run, adapted to the identities modified
+    refresh_interval = models.PositiveIntegerField(default=AUTOREFRESH_INTERVAL)
 
     class Meta:
         abstract = True
@@ -89,22 +133,31 @@ class IAutorefresh(Intention):
         """
         return None
 
-    def _run_backend(self, job):
+    def _runner(self, progress, checkpoint):
+        """Backend that refreshes the indices"""
+        return SHAutoRefresh(self.backend, self.last_autorefresh,
+                             progress=progress, checkpoint=checkpoint)
+
+    def _run_backend(self, job, sched_autorefresh):
         """Run auto refresh for a backend.
-        Return whether it finishes OK (True) or BAD (False)
+        Progress is saved in sched_autorefresh, which resumes it if this fails.
+        Return the number of identities modified, or None if it fails
         """
+        def checkpoint():
+            sched_autorefresh.save(update_fields=['refresh_progress'])
+
         handler = self._create_log_handler(job)
         try:
             global_logger.addHandler(handler)
             logger.info(f"Running Autorefresh for {self.backend} from {self.last_autorefresh} to {now()}")
-            runner = SHAutoRefresh(self.backend, self.last_autorefresh)
-            runner.run()
+            runner = self._runner(sched_autorefresh.refresh_progress, checkpoint)
+            modified = runner.run()
         except Exception as e:
             logger.error(f"Error running Autorefresh for {self.backend}: {str(e)}")
-            return False
+            return None
         finally:
             global_logger.removeHandler(handler)
-        return True
+        return modified or 0
 
     def run(self, job):
         """Run the code to fulfill this intention
@@ -113,20 +166,34 @@ class IAutorefresh(Intention):
         """
         # TODO: Synchronize enrich tasks if needed
 
-        # Schedule next autorefresh with current last_autorefresh in case this one fails
-        autorefresh_start = now()
-        next_autorefresh = autorefresh_start + datetime.timedelta(hours=1)
+        # Schedule next autorefresh with current last_autorefresh in case this one fails.
+        # An interrupted window is resumed from the last chunk refreshed, and
+        # identities modified since it started are left for the next window
+        autorefresh_start = self.refresh_until or now()
+        next_autorefresh = now() + datetime.timedelta(minutes=self.refresh_interval)
         logger.info(f"Schedule next autorefresh for {self.backend} at {next_autorefresh}")
         sched_autorefresh = self.__class__.objects.create(user=self.user,
                                                           scheduled=next_autorefresh,
-                                                          last_autorefresh=self.last_autorefresh)
+                                                          last_autorefresh=self.last_autorefresh,
+                                                          refresh_until=autorefresh_start,
+                                                          refresh_progress=self.refresh_progress,
+                                                          refresh_interval=self.refresh_interval)
+        if self.refresh_progress:
+            logger.info(f"Resuming Autorefresh from {self.refresh_progress}")
 
         logger.info(f"Running Autorefresh intention")
-        success = self._run_backend(job)
-        if success:
+        modified = self._run_backend(job, sched_autorefresh)
+        if modified is not None:
             # Update next autorefresh dates
-            sched_autorefresh.scheduled = now() + datetime.timedelta(hours=1)
+            interval = next_interval(self.refresh_interval, modified)
+            if interval != self.refresh_interval:
+                logger.info(f"{modified} identities modified, autorefresh interval "
+                            f"{self.refresh_interval} -> {interval} minutes")
+            sched_autorefresh.refresh_interval = interval
+            sched_autorefresh.scheduled = now() + datetime.timedelta(minutes=interval)
             sched_autorefresh.last_autorefresh = autorefresh_start
+            sched_autorefresh.refresh_until = None
+            sched_autorefresh.refresh_progress = {}
             sched_autorefresh.save()
             logger.info(f"Reschedule autorefresh for {self.backend} at {sched_autorefresh.scheduled}")
             return True
@@ -162,3 +229,45 @@ class IAutorefreshArchived(ArchivedIntention):
     @property
     def process_name(self):
         raise NotImplementedError
+
+
+class IAutorefreshAll(IAutorefresh, Intention):
+    """Intention to refresh the indices of all the backends at once
+
+    SortingHat is queried once for all the sections in
+    AUTOREFRESH_SECTIONS, which are refreshed concurrently. While it
+    exists, the autorefresh intentions of each backend are not selected.
+    It is scheduled by migration 0004_autorefresh_all; delete it to go
+    back to the intentions of each backend.
+    """
+    objects = AutoRefreshAllManager()
+
+    @property
+    def backend(self):
+        return 'all'
+
+    @property
+    def process_name(self):
+        return 'Autorefresh'
+
+    def _runner(self, progress, checkpoint):
+        return SHAutoRefreshAll(AUTOREFRESH_SECTIONS, self.last_autorefresh,
+                                progress=progress, checkpoint=checkpoint)
+
+    @classmethod
+    def _archived_model(cls):
+        return IAutorefreshAllArchived
+
+    class Meta:
+        db_table = 'poolsched_autorefresh_all'
+        verbose_name_plural = "Autorefresh"
+
+
+class IAutorefreshAllArchived(IAutorefreshArchived):
+    @property
+    def process_name(self):
+        return 'Autorefresh Archived'
+
+    class Meta:
+        db_table = 'poolsched_autorefresh_all_archived'
+        verbose_name_plural = "Autorefresh Archived"
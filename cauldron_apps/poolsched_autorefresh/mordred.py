@@ -19,17 +19,24 @@
 #
 # In Cauldron we took autorefresh code and create or own class
 
+import concurrent.futures
 import json
 import logging
+import threading
 from datetime import datetime
+
+from django.conf import settings
+from django.db import connection
+
 from cauldron_apps.poolsched_utils.mordred.backend import Backend
+from cauldron_apps.poolsched_utils.mordred.retry import create_task
+from cauldron_apps.poolsched_utils.mordred.sh_database import shared_database
 
 
 try:
     from sirmordred.task import Task
     from sirmordred.task_projects import TaskProjects
     from sortinghat import api
-    from sortinghat.db.database import Database
     from grimoire_elk.elk import refresh_identities
 except ImportError:
     from cauldron_apps.poolsched_utils.mordred import sirmordred_fake
@@ -41,56 +48,155 @@ logger = logging.getLogger(__name__)
 
 PROJECTS_FILE = '/tmp/tmp_projects.json'
 
-
 class SHAutoRefresh(Backend):
-    def __init__(self, datasource, last_autorefresh=None):
+    def __init__(self, datasource, last_autorefresh=None, progress=None, checkpoint=None):
+        """
+        :param progress:   dict with the chunks refreshed in each datasource, updated in place
+        :param checkpoint: function called to save `progress` after each chunk
+        """
         super().__init__()
         self.datasource = datasource
         self.last_autorefresh = last_autorefresh or datetime.fromtimestamp(0)
+        self.progress = progress if progress is not None else {}
+        self.checkpoint = checkpoint
         projects = {'Project': {}}
         with open(PROJECTS_FILE, 'w+') as f:
             json.dump(projects, f)
         self.config.set_param('projects', 'projects_file', PROJECTS_FILE)
 
     def run(self):
-        """ Execute the refresh for this datasource."""
+        """ Execute the refresh for this datasource.
+        Return the number of identities modified in the window
+        """
         TaskProjects(self.config).execute()
 
-        task = TaskAutoRefresh(config=self.config,
-                               backend_section=self.datasource,
-                               last_autorefresh=self.last_autorefresh)
+        task = create_task(TaskAutoRefresh,
+                           config=self.config,
+                           backend_section=self.datasource,
+                           last_autorefresh=self.last_autorefresh,
+                           progress=self.progress.setdefault(self.datasource, {}),
+                           checkpoint=self.checkpoint)
         try:
             task.execute()
             logger.info(f"Finish refreshing data for {self.datasource}.")
         except Exception as e:
             logger.error(f"Error refreshing data for {self.datasource}. Cause: {e}")
             raise e
+        return task.modified
+
+
+class SHAutoRefreshAll(Backend):
+    """Refresh several datasources with a single query to SortingHat
+
+    The identities modified since last_autorefresh are read once, and
+    the datasources are refreshed with them at the same time.
+    """
+    def __init__(self, datasources, last_autorefresh=None, progress=None, checkpoint=None):
+        super().__init__()
+        self.datasources = datasources
+        self.last_autorefresh = last_autorefresh or datetime.fromtimestamp(0)
+        self.progress = progress if progress is not None else {}
+        self.checkpoint = checkpoint
+        projects = {'Project': {}}
+        with open(PROJECTS_FILE, 'w+') as f:
+            json.dump(projects, f)
+        self.config.set_param('projects', 'projects_file', PROJECTS_FILE)
+
+    def run(self):
+        """ Execute the refresh for all the datasources.
+        Return the number of identities modified in the window
+        """
+        TaskProjects(self.config).execute()
+
+        checkpoint_lock = threading.Lock()
+
+        def checkpoint():
+            if self.checkpoint:
+                with checkpoint_lock:
+                    self.checkpoint()
+
+        tasks = [create_task(TaskAutoRefresh,
+                             config=self.config,
+                             backend_section=datasource,
+                             last_autorefresh=self.last_autorefresh,
+                             progress=self.progress.setdefault(datasource, {}),
+                             checkpoint=checkpoint)
+                 for datasource in self.datasources]
+        if not tasks[0].db:
+            logger.info('Refresh not active')
+            return 0
+        identities = tasks[0].modified_identities()
+        for task in tasks:
+            task.identities = identities
+
+        errors = []
+
+        def refresh(task):
+            try:
+                task.execute()
+                logger.info(f"Finish refreshing data for {task.backend_section}.")
+            except Exception as e:
+                logger.error(f"Error refreshing data for {task.backend_section}. Cause: {e}")
+                errors.append(e)
+            finally:
+                # Checkpoints open a database connection in this thread
+                connection.close()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            list(executor.map(refresh, tasks))
+        if errors:
+            raise errors[0]
+        return len(identities[0]) + len(identities[1])
 
 
 class TaskAutoRefresh(Task):
 
-    def __init__(self, config, backend_section=None, last_autorefresh=None):
+    def __init__(self, config, backend_section=None, last_autorefresh=None,
+                 identities=None, progress=None, checkpoint=None, chunk_size=None):
+        """
+        :param identities: tuple (uuids, ids) of the identities to refresh,
+                           read from SortingHat if it is not given
+        :param progress:   dict with the last uuid and id refreshed, updated in
+                           place after each chunk. Identities up to them are skipped
+        :param checkpoint: function called after each chunk to save `progress`
+        :param chunk_size: identities refreshed at once, settings.AUTOREFRESH_CHUNK_SIZE by default
+        """
         super().__init__(config)
         self.backend_section = backend_section
+        self.identities = identities
+        self.progress = progress if progress is not None else {}
+        # Keys are created now, so the dict does not change size while it is saved
+        self.progress.setdefault('uuids', None)
+        self.progress.setdefault('ids', None)
+        self.checkpoint = checkpoint
+        self.chunk_size = chunk_size or settings.AUTOREFRESH_CHUNK_SIZE
+        # Number of identities modified in the window
+        self.modified = 0
         if self.db_sh is None and self.db_host is None:
             self.db = None
         else:
-            self.db = Database(**self.sh_kwargs)
+            self.db = shared_database(**self.sh_kwargs)
         if last_autorefresh:
             self.last_autorefresh = last_autorefresh
         else:
             self.last_autorefresh = datetime.datetime.fromtimestamp(0)
 
+    def modified_identities(self):
+        """Unique identities and identities modified since last_autorefresh"""
+        logger.info(f'Getting last modified identities from SH since '
+                    f'{self.last_autorefresh} for {self.backend_section}')
+        uuids = api.search_last_modified_unique_identities(self.db, self.last_autorefresh)
+        ids = api.search_last_modified_identities(self.db, self.last_autorefresh)
+        return uuids, ids
+
     def __autorefresh(self, enrich_backend):
         # Refresh projects
         field_id = enrich_backend.get_field_unique_id()
 
         # Refresh identities
         logger.info("[%s] Refreshing identities", self.backend_section)
-        logger.info(f'Getting last modified identities from SH since '
-                    f'{self.last_autorefresh} for {self.backend_section}')
-        uuids_refresh = api.search_last_modified_unique_identities(self.db, self.last_autorefresh)
-        ids_refresh = api.search_last_modified_identities(self.db, self.last_autorefresh)
+        uuids_refresh, ids_refresh = self.identities or self.modified_identities()
+        self.modified = len(uuids_refresh) + len(ids_refresh)
         author_fields = ["author_uuid"]
         try:
             meta_fields = enrich_backend.meta_fields
@@ -100,28 +206,39 @@ class TaskAutoRefresh(Task):
 
         if uuids_refresh:
             logger.info(f"Refreshing {len(uuids_refresh)} uuid identities for {self.backend_section}")
-            eitems = refresh_identities(enrich_backend, author_fields=author_fields, author_values=uuids_refresh)
-            enrich_backend.elastic.bulk_upload(eitems, field_id)
+            self.__refresh_chunks('uuids', enrich_backend, author_fields, uuids_refresh, field_id)
         else:
             logger.info("No uuids to be refreshed found")
         if ids_refresh:
             logger.info(f"Refreshing {len(ids_refresh)} identity ids for {self.backend_section}")
-            eitems = refresh_identities(enrich_backend, author_fields=author_fields, author_values=ids_refresh)
-            enrich_backend.elastic.bulk_upload(eitems, field_id)
+            self.__refresh_chunks('ids', enrich_backend, author_fields, ids_refresh, field_id)
         else:
             logger.info("No ids to be refreshed found")
 
+    def __refresh_chunks(self, kind, enrich_backend, author_fields, values, field_id):
+        """Refresh the identities in chunks, in order, saving the progress after each one"""
+        values = sorted(values)
+        last = self.progress[kind]
+        if last is not None:
+            values = [value for value in values if value > last]
+            logger.info(f"Resuming {kind} after {last}, {len(values)} left for {self.backend_section}")
+        for start in range(0, len(values), self.chunk_size):
+            chunk = values[start:start + self.chunk_size]
+            self.__refresh(enrich_backend, author_fields, chunk, field_id)
+            self.progress[kind] = chunk[-1]
+            if self.checkpoint:
+                self.checkpoint()
+
+    def __refresh(self, enrich_backend, author_fields, values, field_id):
+        """Rewrite the identities of the documents with some values"""
+        eitems = refresh_identities(enrich_backend, author_fields=author_fields, author_values=values)
+        enrich_backend.elastic.bulk_upload(eitems, field_id)
+
     def execute(self):
         """Execute autorefresh"""
-        try:
-            if self.db:
-                logger.info('[%s] refresh start', self.backend_section)
-                self.__autorefresh(self._get_enrich_backend())
-                logger.info('[%s] refresh end', self.backend_section)
-            else:
-                logger.info('[%s] refresh not active', self.backend_section)
-
-        except Exception as e:
-            raise e
-        finally:
-            self.db._engine.dispose()
+        if self.db:
+            logger.info('[%s] refresh start', self.backend_section)
+            self.__autorefresh(self._get_enrich_backend())
+            logger.info('[%s] refresh end', self.backend_section)
+        else:
+            logger.info('[%s] refresh not active', self.backend_section)
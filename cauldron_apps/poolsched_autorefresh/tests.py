@@ -1,3 +1,170 @@
-from django.test import TestCase
+import datetime
+import logging
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from django.utils.timezone import now
+
+from poolsched.models import Job
+from cauldron_apps.poolsched_github.models import IGHIssueAutoRefresh
+from .models import IAutorefreshAll, next_interval, AUTOREFRESH_INTERVAL, AUTOREFRESH_MIN_INTERVAL, \
+    AUTOREFRESH_MAX_INTERVAL, AUTOREFRESH_BACKLOG
+from .mordred import SHAutoRefreshAll, TaskAutoRefresh
+
+
+class TestAutorefreshAll(TestCase):
+
+    def setUp(self):
+        # Created by migration 0004_autorefresh_all
+        IAutorefreshAll.objects.all().delete()
+
+    def test_replaced(self):
+        """The intentions of each backend are not selected while IAutorefreshAll exists"""
+        IGHIssueAutoRefresh.objects.create(scheduled=now())
+        self.assertEqual(len(IGHIssueAutoRefresh.objects.selectable_intentions(None)), 1)
+        IAutorefreshAll.objects.create(scheduled=now())
+        self.assertEqual(len(IGHIssueAutoRefresh.objects.selectable_intentions(None)), 0)
+        self.assertEqual(len(IAutorefreshAll.objects.selectable_intentions(None)), 1)
+
+    @mock.patch.object(IAutorefreshAll, '_create_log_handler', return_value=logging.NullHandler())
+    @mock.patch.object(SHAutoRefreshAll, '__init__', return_value=None)
+    @mock.patch.object(SHAutoRefreshAll, 'run', return_value=10)
+    def test_run(self, run, init, create_log_handler):
+        """All the sections are refreshed, and the next run is scheduled"""
+        intention = IAutorefreshAll.objects.create(scheduled=now())
+        self.assertTrue(intention.run(None))
+        run.assert_called_once()
+        self.assertIn('github:issue', init.call_args[0][0])
+        scheduled = IAutorefreshAll.objects.exclude(pk=intention.pk).get()
+        self.assertGreater(scheduled.last_autorefresh, intention.created)
+        self.assertGreater(scheduled.scheduled, now())
+
+    @mock.patch.object(IAutorefreshAll, '_create_log_handler', return_value=logging.NullHandler())
+    @mock.patch.object(SHAutoRefreshAll, '__init__', return_value=None)
+    @mock.patch.object(SHAutoRefreshAll, 'run')
+    def test_resume(self, run, init, create_log_handler):
+        """Interrupted windows are resumed from the last chunk refreshed"""
+        intention = IAutorefreshAll.objects.create(scheduled=now())
+
+        def interrupted():
+            progress = init.call_args[1]['progress']
+            progress['git'] = {'uuids': 'uuid2', 'ids': None}
+            init.call_args[1]['checkpoint']()
+            raise Exception('Elasticsearch error')
+
+        run.side_effect = interrupted
+        with self.assertRaises(Job.StopException):
+            intention.run(None)
+        retry = IAutorefreshAll.objects.exclude(pk=intention.pk).get()
+        self.assertEqual(retry.refresh_progress, {'git': {'uuids': 'uuid2', 'ids': None}})
+        self.assertIsNotNone(retry.refresh_until)
+        self.assertIsNone(retry.last_autorefresh)
+
+        run.side_effect = None
+        run.return_value = 0
+        self.assertTrue(retry.run(None))
+        self.assertEqual(init.call_args[1]['progress'], {'git': {'uuids': 'uuid2', 'ids': None}})
+        scheduled = IAutorefreshAll.objects.exclude(pk__in=[intention.pk, retry.pk]).get()
+        self.assertEqual(scheduled.last_autorefresh, retry.refresh_until)
+        self.assertEqual(scheduled.refresh_progress, {})
+        self.assertIsNone(scheduled.refresh_until)
+
+
+    @mock.patch.object(IAutorefreshAll, '_create_log_handler', return_value=logging.NullHandler())
+    @mock.patch.object(SHAutoRefreshAll, '__init__', return_value=None)
+    @mock.patch.object(SHAutoRefreshAll, 'run', return_value=0)
+    def test_interval(self, run, init, create_log_handler):
+        """The next run is scheduled with the interval adapted"""
+        intention = IAutorefreshAll.objects.create(scheduled=now())
+        self.assertTrue(intention.run(None))
+        scheduled = IAutorefreshAll.objects.exclude(pk=intention.pk).get()
+        self.assertEqual(scheduled.refresh_interval, AUTOREFRESH_INTERVAL * 2)
+        self.assertGreater(scheduled.scheduled, now() + datetime.timedelta(minutes=AUTOREFRESH_INTERVAL))
+
+
+class TestNextInterval(SimpleTestCase):
+
+    def test_no_changes(self):
+        """The interval doubles without changes, up to AUTOREFRESH_MAX_INTERVAL"""
+        self.assertEqual(next_interval(60, 0), 120)
+        self.assertEqual(next_interval(AUTOREFRESH_MAX_INTERVAL - 1, 0), AUTOREFRESH_MAX_INTERVAL)
+        self.assertEqual(next_interval(AUTOREFRESH_MAX_INTERVAL, 0), AUTOREFRESH_MAX_INTERVAL)
+
+    def test_backlog(self):
+        """The interval is halved with a backlog, down to AUTOREFRESH_MIN_INTERVAL"""
+        self.assertEqual(next_interval(60, AUTOREFRESH_BACKLOG + 1), 30)
+        self.assertEqual(next_interval(AUTOREFRESH_MIN_INTERVAL + 1, AUTOREFRESH_BACKLOG + 1),
+                         AUTOREFRESH_MIN_INTERVAL)
+        self.assertEqual(next_interval(AUTOREFRESH_MIN_INTERVAL, AUTOREFRESH_BACKLOG + 1),
+                         AUTOREFRESH_MIN_INTERVAL)
+
+    def test_unchanged(self):
+        """The interval is kept with some changes"""
+        self.assertEqual(next_interval(60, 1), 60)
+        self.assertEqual(next_interval(60, AUTOREFRESH_BACKLOG), 60)
+
+IDENTITIES = (['uuid1'], ['id1', 'id2'])
+
+
+@mock.patch('cauldron_apps.poolsched_autorefresh.mordred.TaskProjects', mock.MagicMock())
+@mock.patch('cauldron_apps.poolsched_utils.mordred.backend.base_config', mock.MagicMock)
+@mock.patch('cauldron_apps.poolsched_autorefresh.mordred.create_task')
+class TestSHAutoRefreshAll(SimpleTestCase):
+
+    def run_sections(self, create_task, sections, errors=()):
+        tasks = []
+
+        def create(task_class, backend_section, **kwargs):
+            task = mock.Mock(backend_section=backend_section)
+            task.modified_identities.return_value = IDENTITIES
+            if backend_section in errors:
+                task.execute.side_effect = Exception('Elasticsearch error')
+            tasks.append(task)
+            return task
+
+        create_task.side_effect = create
+        return SHAutoRefreshAll(sections).run, tasks
+
+    def test_identities_once(self, create_task):
+        """SortingHat is queried once, and the sections are refreshed with the same identities"""
+        run, tasks = self.run_sections(create_task, ['git', 'meetup'])
+        self.assertEqual(run(), 3)
+        tasks[0].modified_identities.assert_called_once()
+        tasks[1].modified_identities.assert_not_called()
+        for task in tasks:
+            task.execute.assert_called_once()
+            self.assertEqual(task.identities, IDENTITIES)
+
+    def test_error(self, create_task):
+        """A section failing does not stop the others"""
+        run, tasks = self.run_sections(create_task, ['git', 'meetup', 'stackexchange'], errors=['git'])
+        with self.assertRaises(Exception):
+            run()
+        for task in tasks:
+            task.execute.assert_called_once()
+
+
+@mock.patch.multiple(TaskAutoRefresh, db_sh=None, db_host=None, create=True)
+@mock.patch.object(TaskAutoRefresh, '_TaskAutoRefresh__refresh')
+class TestRefreshChunks(SimpleTestCase):
+
+    def refresh(self, progress):
+        checkpoints = []
+        task = TaskAutoRefresh(mock.MagicMock(), backend_section='git', last_autorefresh=now(),
+                               identities=(['uuid3', 'uuid1', 'uuid2'], []), progress=progress,
+                               checkpoint=lambda: checkpoints.append(dict(progress)), chunk_size=2)
+        task._TaskAutoRefresh__autorefresh(mock.Mock(meta_fields=[]))
+        return task, checkpoints
+
+    def test_chunks(self, refresh):
+        """Identities are refreshed in order by chunks, saving the progress after each one"""
+        progress = {}
+        task, checkpoints = self.refresh(progress)
+        self.assertEqual([call[0][2] for call in refresh.call_args_list], [['uuid1', 'uuid2'], ['uuid3']])
+        self.assertEqual(checkpoints, [{'uuids': 'uuid2', 'ids': None}, {'uuids': 'uuid3', 'ids': None}])
+        self.assertEqual(task.modified, 3)
+
+    def test_resume(self, refresh):
+        """Identities up to the progress given are skipped"""
+        self.refresh({'uuids': 'uuid2', 'ids': None})
+        self.assertEqual([call[0][2] for call in refresh.call_args_list], [['uuid3']])
@@ -1,4 +1,17 @@
-from .models import GitRepo, IGitRaw, IGitEnrich
+from django.utils.timezone import now
+
+from poolsched.models import ArchivedIntention
+
+from cauldron_apps.poolsched_utils.intentions import analyze_repos, archive_repos, finished_repos
+from cauldron_apps.poolsched_utils.parallel import check_repos
+
+from .cache import remote_refs_digest
+from .models import GitRepo, IGitRaw, IGitEnrich, IGitRawArchived, IGitEnrichArchived
+
+# Remotes checked at once when refreshing several repositories
+LS_REMOTE_WORKERS = 8
+# Maximum time (seconds) to check the remotes of the repositories refreshed at once
+LS_REMOTE_TOTAL_TIMEOUT = 120
 
 
 def analyze_git_repo(user, url):
@@ -16,3 +29,60 @@ def analyze_git_repo_obj(user, git_repo):
     enrich, _ = IGitEnrich.objects.get_or_create(user=user, repo=git_repo)
     enrich.previous.add(raw)
     return True
+
+
+def analyze_git_repos(user, git_repos):
+    """Create the intentions to analyze some repositories in a few queries"""
+    git_repos = list(git_repos)
+    analyze_repos(user, git_repos, IGitRaw, IGitEnrich)
+    return git_repos
+
+
+def _unchanged(git_repo):
+    """Check whether a repository has not changed since its last analysis
+
+    The branches and tags of the remote are compared with the ones of
+    the last collection, and the last enrichment must have finished.
+    """
+    if not git_repo.head_refs:
+        return False
+    if git_repo.pk not in finished_repos([git_repo], IGitRaw, IGitEnrich, IGitEnrichArchived):
+        return False
+    return remote_refs_digest(git_repo.url) == git_repo.head_refs
+
+
+def refresh_git_repo_obj(user, git_repo):
+    """Refresh a repository
+
+    If the repository has no changes, the intentions are archived
+    as done without running them.
+    """
+    if _unchanged(git_repo):
+        created = now()
+        IGitRawArchived.objects.create(user=user, repo=git_repo, created=created,
+                                       status=ArchivedIntention.OK)
+        IGitEnrichArchived.objects.create(user=user, repo=git_repo, created=created,
+                                          status=ArchivedIntention.OK)
+        return True
+    return analyze_git_repo_obj(user, git_repo)
+
+
+def refresh_git_repos(user, git_repos):
+    """Refresh some repositories, see refresh_git_repo_obj
+
+    The remotes are checked in parallel, and the repositories whose
+    remote was not checked in time are analyzed.
+    Return the repositories refreshed
+    """
+    git_repos = list(git_repos)
+    finished = finished_repos([git_repo for git_repo in git_repos if git_repo.head_refs],
+                              IGitRaw, IGitEnrich, IGitEnrichArchived)
+    digests = check_repos(lambda git_repo: remote_refs_digest(git_repo.url),
+                          [git_repo for git_repo in git_repos if git_repo.pk in finished],
+                          LS_REMOTE_WORKERS, LS_REMOTE_TOTAL_TIMEOUT)
+    unchanged, changed = [], []
+    for git_repo in git_repos:
+        digest = digests.get(git_repo.pk)
+        (unchanged if digest and digest == git_repo.head_refs else changed).append(git_repo)
+    archive_repos(user, unchanged, IGitRawArchived, IGitEnrichArchived)
+    return unchanged + analyze_git_repos(user, changed)
@@ -0,0 +1,295 @@
+"""
+Cache of Git repositories analyzed by the Git backend.
+
+Repositories are kept as bare clones in settings.GIT_REPOS, with the
+same layout used by perceval (`git-path`), so perceval does not need to
+clone them. Only branches and tags are kept, like perceval does, so other
+refs of the remote (e.g. GitHub pull requests) are not in the history.
+The cache:
+* clones new repositories with `git clone --bare`, and can refresh
+  the existing ones with `git fetch --prune`
+* shares the objects of forks with the mirror of their upstream, when
+  it is already in the cache, using Git alternates
+* locks each repository, so concurrent jobs in the same host never
+  clone or update the same repository at once
+* removes the least recently used mirrors when the cache is bigger than
+  settings.GIT_REPOS_MAX_SIZE_MB (no limit if it is 0)
+
+The size and last use of each mirror are stored in an index file at the
+root of the cache.
+"""
+
+import contextlib
+import datetime
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = '.cache-index.json'
+LOCK_SUFFIX = '.lock'
+# Maximum time (seconds) for a clone or fetch
+GIT_TIMEOUT = 3 * 3600
+# Maximum time (seconds) to list the refs of a remote repository
+LS_REMOTE_TIMEOUT = 60
+# Refs fetched from the remote
+FETCH_REFSPECS = ('+refs/heads/*:refs/heads/*', '+refs/tags/*:refs/tags/*')
+
+
+class GitCacheError(Exception):
+    """Error running a Git command in the cache"""
+
+
+def _git(*args, cwd=None, input=None, timeout=GIT_TIMEOUT):
+    """Run a git command and return its output"""
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0', LANG='C')
+    if input is not None:
+        input = input.encode('utf-8')
+    try:
+        result = subprocess.run(['git', *args], cwd=cwd, env=env, check=True, input=input,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                timeout=timeout)
+    except subprocess.CalledProcessError as e:
+        raise GitCacheError(f"git {args[0]} failed: {e.stderr.decode('utf-8', errors='replace').strip()}")
+    except subprocess.TimeoutExpired:
+        raise GitCacheError(f"git {args[0]} timed out")
+    return result.stdout.decode('utf-8', errors='replace')
+
+
+def _disk_usage(path):
+    """Size in bytes of the files in a directory"""
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def _refs_digest(refs):
+    """Digest of a list of (hash, ref name) for branches and tags"""
+    lines = sorted(f'{sha} {name}' for sha, name in refs
+                   if name.startswith(('refs/heads/', 'refs/tags/')) and not name.endswith('^{}'))
+    return hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+def remote_refs_digest(url):
+    """Digest of the branches and tags of a remote repository
+
+    Used to know whether a repository changed without fetching it.
+
+    :returns: digest, or None if the remote cannot be read
+    """
+    try:
+        output = _git('ls-remote', '--heads', '--tags', url, timeout=LS_REMOTE_TIMEOUT)
+    except GitCacheError as e:
+        logger.warning(f"Cannot list refs of {url}: {e}")
+        return None
+    return _refs_digest(line.split()[:2] for line in output.splitlines() if line.strip())
+
+
+def _repo_name(url):
+    name = url.rstrip('/').rsplit('/', 1)[-1]
+    if name.endswith('.git'):
+        name = name[:-4]
+    return name.lower()
+
+
+class GitCache:
+    """Bare mirrors of the Git repositories analyzed in this host"""
+
+    def __init__(self, root=None, max_size=None):
+        """
+        :param root:     directory of the cache, settings.GIT_REPOS by default
+        :param max_size: size of the cache in bytes, 0 for no limit
+        """
+        self.root = root or settings.GIT_REPOS
+        if max_size is None:
+            max_size = settings.GIT_REPOS_MAX_SIZE_MB * 1024 * 1024
+        self.max_size = max_size
+
+    def path(self, url):
+        """Path of the mirror for a repository"""
+        return os.path.join(self.root, url.lstrip('/'))
+
+    @contextlib.contextmanager
+    def _flock(self, lock_path, blocking=True):
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, 'a') as f:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            fcntl.flock(f, flags)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def lock(self, url, blocking=True):
+        """Lock a repository for this process
+
+        Hold the lock while the mirror is updated and read. With
+        blocking=False, BlockingIOError is raised if it is locked.
+        """
+        return self._flock(self.path(url).rstrip('/') + LOCK_SUFFIX, blocking)
+
+    @contextlib.contextmanager
+    def _index(self):
+        """Locked index of the cache, saved when the context is over"""
+        index_path = os.path.join(self.root, INDEX_FILE)
+        with self._flock(index_path + LOCK_SUFFIX):
+            try:
+                with open(index_path) as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+            yield index
+            tmp_path = f'{index_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, index_path)
+
+    def exists(self, url):
+        """Check whether the mirror of a repository is in the cache"""
+        return os.path.exists(os.path.join(self.path(url), 'HEAD'))
+
+    def mirror(self, url, update=True):
+        """Clone or update the mirror of a repository
+
+        The repository must be locked by the caller.
+
+        :param url:    URL of the repository
+        :param update: fetch the remote if the mirror is in the cache
+        :returns:      path of the mirror
+        """
+        path = self.path(url)
+        reference = None
+        if self.exists(url):
+            if update:
+                logger.info(f"Updating mirror of {url}")
+                _git('fetch', '--prune', 'origin', cwd=path)
+            with self._index() as index:
+                reference = index.get(path, {}).get('reference')
+        else:
+            if os.path.exists(path):
+                # Leftover of an interrupted clone
+                shutil.rmtree(path)
+            reference = self._find_reference(url)
+            args = ['clone', '--bare', '--quiet']
+            if reference:
+                logger.info(f"Sharing objects of {url} with {reference}")
+                args += ['--reference-if-able', reference]
+            logger.info(f"Cloning mirror of {url}")
+            try:
+                _git(*args, url, path)
+                for refspec in FETCH_REFSPECS:
+                    _git('config', '--add', 'remote.origin.fetch', refspec, cwd=path)
+                if reference and not self._shares_history(path, reference):
+                    # Same name, but not a fork
+                    self._dissociate(path)
+                    reference = None
+            except GitCacheError:
+                shutil.rmtree(path, ignore_errors=True)
+                raise
+        with self._index() as index:
+            index[path] = {'url': url,
+                           'last_used': time.time(),
+                           'size': _disk_usage(path),
+                           'reference': reference}
+        return path
+
+    def contains(self, url, sha):
+        """Check whether a commit is reachable from the branches or tags of a mirror
+
+        It is not reachable if the history was rewritten (e.g. after
+        a force push) since the commit was seen.
+        """
+        try:
+            refs = _git('for-each-ref', '--count=1', '--contains', sha,
+                        'refs/heads', 'refs/tags', cwd=self.path(url))
+        except GitCacheError:
+            # Unknown object
+            return False
+        return bool(refs.strip())
+
+    def newest_commit(self, url):
+        """Hash and commit date of the newest commit in the branches and tags of a mirror
+
+        :returns: tuple (hash, datetime), or None for empty repositories
+        """
+        output = _git('log', '--branches', '--tags', '--date-order', '-1', '--format=%H %ct',
+                      cwd=self.path(url)).split()
+        if not output:
+            return None
+        return output[0], datetime.datetime.fromtimestamp(int(output[1]), tz=datetime.timezone.utc)
+
+    def refs_digest(self, url):
+        """Digest of the branches and tags of a mirror, see remote_refs_digest"""
+        output = _git('for-each-ref', '--format=%(objectname) %(refname)',
+                      'refs/heads', 'refs/tags', cwd=self.path(url))
+        return _refs_digest(line.split()[:2] for line in output.splitlines() if line.strip())
+
+    def _find_reference(self, url):
+        """Find a mirror in the cache that can be the upstream of a repository
+
+        Forks usually keep the name of their upstream, so the most
+        recently used mirror with the same name is returned.
+        """
+        with self._index() as index:
+            candidates = sorted(((entry['last_used'], path) for path, entry in index.items()
+                                 if _repo_name(entry['url']) == _repo_name(url)
+                                 and not entry.get('reference')
+                                 and os.path.exists(path)),
+                                reverse=True)
+        return candidates[0][1] if candidates else None
+
+    def _shares_history(self, path, reference):
+        """Check whether a mirror has any root commit of its reference"""
+        roots = _git('rev-list', '--max-parents=0', '--all', cwd=path).split()
+        if not roots:
+            return False
+        found = _git('cat-file', '--batch-check', cwd=reference, input='\n'.join(roots) + '\n')
+        return any(not line.endswith(' missing') for line in found.splitlines())
+
+    def _dissociate(self, path):
+        """Copy the objects borrowed from the reference and stop using it"""
+        _git('repack', '-a', '-d', '--quiet', cwd=path)
+        os.remove(os.path.join(path, 'objects', 'info', 'alternates'))
+
+    def evict(self):
+        """Remove the least recently used mirrors until the cache fits its size
+
+        Mirrors being used by other jobs, and mirrors with objects shared
+        with other mirrors, are not removed.
+
+        :returns: number of bytes removed
+        """
+        if not self.max_size:
+            return 0
+        freed = 0
+        with self._index() as index:
+            total = sum(entry['size'] for entry in index.values())
+            referenced = {entry.get('reference') for entry in index.values()}
+            for path, entry in sorted(index.items(), key=lambda item: item[1]['last_used']):
+                if total <= self.max_size:
+                    break
+                if path in referenced:
+                    continue
+                try:
+                    with self.lock(entry['url'], blocking=False):
+                        logger.info(f"Removing mirror of {entry['url']} from the cache")
+                        shutil.rmtree(path, ignore_errors=True)
+                except BlockingIOError:
+                    continue
+                total -= entry['size']
+                freed += entry['size']
+                del index[path]
+        return freed
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_git', '0002_git_autorefresh'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gitrepo',
+            name='last_commit',
+            field=models.CharField(blank=True, default=None, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='gitrepo',
+            name='last_commit_date',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_git', '0003_gitrepo_last_commit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gitrepo',
+            name='head_refs',
+            field=models.CharField(blank=True, default=None, max_length=40, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_git', '0005_autorefresh_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='igitautorefresh',
+            name='refresh_interval',
+            field=models.PositiveIntegerField(default=60),
+        ),
+    ]
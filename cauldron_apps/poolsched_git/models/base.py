@@ -17,6 +17,11 @@ class GitRepo(models.Model):
 
     # When the repo was created in the scheduler
     created = models.DateTimeField(default=now, blank=True)
+    # Newest commit collected, and its commit date
+    last_commit = models.CharField(max_length=64, null=True, default=None, blank=True)
+    last_commit_date = models.DateTimeField(null=True, default=None, blank=True)
+    # Digest of the branches and tags in the last collection
+    head_refs = models.CharField(max_length=40, null=True, default=None, blank=True)
 
     class Meta:
         db_table = TABLE_PREFIX + 'repo'
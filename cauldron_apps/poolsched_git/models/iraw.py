@@ -103,10 +103,15 @@ class IGitRaw(Intention):
         handler = self._create_log_handler(job)
         try:
             global_logger.addHandler(handler)
-            runner = GitRaw(self.repo.url)
+            runner = GitRaw(self.repo.url, last_commit=self.repo.last_commit,
+                            last_commit_date=self.repo.last_commit_date)
             output = runner.run()
             if output:
                 raise Job.StopException
+            self.repo.last_commit = runner.last_commit
+            self.repo.last_commit_date = runner.last_commit_date
+            self.repo.head_refs = runner.head_refs
+            self.repo.save(update_fields=['last_commit', 'last_commit_date', 'head_refs'])
         except Exception as e:
             logger.error(f"Error: {e}")
             raise Job.StopException
@@ -1,18 +1,12 @@
 import logging
 import json
-import os
-import time
 import traceback
-import sqlalchemy
-
-from django.conf import settings
 
 try:
     from sirmordred.config import Config
     from sirmordred.task_projects import TaskProjects
     from sirmordred.task_collection import TaskRawDataCollection
     from sirmordred.task_enrich import TaskEnrich
-    from grimoire_elk.enriched.enrich import Enrich
 except ImportError:
     from ..poolsched_utils.mordred import sirmordred_fake
     Config = sirmordred_fake.Config
@@ -21,6 +15,10 @@ except ImportError:
     TaskEnrich = sirmordred_fake.TaskEnrich
 
 from cauldron_apps.poolsched_utils.mordred.backend import Backend
+from cauldron_apps.poolsched_utils.mordred.es_sizes import adaptive_bulk_size
+from cauldron_apps.poolsched_utils.mordred.retry import create_task
+
+from .cache import GitCache, GitCacheError
 
 
 logger = logging.getLogger(__name__)
@@ -30,10 +28,24 @@ BACKEND_SECTION = 'git'
 
 
 class GitRaw(Backend):
-    def __init__(self, url):
+    name = 'git'
+
+    def __init__(self, url, last_commit=None, last_commit_date=None):
+        """
+        :param url:              URL of the repository
+        :param last_commit:      newest commit collected in the last run
+        :param last_commit_date: date of that commit
+        """
         super().__init__()
-        git_path = os.path.join(settings.GIT_REPOS, url.lstrip('/'))
-        self.config.set_param('git', 'git-path', git_path)
+        self.url = url
+        self.previous_commit = last_commit
+        self.previous_commit_date = last_commit_date
+        # Newest commit collected, set by run
+        self.last_commit = None
+        self.last_commit_date = None
+        self.head_refs = None
+        self.cache = GitCache()
+        self.config.set_param('git', 'git-path', self.cache.path(url))
         self.config.set_param('projects', 'projects_file', PROJECTS_FILE)
         projects = {'Project': {BACKEND_SECTION: [url]}}
         with open(PROJECTS_FILE, 'w+') as f:
@@ -42,26 +54,56 @@ class GitRaw(Backend):
     def run(self):
         """ Execute the analysis for this backend.
         Return 0 or None for success, 1 for error
+
+        perceval fetches the mirror of the cache and collects only the
+        new commits (latest-items). If the mirror is not in the cache
+        (new repository, or evicted), it is cloned: if the commit of the
+        last run is still in its branches or tags, only the commits since
+        its date are collected (from-date), otherwise (new repository, or
+        rewritten history) the whole history is collected. When it
+        succeeds, last_commit, last_commit_date and head_refs are updated.
         """
         TaskProjects(self.config).execute()
-        task = TaskRawDataCollection(self.config, backend_section=BACKEND_SECTION)
-        try:
-            out_repos = task.execute()
-            repo = out_repos[0]
-            if 'error' in repo and repo['error']:
-                logger.error(repo['error'])
+        # Other jobs in this host must wait until the mirror is read
+        with self.cache.lock(self.url):
+            cloned = not self.cache.exists(self.url)
+            try:
+                self.cache.mirror(self.url, update=False)
+            except GitCacheError as e:
+                logger.error("Error updating the mirror of {}. Cause: {}".format(self.url, e))
                 return 1
-        except Exception as e:
-            logger.error("Error in raw data retrieval from Git. Cause: {}".format(e))
-            traceback.print_exc()
-            return 1
+            if cloned:
+                # perceval finds no new commits in a repository it has not fetched
+                self.config.set_param('git', 'latest-items', False)
+                if self.previous_commit_date and self.cache.contains(self.url, self.previous_commit):
+                    logger.info("Collecting commits of {} since {}".format(self.url, self.previous_commit_date))
+                    self.config.set_param('git', 'from-date', self.previous_commit_date.isoformat())
+                else:
+                    logger.info("Collecting the whole history of {}".format(self.url))
+            task = TaskRawDataCollection(self.config, backend_section=BACKEND_SECTION)
+            try:
+                out_repos = task.execute()
+                repo = out_repos[0]
+                if 'error' in repo and repo['error']:
+                    logger.error(repo['error'])
+                    return 1
+            except Exception as e:
+                logger.error("Error in raw data retrieval from Git. Cause: {}".format(e))
+                traceback.print_exc()
+                return 1
+            newest = self.cache.newest_commit(self.url)
+            if newest:
+                self.last_commit, self.last_commit_date = newest
+            self.head_refs = self.cache.refs_digest(self.url)
+        self.cache.evict()
 
 
 class GitEnrich(Backend):
+    name = 'git'
+
     def __init__(self, url):
         super().__init__()
-        git_path = os.path.join(settings.GIT_REPOS, url.lstrip('/'))
-        self.config.set_param('git', 'git-path', git_path)
+        self.config.set_param('git', 'git-path', GitCache().path(url))
         self.config.set_param('projects', 'projects_file', PROJECTS_FILE)
         projects = {'Project': {'git': [url]}}
         with open(PROJECTS_FILE, 'w+') as f:
@@ -72,25 +114,11 @@ class GitEnrich(Backend):
         Return 0 or None for success, 1 for error
         """
         TaskProjects(self.config).execute()
-        task = None
-        while not task:
-            try:
-                task = TaskEnrich(self.config, backend_section=BACKEND_SECTION)
-            except sqlalchemy.exc.InternalError:
-                # There is a race condition in the code
-                logger.error('SQLAlchemy internal error')
-                task = None
-                time.sleep(1)
-
         try:
-            task.execute()
+            task = create_task(TaskEnrich, self.config, backend_section=BACKEND_SECTION)
+            with adaptive_bulk_size(self.name):
+                task.execute()
         except Exception as e:
             logger.warning("Error enriching data for Git. Cause: {}".format(e))
             traceback.print_exc()
             return 1
-        finally:
-            if task.db:
-                task.db._engine.dispose()
-            if Enrich.sh_db:
-                Enrich.sh_db._engine.dispose()
-                Enrich.sh_db = None
@@ -0,0 +1,107 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils.timezone import now
+
+from poolsched.models import ArchivedIntention
+from cauldron_apps.poolsched_utils.intentions import bulk_create_inherited, finished_repos
+from ..api import analyze_git_repo_obj, analyze_git_repos, refresh_git_repos
+from ..models import GitRepo, IGitRaw, IGitEnrich, IGitRawArchived, IGitEnrichArchived
+
+User = get_user_model()
+
+
+class TestAnalyzeRepos(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='A')
+        self.repos = [GitRepo.objects.create(url=f'https://github.com/my-org/project-{i}')
+                      for i in range(3)]
+
+    def test_create(self):
+        """Raw and enrich intentions are created for every repository"""
+        analyze_git_repos(self.user, self.repos)
+        for repo in self.repos:
+            raw = IGitRaw.objects.get(user=self.user, repo=repo)
+            enrich = IGitEnrich.objects.get(user=self.user, repo=repo)
+            self.assertEqual(list(enrich.previous.all()), [raw.intention_ptr])
+
+    def test_existing(self):
+        """Existing intentions are not duplicated"""
+        analyze_git_repo_obj(self.user, self.repos[0])
+        analyze_git_repos(self.user, self.repos)
+        analyze_git_repos(self.user, self.repos)
+        self.assertEqual(IGitRaw.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(IGitEnrich.objects.filter(user=self.user).count(), 3)
+        enrich = IGitEnrich.objects.get(user=self.user, repo=self.repos[0])
+        self.assertEqual(enrich.previous.count(), 1)
+
+
+class TestArchivedIntentions(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='A')
+        self.repos = [GitRepo.objects.create(url=f'https://github.com/my-org/project-{i}')
+                      for i in range(3)]
+
+    def test_bulk_create_archived(self):
+        """Archived intentions are inserted with their parent rows"""
+        archived = [IGitEnrichArchived(user=self.user, repo=repo, created=now(), status=ArchivedIntention.OK)
+                    for repo in self.repos]
+        bulk_create_inherited(IGitEnrichArchived, archived)
+        for intention in archived:
+            self.assertIsNotNone(intention.pk)
+            found = IGitEnrichArchived.objects.get(pk=intention.pk)
+            self.assertEqual(found.repo, intention.repo)
+            self.assertEqual(found.status, ArchivedIntention.OK)
+        self.assertEqual(ArchivedIntention.objects.filter(pk__in=[i.pk for i in archived]).count(), 3)
+
+    def test_finished_repos(self):
+        """Repositories without intentions whose last enrichment finished fine"""
+        for repo in self.repos[:2]:
+            IGitEnrichArchived.objects.create(user=self.user, repo=repo, created=now(),
+                                              status=ArchivedIntention.OK)
+        IGitRaw.objects.create(user=self.user, repo=self.repos[1])
+        finished = finished_repos(self.repos, IGitRaw, IGitEnrich, IGitEnrichArchived)
+        self.assertEqual(finished, {self.repos[0].pk})
+
+
+class TestRefreshRepos(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='A')
+        self.repos = [GitRepo.objects.create(url=f'https://github.com/my-org/project-{i}', head_refs='refs')
+                      for i in range(3)]
+        for repo in self.repos:
+            IGitEnrichArchived.objects.create(user=self.user, repo=repo, created=now(),
+                                              status=ArchivedIntention.OK)
+
+    def test_unchanged(self):
+        """Repositories with the same remote refs are archived, the others analyzed"""
+        digests = {self.repos[0].url: 'refs', self.repos[1].url: 'new refs', self.repos[2].url: None}
+        with mock.patch('cauldron_apps.poolsched_git.api.remote_refs_digest', side_effect=digests.get):
+            refreshed = refresh_git_repos(self.user, self.repos)
+        self.assertEqual(len(refreshed), 3)
+        self.assertTrue(IGitRawArchived.objects.filter(user=self.user, repo=self.repos[0]).exists())
+        self.assertFalse(IGitRaw.objects.filter(user=self.user, repo=self.repos[0]).exists())
+        for repo in self.repos[1:]:
+            self.assertTrue(IGitRaw.objects.filter(user=self.user, repo=repo).exists())
+
+    def test_timeout(self):
+        """Repositories whose remote is not checked in time are analyzed"""
+        blocked = threading.Event()
+
+        def remote_refs_digest(url):
+            if url == self.repos[0].url:
+                blocked.wait(5)
+            return 'refs'
+
+        with mock.patch('cauldron_apps.poolsched_git.api.remote_refs_digest', side_effect=remote_refs_digest), \
+                mock.patch('cauldron_apps.poolsched_git.api.LS_REMOTE_TOTAL_TIMEOUT', 0.5):
+            refresh_git_repos(self.user, self.repos)
+        blocked.set()
+        self.assertTrue(IGitRaw.objects.filter(user=self.user, repo=self.repos[0]).exists())
+        for repo in self.repos[1:]:
+            self.assertFalse(IGitRaw.objects.filter(user=self.user, repo=repo).exists())
@@ -0,0 +1,141 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.test import SimpleTestCase
+
+from ..cache import GitCache, GitCacheError, remote_refs_digest
+
+
+def git(*args, cwd=None):
+    subprocess.run(['git', *args], cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def commit(repo, filename, content):
+    with open(os.path.join(repo, filename), 'w') as f:
+        f.write(content)
+    git('add', filename, cwd=repo)
+    git('-c', 'user.name=test', '-c', 'user.email=test@example.com',
+        'commit', '-q', '-m', f'Add {filename}', cwd=repo)
+
+
+class TestGitCache(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.upstream = os.path.join(self.tmp, 'upstream', 'project')
+        os.makedirs(self.upstream)
+        git('init', '-q', cwd=self.upstream)
+        commit(self.upstream, 'README', 'readme')
+        self.cache = GitCache(root=os.path.join(self.tmp, 'cache'), max_size=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_clone_and_fetch(self):
+        """Mirrors are cloned once and updated with new commits"""
+        with self.cache.lock(self.upstream):
+            path = self.cache.mirror(self.upstream)
+        self.assertEqual(path, self.cache.path(self.upstream))
+        self.assertTrue(os.path.exists(os.path.join(path, 'HEAD')))
+        commit(self.upstream, 'NEWS', 'news')
+        with self.cache.lock(self.upstream):
+            self.cache.mirror(self.upstream)
+        log = subprocess.check_output(['git', 'log', '--oneline', '--all'], cwd=path)
+        self.assertEqual(len(log.splitlines()), 2)
+
+    def test_fork_reference(self):
+        """Forks share the objects of their upstream mirror"""
+        fork = os.path.join(self.tmp, 'fork', 'project')
+        git('clone', '-q', self.upstream, fork)
+        commit(fork, 'FORK', 'fork')
+        upstream_path = self.cache.mirror(self.upstream)
+        fork_path = self.cache.mirror(fork)
+        with open(os.path.join(fork_path, 'objects', 'info', 'alternates')) as f:
+            self.assertIn(upstream_path, f.read())
+
+    def test_error(self):
+        """Repositories that cannot be cloned raise GitCacheError"""
+        url = os.path.join(self.tmp, 'missing')
+        with self.assertRaises(GitCacheError):
+            self.cache.mirror(url)
+        self.assertFalse(os.path.exists(self.cache.path(url)))
+
+    def test_evict(self):
+        """The least recently used mirrors are removed to fit the budget"""
+        other = os.path.join(self.tmp, 'upstream', 'other')
+        git('clone', '-q', self.upstream, other)
+        first = self.cache.mirror(other)
+        second = self.cache.mirror(self.upstream)
+        self.cache.max_size = 1
+        self.assertGreater(self.cache.evict(), 0)
+        self.assertFalse(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+
+    def test_evict_locked(self):
+        """Mirrors in use are not removed"""
+        path = self.cache.mirror(self.upstream)
+        self.cache.max_size = 1
+        with self.cache.lock(self.upstream):
+            self.assertEqual(self.cache.evict(), 0)
+        self.assertTrue(os.path.exists(path))
+
+    def test_same_name(self):
+        """Repositories with the same name but other history do not share objects"""
+        other = os.path.join(self.tmp, 'other', 'project')
+        os.makedirs(other)
+        git('init', '-q', cwd=other)
+        commit(other, 'OTHER', 'other')
+        self.cache.mirror(self.upstream)
+        other_path = self.cache.mirror(other)
+        self.assertFalse(os.path.exists(os.path.join(other_path, 'objects', 'info', 'alternates')))
+        log = subprocess.check_output(['git', 'log', '--oneline', '--all'], cwd=other_path)
+        self.assertEqual(len(log.splitlines()), 1)
+
+    def test_newest_commit(self):
+        """The newest commit is reachable until the history is rewritten"""
+        self.cache.mirror(self.upstream)
+        sha, date = self.cache.newest_commit(self.upstream)
+        self.assertTrue(self.cache.contains(self.upstream, sha))
+        git('-c', 'user.name=test', '-c', 'user.email=test@example.com',
+            'commit', '-q', '--amend', '-m', 'Rewritten', cwd=self.upstream)
+        self.cache.mirror(self.upstream)
+        self.assertFalse(self.cache.contains(self.upstream, sha))
+        self.assertNotEqual(self.cache.newest_commit(self.upstream)[0], sha)
+
+    def test_only_branches_and_tags(self):
+        """Other refs of the remote, like pull requests, are not in the mirror"""
+        git('checkout', '-q', '-b', 'pull', cwd=self.upstream)
+        commit(self.upstream, 'PULL', 'pull')
+        git('update-ref', 'refs/pull/1/head', 'pull', cwd=self.upstream)
+        git('checkout', '-q', '-', cwd=self.upstream)
+        git('branch', '-q', '-D', 'pull', cwd=self.upstream)
+        path = self.cache.mirror(self.upstream)
+        log = subprocess.check_output(['git', 'log', '--oneline', '--all'], cwd=path)
+        self.assertEqual(len(log.splitlines()), 1)
+        head = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=self.upstream).decode().strip()
+        self.assertEqual(self.cache.newest_commit(self.upstream)[0], head)
+
+    def test_no_update(self):
+        """Mirrors in the cache are not fetched without update"""
+        path = self.cache.mirror(self.upstream)
+        commit(self.upstream, 'NEWS', 'news')
+        self.cache.mirror(self.upstream, update=False)
+        log = subprocess.check_output(['git', 'log', '--oneline', '--all'], cwd=path)
+        self.assertEqual(len(log.splitlines()), 1)
+        self.cache.mirror(self.upstream)
+        log = subprocess.check_output(['git', 'log', '--oneline', '--all'], cwd=path)
+        self.assertEqual(len(log.splitlines()), 2)
+
+    def test_refs_digest(self):
+        """The refs of a mirror match the remote until it changes"""
+        git('-c', 'user.name=test', '-c', 'user.email=test@example.com',
+            'tag', '-a', '-m', 'Version 1', 'v1', cwd=self.upstream)
+        self.cache.mirror(self.upstream)
+        digest = self.cache.refs_digest(self.upstream)
+        self.assertEqual(remote_refs_digest(self.upstream), digest)
+        commit(self.upstream, 'NEWS', 'news')
+        self.assertNotEqual(remote_refs_digest(self.upstream), digest)
+        self.assertIsNone(remote_refs_digest(os.path.join(self.tmp, 'missing')))
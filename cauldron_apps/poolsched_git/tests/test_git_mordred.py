@@ -0,0 +1,53 @@
+import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..mordred import GitRaw
+
+URL = 'https://github.com/my-org/project'
+LAST_COMMIT_DATE = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@mock.patch('cauldron_apps.poolsched_git.mordred.TaskProjects', mock.MagicMock())
+@mock.patch('cauldron_apps.poolsched_git.mordred.TaskRawDataCollection')
+@mock.patch('cauldron_apps.poolsched_utils.mordred.backend.base_config', mock.MagicMock)
+@mock.patch('cauldron_apps.poolsched_git.mordred.GitCache')
+class TestGitRaw(SimpleTestCase):
+
+    def run_raw(self, cache_class, task_class, exists, contains, last_commit='abc'):
+        cache = cache_class.return_value
+        cache.exists.return_value = exists
+        cache.contains.return_value = contains
+        cache.newest_commit.return_value = ('def', LAST_COMMIT_DATE)
+        task_class.return_value.execute.return_value = [{}]
+        runner = GitRaw(URL, last_commit=last_commit, last_commit_date=LAST_COMMIT_DATE if last_commit else None)
+        self.assertIsNone(runner.run())
+        self.assertEqual(runner.last_commit, 'def')
+        cache.mirror.assert_called_once_with(URL, update=False)
+        return {args[1]: args[2] for args, _ in runner.config.set_param.call_args_list if args[0] == 'git'}
+
+    def test_latest_items(self, cache_class, task_class):
+        """Mirrors in the cache collect only the new commits"""
+        params = self.run_raw(cache_class, task_class, exists=True, contains=True)
+        self.assertNotIn('latest-items', params)
+        self.assertNotIn('from-date', params)
+
+    def test_cloned_from_date(self, cache_class, task_class):
+        """Mirrors cloned again collect the commits since the last one"""
+        params = self.run_raw(cache_class, task_class, exists=False, contains=True)
+        self.assertFalse(params['latest-items'])
+        self.assertEqual(params['from-date'], LAST_COMMIT_DATE.isoformat())
+        cache_class.return_value.contains.assert_called_once_with(URL, 'abc')
+
+    def test_rewritten(self, cache_class, task_class):
+        """The whole history is collected if the last commit is not reachable"""
+        params = self.run_raw(cache_class, task_class, exists=False, contains=False)
+        self.assertFalse(params['latest-items'])
+        self.assertNotIn('from-date', params)
+
+    def test_new_repository(self, cache_class, task_class):
+        """The whole history of new repositories is collected"""
+        params = self.run_raw(cache_class, task_class, exists=False, contains=True, last_commit=None)
+        self.assertFalse(params['latest-items'])
+        self.assertNotIn('from-date', params)
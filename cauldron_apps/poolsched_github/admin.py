@@ -96,9 +96,9 @@ class GHGLRepositoryAdmin(admin.ModelAdmin):
 
 @admin.register(GHToken)
 class TokenAdmin(admin.ModelAdmin):
-    list_display = ('id', 'reset', user_name, 'job_count')
+    list_display = ('id', 'reset', user_name, 'shared', 'job_count')
     search_fields = ('id', 'repo')
-    list_filter = ('reset',)
+    list_filter = ('reset', 'shared')
     ordering = ('id',)
 
     def job_count(self, obj):
@@ -1,12 +1,31 @@
-from .models import GHInstance, GHRepo, IGHEnrich, IGHRaw
+from django.utils.timezone import now
+
+from poolsched.models import ArchivedIntention
+
+from cauldron_apps.poolsched_utils.intentions import analyze_repos, archive_repos, finished_repos
+from cauldron_apps.poolsched_utils.parallel import check_repos
+
+from .changes import events_etag
+from .models import GHInstance, GHRepo, GHToken, IGHEnrich, IGHRaw, IGHRawArchived, IGHEnrichArchived
+
+# Repositories checked at once when refreshing several repositories
+CHECK_WORKERS = 8
+# Maximum time (seconds) to check the repositories refreshed at once
+CHECK_TOTAL_TIMEOUT = 120
+
+
+def _can_analyze(user, instance):
+    """The user has tokens, or there are tokens in the shared pool of the instance"""
+    return user.ghtokens.exists() or \
+        GHToken.objects.filter(shared=True, instance=instance).exists()
 
 
 def analyze_gh_repo(user, owner, repo):
     """owner, repo"""
     # TODO: Define instance
-    if user.ghtokens.count() < 1:
-        return None
     instance = GHInstance.objects.get(name='GitHub')
+    if not _can_analyze(user, instance):
+        return None
     gh_repo, _ = GHRepo.objects.get_or_create(owner=owner, repo=repo, instance=instance)
     raw, _ = IGHRaw.objects.get_or_create(user=user, repo=gh_repo)
     enrich, _ = IGHEnrich.objects.get_or_create(user=user, repo=gh_repo)
@@ -15,9 +34,95 @@ def analyze_gh_repo(user, owner, repo):
 
 
 def analyze_gh_repo_obj(user, gh_repo):
-    if user.ghtokens.count() < 1:
+    if not _can_analyze(user, gh_repo.instance):
         return False
     raw, _ = IGHRaw.objects.get_or_create(user=user, repo=gh_repo)
     enrich, _ = IGHEnrich.objects.get_or_create(user=user, repo=gh_repo)
     enrich.previous.add(raw)
     return True
+
+
+def analyze_gh_repos(user, gh_repos):
+    """Create the intentions to analyze some repositories in a few queries
+
+    Return the repositories with intentions, the ones of instances
+    without tokens available are skipped
+    """
+    gh_repos = list(gh_repos)
+    instances = {gh_repo.instance_id: gh_repo.instance for gh_repo in gh_repos}
+    allowed = {pk for pk, instance in instances.items() if _can_analyze(user, instance)}
+    gh_repos = [gh_repo for gh_repo in gh_repos if gh_repo.instance_id in allowed]
+    analyze_repos(user, gh_repos, IGHRaw, IGHEnrich)
+    return gh_repos
+
+
+def _available_token(user, instance):
+    """Token of the user, or of the shared pool of the instance, not rate limited"""
+    return user.ghtokens.filter(reset__lt=now()).first() or \
+        GHToken.objects.filter(shared=True, instance=instance, reset__lt=now()).first()
+
+
+def _no_new_events(gh_repo, token):
+    """Check whether a repository has no new events since its last collection
+
+    The conditional request does not consume the rate limit of the token
+    if there are no changes.
+    """
+    if not token:
+        return False
+    return events_etag(gh_repo, token.token, etag=gh_repo.events_etag) == gh_repo.events_etag
+
+
+def _unchanged(user, gh_repo):
+    """Check whether a repository has no new events since its last analysis
+
+    The last enrichment must have finished.
+    """
+    if not gh_repo.events_etag:
+        return False
+    if gh_repo.pk not in finished_repos([gh_repo], IGHRaw, IGHEnrich, IGHEnrichArchived):
+        return False
+    return _no_new_events(gh_repo, _available_token(user, gh_repo.instance))
+
+
+def refresh_gh_repo_obj(user, gh_repo):
+    """Refresh a repository
+
+    If the repository has no changes, the intentions are archived
+    as done without running them.
+    """
+    if _unchanged(user, gh_repo):
+        created = now()
+        IGHRawArchived.objects.create(user=user, repo=gh_repo, created=created,
+                                      status=ArchivedIntention.OK)
+        IGHEnrichArchived.objects.create(user=user, repo=gh_repo, created=created,
+                                         status=ArchivedIntention.OK)
+        return True
+    return analyze_gh_repo_obj(user, gh_repo)
+
+
+def refresh_gh_repos(user, gh_repos):
+    """Refresh some repositories, see refresh_gh_repo_obj
+
+    The intentions and the tokens are read with a few queries for all the
+    repositories, and the repositories are checked in parallel. Those not
+    checked within CHECK_TOTAL_TIMEOUT are analyzed.
+    Return the repositories refreshed
+    """
+    gh_repos = list(gh_repos)
+    finished = finished_repos([gh_repo for gh_repo in gh_repos if gh_repo.events_etag],
+                              IGHRaw, IGHEnrich, IGHEnrichArchived)
+    checked = [gh_repo for gh_repo in gh_repos if gh_repo.pk in finished]
+    tokens = {}
+    for gh_repo in checked:
+        # Loaded here, the checks run in other threads without database access
+        instance = gh_repo.instance
+        if gh_repo.instance_id not in tokens:
+            tokens[gh_repo.instance_id] = _available_token(user, instance)
+    results = check_repos(lambda gh_repo: _no_new_events(gh_repo, tokens[gh_repo.instance_id]),
+                          checked, CHECK_WORKERS, CHECK_TOTAL_TIMEOUT)
+    unchanged, changed = [], []
+    for gh_repo in gh_repos:
+        (unchanged if results.get(gh_repo.pk) else changed).append(gh_repo)
+    archive_repos(user, unchanged, IGHRawArchived, IGHEnrichArchived)
+    return unchanged + analyze_gh_repos(user, changed)
@@ -0,0 +1,46 @@
+"""
+Detect changes in GitHub repositories without collecting them.
+
+Every activity in a repository (issues, pull requests, comments,
+pushes, stars, forks...) creates an event. The ETag of the first page
+of events is stored after each raw collection, and a conditional
+request with it returns 304 if there are no new events. GitHub does
+not count those responses against the rate limit.
+"""
+
+import logging
+
+import requests
+
+from .endpoints import api_url
+
+logger = logging.getLogger(__name__)
+
+# Maximum time (seconds) for the request
+TIMEOUT = 30
+
+
+def events_etag(repo, token, etag=None):
+    """Return the ETag of the events of a repository
+
+    :param repo:  GHRepo to check
+    :param token: GitHub token string
+    :param etag:  ETag known, to make a conditional request
+    :returns:     current ETag (the same one if the events didn't change),
+                  or None if it is not available
+    """
+    url = f'{api_url(repo.instance.endpoint)}/repos/{repo.owner}/{repo.repo}/events'
+    headers = {'Authorization': f'token {token}'}
+    if etag:
+        headers['If-None-Match'] = etag
+    try:
+        r = requests.get(url, params={'per_page': 1}, headers=headers, timeout=TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Cannot check events of {repo.url}: {e}")
+        return None
+    if r.status_code == 304:
+        return etag
+    if not r.ok:
+        logger.warning(f"Cannot check events of {repo.url}: {r.status_code}")
+        return None
+    return r.headers.get('ETag')
@@ -0,0 +1,17 @@
+GITHUB_ENDPOINT = 'https://github.com'
+
+
+def api_url(endpoint, graphql=False):
+    """Return the API URL for a GitHub instance endpoint
+
+    GitHub uses the api.github.com domain, GitHub Enterprise instances
+    the /api/v3 path of their endpoint, or /api/graphql for GraphQL.
+
+    :param endpoint: endpoint of the GitHub instance
+    :param graphql:  return the URL of the GraphQL API instead of REST
+    """
+    endpoint = endpoint.rstrip('/')
+    if endpoint == GITHUB_ENDPOINT:
+        url = 'https://api.github.com'
+        return f'{url}/graphql' if graphql else url
+    return f'{endpoint}/api/graphql' if graphql else f'{endpoint}/api/v3'
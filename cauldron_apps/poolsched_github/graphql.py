@@ -0,0 +1,159 @@
+import datetime
+import logging
+
+import requests
+
+from .endpoints import api_url, GITHUB_ENDPOINT
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of items GitHub returns in a GraphQL or REST page
+PAGE_SIZE = 100
+
+# Seconds to wait for each response
+TIMEOUT = 30
+
+# Prefix of the cursors of the REST listing, followed by the last page number
+REST_CURSOR = 'page:'
+
+OWNER_REPOSITORIES_QUERY = """
+query($owner: String!, $cursor: String, $pageSize: Int!) {
+  repositoryOwner(login: $owner) {
+    repositories(first: $pageSize, after: $cursor, privacy: PUBLIC, ownerAffiliations: OWNER,
+                 orderBy: {field: CREATED_AT, direction: ASC}) {
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+      nodes {
+        name
+        url
+        isFork
+      }
+    }
+  }
+}
+"""
+
+
+class OwnerListingError(Exception):
+    """Error listing the repositories of an owner, with any of the APIs"""
+
+
+class OwnerNotFound(OwnerListingError):
+    """The owner does not exist in the GitHub instance"""
+
+
+class GraphQLError(OwnerListingError):
+    """Error returned by the GitHub GraphQL API"""
+
+
+class GraphQLNotAvailable(GraphQLError):
+    """The GitHub instance has no GraphQL API"""
+
+
+class RateLimitExceeded(OwnerListingError):
+    """The token used for the request is exhausted"""
+
+    def __init__(self, seconds_to_reset):
+        self.seconds_to_reset = seconds_to_reset
+
+    def __str__(self):
+        return f"Rate limit exceeded, reset in {self.seconds_to_reset} seconds"
+
+
+def _seconds_to_reset(response):
+    reset = response.headers.get('X-RateLimit-Reset')
+    if not reset:
+        return 60
+    utcnow = datetime.datetime.now(datetime.timezone.utc).timestamp()
+    return max(int(reset) - int(utcnow) + 1, 1)
+
+
+def _check_rate_limit(response):
+    if response.status_code in (403, 429) and response.headers.get('X-RateLimit-Remaining') == '0':
+        raise RateLimitExceeded(_seconds_to_reset(response))
+
+
+def _query(session, url, query, variables):
+    """Run a query and return the data, raise an exception for errors"""
+    response = session.post(url, json={'query': query, 'variables': variables}, timeout=TIMEOUT)
+    _check_rate_limit(response)
+    if response.status_code == 404:
+        raise GraphQLNotAvailable(f"GraphQL API not found in {url}")
+    response.raise_for_status()
+    content = response.json()
+    errors = content.get('errors')
+    if errors:
+        if any(error.get('type') == 'RATE_LIMITED' for error in errors):
+            raise RateLimitExceeded(_seconds_to_reset(response))
+        raise GraphQLError('; '.join(error.get('message', '') for error in errors))
+    return content['data']
+
+
+def _graphql_owner_repositories(session, endpoint, owner, cursor):
+    url = api_url(endpoint, graphql=True)
+    while True:
+        data = _query(session, url, OWNER_REPOSITORIES_QUERY,
+                      {'owner': owner, 'cursor': cursor, 'pageSize': PAGE_SIZE})
+        if not data['repositoryOwner']:
+            raise OwnerNotFound(f"Owner {owner} not found")
+        repositories = data['repositoryOwner']['repositories']
+        page = [{'name': node['name'],
+                 'clone_url': f"{node['url']}.git",
+                 'fork': node['isFork']}
+                for node in repositories['nodes']]
+        cursor = repositories['pageInfo']['endCursor'] or cursor
+        yield page, cursor
+        if not repositories['pageInfo']['hasNextPage']:
+            break
+
+
+def _rest_owner_repositories(session, endpoint, owner, cursor):
+    url = f'{api_url(endpoint)}/users/{owner}/repos'
+    page = int(cursor[len(REST_CURSOR):]) if cursor else 0
+    while True:
+        page += 1
+        response = session.get(url, params={'type': 'owner', 'sort': 'created', 'direction': 'asc',
+                                            'per_page': PAGE_SIZE, 'page': page},
+                               timeout=TIMEOUT)
+        _check_rate_limit(response)
+        if response.status_code == 404:
+            raise OwnerNotFound(f"Owner {owner} not found")
+        response.raise_for_status()
+        items = response.json()
+        yield [{'name': item['name'],
+                'clone_url': item['clone_url'],
+                'fork': item['fork']}
+               for item in items if not item.get('private')], f'{REST_CURSOR}{page}'
+        if len(items) < PAGE_SIZE:
+            break
+
+
+def owner_repositories(token, owner, endpoint=GITHUB_ENDPOINT, cursor=None):
+    """Iterate over the public repositories of a GitHub user or organization.
+
+    Only the name, the clone URL and whether it is a fork are requested,
+    in pages of 100 repositories. Repositories are sorted by creation date,
+    so the cursor of a page can be used later to resume the listing.
+    GitHub Enterprise instances without GraphQL API are listed with the
+    REST API, and their cursors are page numbers.
+
+    :param token: GitHub token
+    :param owner: GitHub user or organization
+    :param endpoint: endpoint of the GitHub instance
+    :param cursor: cursor of the last page processed, None to start from the beginning
+    :returns: generator of tuples with a list of repositories (dicts with name,
+              clone_url and fork) and the cursor for that page
+    :raises OwnerListingError: OwnerNotFound, RateLimitExceeded or GraphQLError
+    """
+    with requests.Session() as session:
+        session.headers['Authorization'] = f'bearer {token}'
+        if not (cursor and cursor.startswith(REST_CURSOR)):
+            try:
+                yield from _graphql_owner_repositories(session, endpoint, owner, cursor)
+                return
+            except GraphQLNotAvailable as e:
+                logger.info(f"{e}, listing {owner} repositories with the REST API")
+                cursor = None
+        yield from _rest_owner_repositories(session, endpoint, owner, cursor)
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+from cauldron_apps.poolsched_utils.tokens import count_jobs
+
+
+def init_num_jobs(apps, schema_editor):
+    count_jobs(apps.get_model('poolsched_github', 'GHToken'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_github', '0004_auto_20201221_1619'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ghtoken',
+            name='num_jobs',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(init_num_jobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_github', '0006_ghtoken_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ghtoken',
+            name='shared',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_github', '0007_ghtoken_shared'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ghrepo',
+            name='events_etag',
+            field=models.CharField(blank=True, default=None, max_length=100, null=True),
+        ),
+    ]
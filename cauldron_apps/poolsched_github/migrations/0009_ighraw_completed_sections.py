@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_github', '0008_ghrepo_events_etag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ighraw',
+            name='completed_sections',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
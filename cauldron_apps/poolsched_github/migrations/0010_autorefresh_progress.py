@@ -0,0 +1,43 @@
+# Generated by Django 3.2.15 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_github', '0009_ighraw_completed_sections'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='igh2issueautorefresh',
+            name='refresh_progress',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='igh2issueautorefresh',
+            name='refresh_until',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='ighissueautorefresh',
+            name='refresh_progress',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='ighissueautorefresh',
+            name='refresh_until',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='ighrepoautorefresh',
+            name='refresh_progress',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='ighrepoautorefresh',
+            name='refresh_until',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
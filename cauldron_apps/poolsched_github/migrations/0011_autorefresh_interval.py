@@ -0,0 +1,28 @@
+# Generated by Django 3.2.15 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_github', '0010_autorefresh_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='igh2issueautorefresh',
+            name='refresh_interval',
+            field=models.PositiveIntegerField(default=60),
+        ),
+        migrations.AddField(
+            model_name='ighissueautorefresh',
+            name='refresh_interval',
+            field=models.PositiveIntegerField(default=60),
+        ),
+        migrations.AddField(
+            model_name='ighrepoautorefresh',
+            name='refresh_interval',
+            field=models.PositiveIntegerField(default=60),
+        ),
+    ]
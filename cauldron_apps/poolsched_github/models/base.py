@@ -1,10 +1,14 @@
 import logging
 
+import requests
 from django.db import models
 from django.conf import settings
 from django.utils.timezone import now
 
 from poolsched.models import Job
+from cauldron_apps.poolsched_utils.tokens import record_rate_headers
+
+from ..endpoints import api_url
 
 logger = logging.getLogger(__name__)
 global_logger = logging.getLogger()
@@ -36,6 +40,8 @@ class GHRepo(models.Model):
         to_field='name')
     # When the repo was created in the scheduler
     created = models.DateTimeField(default=now, blank=True)
+    # ETag of the repository events in the last collection
+    events_etag = models.CharField(max_length=100, null=True, default=None, blank=True)
 
     class Meta:
         db_table = TABLE_PREFIX + 'repo'
@@ -51,13 +57,15 @@ class GHRepo(models.Model):
 class GHToken(models.Model):
     """GitHub token"""
 
-    # Maximum number of jobs using a token concurrently
+    # Jobs using a token concurrently when its rate limit is unknown
     MAX_JOBS_TOKEN = 3
+    # Jobs using a token concurrently when its rate limit is full
+    MAX_JOBS_FRESH_TOKEN = 6
+    # Requests reserved for each job using the token
+    REQUESTS_PER_JOB = 500
 
     # GHToken string
     token = models.CharField(max_length=40)
-    # Rate limit remaining, last time it was checked
-    # rate = models.IntegerField(default=0)
     # Rate limit reset, last time it was checked
     reset = models.DateTimeField(default=now)
     # Instance for the token
@@ -73,6 +81,16 @@ class GHToken(models.Model):
         Job,
         related_name='ghtokens',
         related_query_name='ghtoken')
+    # Number of jobs using the token, updated by the token pool
+    num_jobs = models.PositiveIntegerField(default=0)
+    # Token in the shared pool of the instance, usable by other users
+    shared = models.BooleanField(default=False)
+    # Number of jobs accepted by the token with its current rate limit
+    max_jobs = models.PositiveIntegerField(default=MAX_JOBS_TOKEN)
+    # Rate limit remaining, limit and window reset, last time they were checked
+    rate_remaining = models.IntegerField(null=True, default=None, blank=True)
+    rate_limit = models.IntegerField(null=True, default=None, blank=True)
+    rate_reset = models.DateTimeField(null=True, default=None, blank=True)
     # TODO: Include instance
 
     class Meta:
@@ -83,3 +101,13 @@ class GHToken(models.Model):
     def is_ready(self):
         return now() > self.reset
 
+    def update_rate(self):
+        """Check the rate limit of the token, the request doesn't consume it"""
+        url = f'{api_url(self.instance.endpoint)}/rate_limit'
+        try:
+            r = requests.get(url, headers={'Authorization': f'token {self.token}'}, timeout=30)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Rate limit not available for {self}: {e}")
+            return False
+        return record_rate_headers(self, r.headers)
+
@@ -1,12 +1,13 @@
 import logging
-import datetime
 
 from django.db import models, transaction
-from django.db.models import Count
 from django.utils.timezone import now
 
 from poolsched.models import Intention, ArchivedIntention, Job
+from cauldron_apps.poolsched_utils.tokens import available_tokens, select_tokens, borrow_tokens, \
+    record_exhausted, SHARED_JOBS_PER_USER
 
+from ..changes import events_etag
 from ..mordred import GitHubRaw
 from .base import GHRepo, GHToken
 
@@ -23,10 +24,9 @@ class IRawManager(models.Manager):
         """Return a list of selectable IGHRaw intentions for a user
 
         A intention is selectable if:
-        * its user has a usable token
+        * its user has a usable token, or can borrow a token
+          from the shared pool of the instance of the repo
         * no job is still associated with it
-        * (future) in fact, either its user has a usable token,
-          or there is other (public) token available
         It's not important if there is other job for the same repo,
         that will be checked later.
 
@@ -34,17 +34,29 @@ class IRawManager(models.Manager):
         :param max:  maximum number of intentions to return
         :returns:    list of IGHRaw intentions
         """
-        token_available = user.ghtokens.annotate(num_jobs=Count('jobs'))\
-            .filter(num_jobs__lt=GHToken.MAX_JOBS_TOKEN)\
-            .filter(reset__lt=now())\
-            .exists()
-        if not token_available:
-            logger.debug('No selectable intentions for this user (no token available)')
-            return []
         intentions = self.filter(previous=None,
                                  user=user,
                                  job=None)
-        return intentions.all()[:max]
+        if available_tokens(user.ghtokens.all()).exists():
+            return intentions.all()[:max]
+        # The pool only lends tokens for repositories of its instance
+        instances = []
+        if self.borrowed_jobs(user) < SHARED_JOBS_PER_USER:
+            instances = list(available_tokens(self.pool_tokens(user)).values_list('instance', flat=True))
+        if not instances:
+            logger.debug('No selectable intentions for this user (no token available)')
+            return []
+        return intentions.filter(repo__instance__in=instances)[:max]
+
+    def pool_tokens(self, user):
+        """Tokens of the shared pool that the user can borrow"""
+        return GHToken.objects.filter(shared=True).exclude(user=user)
+
+    def borrowed_jobs(self, user):
+        """Number of jobs of the user running with borrowed tokens"""
+        return self.filter(user=user, job__ghtoken__shared=True)\
+            .exclude(job__ghtoken__user=user)\
+            .values('job').distinct().count()
 
 
 class IGHRaw(Intention):
@@ -52,6 +64,8 @@ class IGHRaw(Intention):
 
     # GHRepo to analyze
     repo = models.ForeignKey(GHRepo, on_delete=models.PROTECT)
+    # Sections collected before the job was interrupted by the rate limit
+    completed_sections = models.JSONField(default=list, blank=True)
 
     class Meta:
         db_table = TABLE_PREFIX + 'iraw'
@@ -102,6 +116,14 @@ class IGHRaw(Intention):
             return intention.update_job_worker(worker)
         return None
 
+    def _select_tokens(self):
+        """Select the least loaded token of the user, or borrow one from the pool"""
+        tokens = select_tokens(self.user.ghtokens.all())
+        if not tokens:
+            pool = IGHRaw.objects.pool_tokens(self.user).filter(instance=self.repo.instance)
+            tokens = borrow_tokens(pool, IGHRaw.objects.borrowed_jobs(self.user))
+        return tokens
+
     def create_previous(self):
         """Create all needed previous intentions (no previous intention needed)"""
         return []
@@ -124,14 +146,10 @@ class IGHRaw(Intention):
             # No intention with a job for the same repo found
             return None
         self.save()
-        # Get tokens for the user, and assign them to job
-        tokens = GHToken.objects.filter(user=self.user)
-        token_included = False
-        for token in tokens:
-            if token.jobs.count() < token.MAX_JOBS_TOKEN:
-                token_included = True
-                token.jobs.add(self.job)
-        if token_included:
+        # Assign the best token of the user, or of the shared pool, to the job
+        tokens = self._select_tokens()
+        if tokens:
+            self.job.ghtokens.add(*tokens)
             return self.job
         else:
             return None
@@ -143,14 +161,14 @@ class IGHRaw(Intention):
         If the worker didn't create the job, return None
 
         A IRaW intention cannot run if there are too many jobs
-        using available tokens.
+        using available tokens. The least loaded token of the user
+        is assigned to the job, or a token of the shared pool if the
+        user has no capacity left.
 
         :param worker: Worker willing to create the job.
         :returns:      Job created by the worker, or None
         """
-        tokens = self.user.ghtokens\
-            .annotate(num_jobs=Count('jobs'))\
-            .filter(num_jobs__lt=GHToken.MAX_JOBS_TOKEN)
+        tokens = self._select_tokens()
         # Only create the job if there is at least one token
         if tokens:
             job = super().create_job(worker)
@@ -165,15 +183,18 @@ class IGHRaw(Intention):
 
         :param job: job to be run
         """
-        token = job.ghtokens.filter(reset__lt=now()).first()
+        token = job.ghtokens.filter(reset__lt=now()).order_by('num_jobs').first()
         logger.info(f"Running GitHubRaw intention: {self.repo.owner}/{self.repo.repo}, token: {token}")
         if not token:
             logger.error(f'Token not found for intention {self}')
             raise Job.StopException
+        # Events until now will be collected
+        etag = events_etag(self.repo, token.token)
         handler = self._create_log_handler(job)
         try:
             global_logger.addHandler(handler)
-            runner = GitHubRaw(url=self.repo.url, token=token.token)
+            runner = GitHubRaw(url=self.repo.url, token=token.token,
+                               completed_sections=self.completed_sections)
             output = runner.run()
         except Exception as e:
             logger.error(f"Error running GitHubRaw intention {str(e)}")
@@ -183,11 +204,19 @@ class IGHRaw(Intention):
 
         if output == 1:
             logger.error(f"Error running GitHubRaw intention {self}")
+            token.update_rate()
             raise Job.StopException
         if output:
-            token.reset = now() + datetime.timedelta(minutes=output)
-            token.save()
+            record_exhausted(token, output)
+            # The next run will skip the sections already collected
+            self.completed_sections = runner.completed_sections
+            self.save(update_fields=['completed_sections'])
             return False
+        token.update_rate()
+        # Sections collected in a previous run may have missed events
+        # before the ETag, so it is only valid for complete runs
+        self.repo.events_etag = None if self.completed_sections else etag
+        self.repo.save(update_fields=['events_etag'])
         return True
 
     def archive(self, status=ArchivedIntention.OK, arch_job=None):
@@ -1,24 +1,22 @@
 import logging
 import json
-import math
-import time
 import traceback
-import sqlalchemy
+
+from django.conf import settings
 
 try:
     from sirmordred.config import Config
     from sirmordred.task_projects import TaskProjects
-    from sirmordred.task_collection import TaskRawDataCollection
     from sirmordred.task_enrich import TaskEnrich
-    from grimoire_elk.enriched.enrich import Enrich
 except ImportError:
     from cauldron_apps.poolsched_utils.mordred import sirmordred_fake
     Config = sirmordred_fake.Config
     TaskProjects = sirmordred_fake.TaskProjects
-    TaskRawDataCollection = sirmordred_fake.TaskRawDataCollection
     TaskEnrich = sirmordred_fake.TaskEnrich
 
-from cauldron_apps.poolsched_utils.mordred.backend import Backend
+from cauldron_apps.poolsched_utils.mordred.backend import Backend, collect_sections
+from cauldron_apps.poolsched_utils.mordred.es_sizes import adaptive_bulk_size
+from cauldron_apps.poolsched_utils.mordred.retry import create_task
 
 
 logger = logging.getLogger(__name__)
@@ -28,10 +26,16 @@ BACKEND_SECTIONS = ['github:issue', 'github:repo', 'github2:issue']
 
 
 class GitHubRaw(Backend):
-    def __init__(self, url, token):
+    name = 'github'
+
+    def __init__(self, url, token, parallel=None, completed_sections=None):
         super().__init__()
         self.url = url
         self.token = token
+        # Sections collected in previous runs, updated with the new ones
+        self.completed_sections = list(completed_sections or [])
+        # Collect the sections at the same time
+        self.parallel = settings.RAW_PARALLEL_SECTIONS if parallel is None else parallel
         projects = {'Project': {}}
         for section in BACKEND_SECTIONS:
             projects['Project'][section] = [self.url]
@@ -46,29 +50,13 @@ class GitHubRaw(Backend):
         Return 0 or None for success, 1 for error, other for time to reset in minutes
         """
         TaskProjects(self.config).execute()
-        for section in BACKEND_SECTIONS:
-            task = TaskRawDataCollection(self.config, backend_section=section)
-
-            try:
-                out_repos = task.execute()
-                repo = out_repos[0]
-                if 'error' in repo and repo['error']:
-                    logger.error(repo['error'])
-                    if repo['error'].startswith('RateLimitError'):
-                        seconds_to_reset = float(repo['error'].split(' ')[-1])
-                        restart_minutes = math.ceil(seconds_to_reset / 60) + 2
-                        logger.warning("RateLimitError. This task will be restarted in: "
-                                       "{} minutes".format(restart_minutes))
-                        return restart_minutes
-                    return 1
-
-            except Exception as e:
-                logger.error("Error in raw data retrieval from {}. Cause: {}".format(section, e))
-                traceback.print_exc()
-                return 1
+        return collect_sections(self.config, BACKEND_SECTIONS, parallel=self.parallel,
+                                completed=self.completed_sections)
 
 
 class GitHubEnrich(Backend):
+    name = 'github'
+
     def __init__(self, url):
         super().__init__()
         self.url = url
@@ -85,25 +73,11 @@ class GitHubEnrich(Backend):
         """
         TaskProjects(self.config).execute()
         for section in BACKEND_SECTIONS:
-            task = None
-            while not task:
-                try:
-                    task = TaskEnrich(self.config, backend_section=section)
-                except sqlalchemy.exc.InternalError:
-                    # There is a race condition in the code
-                    logger.error('SQLAlchemy internal error')
-                    task = None
-                    time.sleep(1)
-
             try:
-                task.execute()
+                task = create_task(TaskEnrich, self.config, backend_section=section)
+                with adaptive_bulk_size(self.name):
+                    task.execute()
             except Exception as e:
                 logger.warning("Error enriching data for {}. Cause: {}".format(section, e))
                 traceback.print_exc()
                 return 1
-            finally:
-                if task.db:
-                    task.db._engine.dispose()
-                if Enrich.sh_db:
-                    Enrich.sh_db._engine.dispose()
-                    Enrich.sh_db = None
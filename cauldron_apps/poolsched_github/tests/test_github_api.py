@@ -0,0 +1,56 @@
+import datetime
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils.timezone import now
+
+from poolsched.models import ArchivedIntention
+from ..api import refresh_gh_repos
+from ..models import GHInstance, GHRepo, GHToken, IGHRaw, IGHRawArchived, IGHEnrichArchived
+
+User = get_user_model()
+
+
+class TestRefreshRepos(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='A')
+        instance = GHInstance.objects.get(name='GitHub')
+        GHToken.objects.create(token='1234567890', user=self.user,
+                               reset=now() - datetime.timedelta(minutes=1))
+        self.repos = [GHRepo.objects.create(owner='owner', repo=f'repo-{i}', instance=instance, events_etag='"a"')
+                      for i in range(3)]
+        for repo in self.repos:
+            IGHEnrichArchived.objects.create(user=self.user, repo=repo, created=now(),
+                                             status=ArchivedIntention.OK)
+
+    def test_unchanged(self):
+        """Repositories without new events are archived, the others analyzed"""
+        etags = {'repo-0': '"a"', 'repo-1': '"b"', 'repo-2': None}
+        with mock.patch('cauldron_apps.poolsched_github.api.events_etag',
+                        side_effect=lambda repo, token, etag: etags[repo.repo]):
+            refreshed = refresh_gh_repos(self.user, self.repos)
+        self.assertEqual(len(refreshed), 3)
+        self.assertTrue(IGHRawArchived.objects.filter(repo=self.repos[0]).exists())
+        self.assertFalse(IGHRaw.objects.filter(repo=self.repos[0]).exists())
+        for repo in self.repos[1:]:
+            self.assertTrue(IGHRaw.objects.filter(user=self.user, repo=repo).exists())
+
+    def test_timeout(self):
+        """Repositories not checked in time are analyzed"""
+        blocked = threading.Event()
+
+        def events_etag(repo, token, etag):
+            if repo.repo == 'repo-0':
+                blocked.wait(5)
+            return etag
+
+        with mock.patch('cauldron_apps.poolsched_github.api.events_etag', side_effect=events_etag), \
+                mock.patch('cauldron_apps.poolsched_github.api.CHECK_TOTAL_TIMEOUT', 0.5):
+            refresh_gh_repos(self.user, self.repos)
+        blocked.set()
+        self.assertTrue(IGHRaw.objects.filter(repo=self.repos[0]).exists())
+        for repo in self.repos[1:]:
+            self.assertFalse(IGHRaw.objects.filter(repo=repo).exists())
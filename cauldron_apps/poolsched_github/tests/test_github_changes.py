@@ -0,0 +1,34 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..changes import events_etag
+
+
+def github_repo():
+    return mock.Mock(owner='owner', repo='repo', url='https://github.com/owner/repo',
+                     instance=mock.Mock(endpoint='https://github.com'))
+
+
+class TestChanges(SimpleTestCase):
+
+    @mock.patch('requests.get')
+    def test_new_etag(self, get):
+        """The ETag of the events is returned"""
+        get.return_value = mock.Mock(status_code=200, ok=True, headers={'ETag': '"abc"'})
+        self.assertEqual(events_etag(github_repo(), 'token'), '"abc"')
+        self.assertEqual(get.call_args[0][0], 'https://api.github.com/repos/owner/repo/events')
+        self.assertNotIn('If-None-Match', get.call_args[1]['headers'])
+
+    @mock.patch('requests.get')
+    def test_not_modified(self, get):
+        """Conditional requests return the same ETag when there are no events"""
+        get.return_value = mock.Mock(status_code=304, ok=False, headers={})
+        self.assertEqual(events_etag(github_repo(), 'token', etag='"abc"'), '"abc"')
+        self.assertEqual(get.call_args[1]['headers']['If-None-Match'], '"abc"')
+
+    @mock.patch('requests.get')
+    def test_error(self, get):
+        """Errors return None, so the repository is collected"""
+        get.return_value = mock.Mock(status_code=404, ok=False, headers={})
+        self.assertIsNone(events_etag(github_repo(), 'token', etag='"abc"'))
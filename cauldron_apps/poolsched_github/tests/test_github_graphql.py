@@ -0,0 +1,110 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..graphql import owner_repositories, OwnerNotFound, RateLimitExceeded, TIMEOUT
+
+
+def graphql_response(nodes, has_next_page, end_cursor, status_code=200, headers=None):
+    response = mock.Mock(status_code=status_code, headers=headers or {})
+    response.json.return_value = {
+        'data': {
+            'repositoryOwner': {
+                'repositories': {
+                    'pageInfo': {'hasNextPage': has_next_page, 'endCursor': end_cursor},
+                    'nodes': nodes
+                }
+            }
+        }
+    }
+    return response
+
+
+def rest_response(items, status_code=200, headers=None):
+    response = mock.Mock(status_code=status_code, headers=headers or {})
+    response.json.return_value = items
+    return response
+
+
+def rest_item(name, fork=False, private=False):
+    return {'name': name, 'clone_url': f'https://github.example.com/owner/{name}.git',
+            'fork': fork, 'private': private}
+
+
+class TestGraphQL(SimpleTestCase):
+
+    @mock.patch('requests.Session.post')
+    def test_pages(self, post):
+        """Repositories are returned by page, with the cursor of the page"""
+        post.side_effect = [
+            graphql_response([{'name': 'a', 'url': 'https://github.com/owner/a', 'isFork': False}], True, 'c1'),
+            graphql_response([{'name': 'b', 'url': 'https://github.com/owner/b', 'isFork': True}], False, 'c2'),
+        ]
+        pages = list(owner_repositories('token', 'owner'))
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(pages[0], ([{'name': 'a', 'clone_url': 'https://github.com/owner/a.git', 'fork': False}], 'c1'))
+        self.assertEqual(pages[1][1], 'c2')
+        self.assertTrue(pages[1][0][0]['fork'])
+        self.assertEqual(post.call_args_list[1][1]['json']['variables']['cursor'], 'c1')
+        self.assertEqual(post.call_args[1]['timeout'], TIMEOUT)
+
+    @mock.patch('requests.Session.post')
+    def test_resume(self, post):
+        """The listing starts after the cursor given"""
+        post.return_value = graphql_response([], False, None)
+        pages = list(owner_repositories('token', 'owner', cursor='c1'))
+        self.assertEqual(pages, [([], 'c1')])
+        self.assertEqual(post.call_args[1]['json']['variables']['cursor'], 'c1')
+
+    @mock.patch('requests.Session.post')
+    def test_rate_limit(self, post):
+        """Exhausted tokens raise RateLimitExceeded"""
+        post.return_value = mock.Mock(status_code=403, headers={'X-RateLimit-Remaining': '0'})
+        with self.assertRaises(RateLimitExceeded):
+            list(owner_repositories('token', 'owner'))
+
+    @mock.patch('requests.Session.post')
+    def test_unknown_owner(self, post):
+        """Unknown owners raise OwnerNotFound"""
+        response = mock.Mock(status_code=200, headers={})
+        response.json.return_value = {'data': {'repositoryOwner': None}}
+        post.return_value = response
+        with self.assertRaises(OwnerNotFound):
+            list(owner_repositories('token', 'owner'))
+
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.post')
+    def test_rest_fallback(self, post, get):
+        """Instances without GraphQL API are listed with the REST API"""
+        post.return_value = mock.Mock(status_code=404, headers={})
+        get.side_effect = [
+            rest_response([rest_item(str(i)) for i in range(99)] + [rest_item('private', private=True)]),
+            rest_response([rest_item('fork', fork=True)]),
+        ]
+        pages = list(owner_repositories('token', 'owner', endpoint='https://github.example.com'))
+        self.assertEqual([cursor for _, cursor in pages], ['page:1', 'page:2'])
+        self.assertEqual(len(pages[0][0]), 99)
+        self.assertEqual(pages[1][0], [{'name': 'fork', 'clone_url': 'https://github.example.com/owner/fork.git',
+                                        'fork': True}])
+        self.assertEqual(get.call_args[0][0], 'https://github.example.com/api/v3/users/owner/repos')
+        self.assertEqual(get.call_args[1]['params']['page'], 2)
+        self.assertEqual(get.call_args[1]['timeout'], TIMEOUT)
+
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.post')
+    def test_rest_unknown_owner(self, post, get):
+        """Unknown owners listed with the REST API raise OwnerNotFound"""
+        post.return_value = mock.Mock(status_code=404, headers={})
+        get.return_value = rest_response({'message': 'Not Found'}, status_code=404)
+        with self.assertRaises(OwnerNotFound):
+            list(owner_repositories('token', 'owner', endpoint='https://github.example.com'))
+
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.get')
+    def test_rest_resume(self, get, post):
+        """REST cursors resume the listing after their page"""
+        get.return_value = rest_response([])
+        pages = list(owner_repositories('token', 'owner', endpoint='https://github.example.com', cursor='page:3'))
+        self.assertEqual(pages, [([], 'page:4')])
+        self.assertEqual(get.call_args[1]['params']['page'], 4)
+        post.assert_not_called()
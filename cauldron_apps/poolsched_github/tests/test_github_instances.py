@@ -1,6 +1,7 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from django.db import IntegrityError
 
+from ..endpoints import api_url
 from ..models import GHInstance
 
 GITHUB_INSTANCE = GHInstance.objects.get(name='GitHub')
@@ -30,3 +31,17 @@ class TestBasic(TestCase):
         with self.assertRaises(IntegrityError):
             instance = GHInstance.objects.create(name='GitHub A',
                                                  endpoint='https://api.gha.com')
+
+
+class TestEndpoints(SimpleTestCase):
+
+    def test_github(self):
+        """GitHub uses the API domain"""
+        self.assertEqual(api_url('https://github.com'), 'https://api.github.com')
+        self.assertEqual(api_url('https://github.com/', graphql=True), 'https://api.github.com/graphql')
+
+    def test_enterprise(self):
+        """Enterprise instances use a path of their endpoint"""
+        self.assertEqual(api_url('https://github.example.com/'), 'https://github.example.com/api/v3')
+        self.assertEqual(api_url('https://github.example.com', graphql=True),
+                         'https://github.example.com/api/graphql')
@@ -1,5 +1,6 @@
 import logging
 import datetime
+from unittest import mock
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
@@ -104,6 +105,22 @@ class TestMethods(TestCase):
         job = self.iraw1.running_job()
         self.assertEqual(job, new_job)
 
+    def test_create_job_shared(self):
+        """Test create GitHub.IGHRaw job with a token of the shared pool"""
+        self.token2.shared = True
+        self.token2.save()
+        job = self.iraw1.create_job(self.worker1)
+        self.assertIn(self.token2, job.ghtokens.all())
+        self.assertEqual(IGHRaw.objects.borrowed_jobs(self.user1), 1)
+
+    def test_create_job_shared_quota(self):
+        """Test create GitHub.IGHRaw job when the user used its share of the pool"""
+        self.token2.shared = True
+        self.token2.save()
+        with mock.patch('cauldron_apps.poolsched_utils.tokens.SHARED_JOBS_PER_USER', 0):
+            job = self.iraw1.create_job(self.worker1)
+        self.assertEqual(job, None)
+
 
 class TestSelectableIntentions(TestCase):
 
@@ -186,3 +203,43 @@ class TestSelectableIntentions(TestCase):
         """Test one ready, without token"""
         intentions = IGHRaw.objects.selectable_intentions(user=self.user7, max=2)
         self.assertEqual(len(intentions), 0)
+
+
+@mock.patch.object(GHToken, 'update_rate')
+@mock.patch.object(IGHRaw, '_create_log_handler', return_value=logging.NullHandler())
+@mock.patch('cauldron_apps.poolsched_github.models.iraw.events_etag', return_value='"etag"')
+@mock.patch('cauldron_apps.poolsched_github.models.iraw.GitHubRaw')
+class TestRun(TestCase):
+
+    def setUp(self):
+        self.repo = GHRepo.objects.create(owner='owner', repo='repo', instance=GITHUB_INSTANCE)
+        self.user = User.objects.create(username='A')
+        self.iraw = IGHRaw.objects.create(repo=self.repo, user=self.user)
+        self.token = GHToken.objects.create(token='0123456', user=self.user)
+        self.job = Job.objects.create()
+        self.token.jobs.add(self.job)
+
+    def test_complete(self, raw_class, events_etag, create_log_handler, update_rate):
+        """Complete runs store the ETag of the events"""
+        raw_class.return_value.run.return_value = None
+        raw_class.return_value.completed_sections = []
+        self.assertTrue(self.iraw.run(self.job))
+        self.assertEqual(raw_class.call_args[1]['completed_sections'], [])
+        self.repo.refresh_from_db()
+        self.assertEqual(self.repo.events_etag, '"etag"')
+
+    def test_resume(self, raw_class, events_etag, create_log_handler, update_rate):
+        """Rate limited runs are resumed from the sections not collected"""
+        runner = raw_class.return_value
+        runner.run.return_value = 10
+        runner.completed_sections = ['github:issue']
+        self.assertFalse(self.iraw.run(self.job))
+        iraw = IGHRaw.objects.get(pk=self.iraw.pk)
+        self.assertEqual(iraw.completed_sections, ['github:issue'])
+
+        GHToken.objects.filter(pk=self.token.pk).update(reset=now() - datetime.timedelta(minutes=1))
+        runner.run.return_value = None
+        self.assertTrue(iraw.run(self.job))
+        self.assertEqual(raw_class.call_args[1]['completed_sections'], ['github:issue'])
+        self.repo.refresh_from_db()
+        self.assertIsNone(self.repo.events_etag)
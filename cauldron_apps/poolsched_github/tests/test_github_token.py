@@ -5,6 +5,7 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 
 from poolsched.models import Job
+from cauldron_apps.poolsched_utils.tokens import available_tokens, record_rate, record_rate_headers
 from ..models import GHToken
 
 User = get_user_model()
@@ -35,3 +36,95 @@ class TestBasic(TestCase):
         self.assertIsNone(token.user)
         self.assertEqual(token.jobs.count(), 1)
         self.assertEqual(token.jobs.first(), job)
+
+
+class TestRate(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='Alice')
+        self.token = GHToken.objects.create(token='1234567890', user=self.user)
+
+    def test_unknown_rate(self):
+        """Tokens with unknown rate accept MAX_JOBS_TOKEN jobs"""
+        self.assertEqual(self.token.max_jobs, GHToken.MAX_JOBS_TOKEN)
+        self.assertIsNone(self.token.rate_remaining)
+
+    def test_record_rate(self):
+        """The capacity of the token depends on the requests remaining"""
+        reset = timezone.now() + datetime.timedelta(minutes=30)
+        record_rate(self.token, 5000, limit=5000, reset=reset)
+        self.assertEqual(self.token.max_jobs, GHToken.MAX_JOBS_FRESH_TOKEN)
+        record_rate(self.token, GHToken.REQUESTS_PER_JOB - 1, reset=reset)
+        self.assertEqual(self.token.max_jobs, 0)
+        self.assertEqual(self.token.rate_limit, 5000)
+        self.assertFalse(available_tokens(self.user.ghtokens.all()).exists())
+
+    def test_exhausted(self):
+        """Exhausted tokens are not used until the reset"""
+        reset = timezone.now() + datetime.timedelta(minutes=30)
+        record_rate(self.token, 0, reset=reset)
+        token = GHToken.objects.get(pk=self.token.pk)
+        self.assertEqual(token.reset, reset)
+        self.assertFalse(token.is_ready)
+
+    def test_window_reset(self):
+        """Tokens have their full quota again after the rate window"""
+        reset = timezone.now() - datetime.timedelta(minutes=1)
+        record_rate(self.token, 0, reset=reset)
+        self.assertTrue(available_tokens(self.user.ghtokens.all()).exists())
+
+    def test_record_rate_headers(self):
+        """The rate limit is read from the GitHub headers"""
+        reset = timezone.now() + datetime.timedelta(minutes=30)
+        headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Limit': '5000',
+                   'X-RateLimit-Reset': str(int(reset.timestamp()))}
+        self.assertTrue(record_rate_headers(self.token, headers))
+        token = GHToken.objects.get(pk=self.token.pk)
+        self.assertEqual(token.rate_remaining, 0)
+        self.assertEqual(token.rate_limit, 5000)
+        self.assertEqual(token.reset, reset.replace(microsecond=0))
+        self.assertEqual(token.max_jobs, 0)
+
+    def test_record_rate_missing_headers(self):
+        """Responses without valid rate limit headers are ignored"""
+        self.assertFalse(record_rate_headers(self.token, {}))
+        self.assertFalse(record_rate_headers(self.token, {'X-RateLimit-Remaining': 'unknown'}))
+        self.assertTrue(record_rate_headers(self.token, {'X-RateLimit-Remaining': '4000'}))
+        token = GHToken.objects.get(pk=self.token.pk)
+        self.assertEqual(token.rate_remaining, 4000)
+        self.assertIsNone(token.rate_limit)
+        self.assertIsNone(token.rate_reset)
+
+
+class TestNumJobs(TestCase):
+
+    def setUp(self):
+        self.token = GHToken.objects.create(token='1234567890')
+        self.jobs = [Job.objects.create() for _ in range(3)]
+
+    def num_jobs(self):
+        return GHToken.objects.get(pk=self.token.pk).num_jobs
+
+    def test_add_remove(self):
+        """Jobs added to or removed from a token update its counter"""
+        self.token.jobs.add(*self.jobs)
+        self.assertEqual(self.num_jobs(), 3)
+        self.token.jobs.remove(self.jobs[0])
+        self.assertEqual(self.num_jobs(), 2)
+        self.token.jobs.clear()
+        self.assertEqual(self.num_jobs(), 0)
+
+    def test_reverse(self):
+        """Tokens added to a job update their counters"""
+        other = GHToken.objects.create(token='0987654321')
+        self.jobs[0].ghtokens.add(self.token, other)
+        self.assertEqual(self.num_jobs(), 1)
+        self.assertEqual(GHToken.objects.get(pk=other.pk).num_jobs, 1)
+        self.jobs[0].ghtokens.remove(other)
+        self.assertEqual(GHToken.objects.get(pk=other.pk).num_jobs, 0)
+
+    def test_job_deleted(self):
+        """Deleted jobs are not counted"""
+        self.token.jobs.add(*self.jobs)
+        self.jobs[0].delete()
+        self.assertEqual(self.num_jobs(), 2)
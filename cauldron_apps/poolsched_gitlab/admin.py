@@ -95,9 +95,9 @@ class GHGLRepositoryAdmin(admin.ModelAdmin):
 
 @admin.register(GLToken)
 class TokenAdmin(admin.ModelAdmin):
-    list_display = ('id', 'reset', 'expiring_token', 'expiration_date', user_name, 'job_count', 'instance_name')
+    list_display = ('id', 'reset', 'expiring_token', 'expiration_date', user_name, 'shared', 'job_count', 'instance_name')
     search_fields = ('id', 'user__first_name')
-    list_filter = ('reset',)
+    list_filter = ('reset', 'shared')
     ordering = ('id',)
 
     def job_count(self, obj):
@@ -1,9 +1,28 @@
-from .models import GLInstance, GLRepo, IGLRaw, IGLEnrich
+from django.utils.timezone import now
+
+from poolsched.models import ArchivedIntention
+
+from cauldron_apps.poolsched_utils.intentions import analyze_repos, archive_repos, finished_repos
+from cauldron_apps.poolsched_utils.parallel import check_repos
+
+from .changes import last_activity
+from .models import GLInstance, GLRepo, GLToken, IGLRaw, IGLEnrich, IGLRawArchived, IGLEnrichArchived
+
+# Repositories checked at once when refreshing several repositories
+CHECK_WORKERS = 8
+# Maximum time (seconds) to check the repositories refreshed at once
+CHECK_TOTAL_TIMEOUT = 120
+
+
+def _can_analyze(user, instance):
+    """The user has tokens, or there are tokens in the shared pool of the instance"""
+    return user.gltokens.filter(instance=instance).exists() or \
+        GLToken.objects.filter(shared=True, instance=instance).exists()
 
 
 def analyze_gl_repo(user, owner, repo, instance):
     """owner, repo"""
-    if user.gltokens.filter(instance=instance).count() < 1:
+    if not _can_analyze(user, instance):
         return None
     gl_repo, _ = GLRepo.objects.get_or_create(owner=owner, repo=repo, instance=instance)
     raw, _ = IGLRaw.objects.get_or_create(user=user, repo=gl_repo)
@@ -13,9 +32,91 @@ def analyze_gl_repo(user, owner, repo, instance):
 
 
 def analyze_gl_repo_obj(user, gl_repo):
-    if user.gltokens.filter(instance=gl_repo.instance).count() < 1:
+    if not _can_analyze(user, gl_repo.instance):
         return False
     raw, _ = IGLRaw.objects.get_or_create(user=user, repo=gl_repo)
     enrich, _ = IGLEnrich.objects.get_or_create(user=user, repo=gl_repo)
     enrich.previous.add(raw)
     return True
+
+
+def analyze_gl_repos(user, gl_repos):
+    """Create the intentions to analyze some repositories in a few queries
+
+    Return the repositories with intentions, the ones of instances
+    without tokens available are skipped
+    """
+    gl_repos = list(gl_repos)
+    instances = {gl_repo.instance_id: gl_repo.instance for gl_repo in gl_repos}
+    allowed = {pk for pk, instance in instances.items() if _can_analyze(user, instance)}
+    gl_repos = [gl_repo for gl_repo in gl_repos if gl_repo.instance_id in allowed]
+    analyze_repos(user, gl_repos, IGLRaw, IGLEnrich)
+    return gl_repos
+
+
+def _available_token(user, instance):
+    """Token of the user, or of the shared pool of the instance, not rate limited"""
+    return user.gltokens.filter(instance=instance, reset__lt=now()).first() or \
+        GLToken.objects.filter(shared=True, instance=instance, reset__lt=now()).first()
+
+
+def _no_new_activity(gl_repo, token):
+    """Check whether a repository has no activity since its last collection"""
+    if not token:
+        return False
+    return last_activity(gl_repo, token.token) == gl_repo.last_activity
+
+
+def _unchanged(user, gl_repo):
+    """Check whether a repository has no activity since its last analysis
+
+    The last enrichment must have finished.
+    """
+    if not gl_repo.last_activity:
+        return False
+    if gl_repo.pk not in finished_repos([gl_repo], IGLRaw, IGLEnrich, IGLEnrichArchived):
+        return False
+    return _no_new_activity(gl_repo, _available_token(user, gl_repo.instance))
+
+
+def refresh_gl_repo_obj(user, gl_repo):
+    """Refresh a repository
+
+    If the repository has no changes, the intentions are archived
+    as done without running them.
+    """
+    if _unchanged(user, gl_repo):
+        created = now()
+        IGLRawArchived.objects.create(user=user, repo=gl_repo, created=created,
+                                      status=ArchivedIntention.OK)
+        IGLEnrichArchived.objects.create(user=user, repo=gl_repo, created=created,
+                                         status=ArchivedIntention.OK)
+        return True
+    return analyze_gl_repo_obj(user, gl_repo)
+
+
+def refresh_gl_repos(user, gl_repos):
+    """Refresh some repositories, see refresh_gl_repo_obj
+
+    The intentions and the tokens are read with a few queries for all the
+    repositories, and the repositories are checked in parallel. Those not
+    checked within CHECK_TOTAL_TIMEOUT are analyzed.
+    Return the repositories refreshed
+    """
+    gl_repos = list(gl_repos)
+    finished = finished_repos([gl_repo for gl_repo in gl_repos if gl_repo.last_activity],
+                              IGLRaw, IGLEnrich, IGLEnrichArchived)
+    checked = [gl_repo for gl_repo in gl_repos if gl_repo.pk in finished]
+    tokens = {}
+    for gl_repo in checked:
+        # Loaded here, the checks run in other threads without database access
+        instance = gl_repo.instance
+        if gl_repo.instance_id not in tokens:
+            tokens[gl_repo.instance_id] = _available_token(user, instance)
+    results = check_repos(lambda gl_repo: _no_new_activity(gl_repo, tokens[gl_repo.instance_id]),
+                          checked, CHECK_WORKERS, CHECK_TOTAL_TIMEOUT)
+    unchanged, changed = [], []
+    for gl_repo in gl_repos:
+        (unchanged if results.get(gl_repo.pk) else changed).append(gl_repo)
+    archive_repos(user, unchanged, IGLRawArchived, IGLEnrichArchived)
+    return unchanged + analyze_gl_repos(user, changed)
@@ -3,6 +3,8 @@ from django.conf import settings
 from django.db.models.signals import post_migrate
 import logging
 
+from cauldron_apps.poolsched_utils.tokens import track_jobs
+
 
 Logger = logging.getLogger(__name__)
 
@@ -41,3 +43,5 @@ class CauldronGitlabConfig(AppConfig):
     def ready(self):
         # Load after the migration is done
         post_migrate.connect(load_gitlab_instances, sender=self)
+        # Keep the number of jobs of each token updated
+        track_jobs(self.get_model('GLToken'))
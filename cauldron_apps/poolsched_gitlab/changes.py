@@ -0,0 +1,41 @@
+"""
+Detect changes in GitLab repositories without collecting them.
+
+GitLab projects have a `last_activity_at` attribute, updated with
+issues, merge requests, comments and pushes. It is stored after each
+raw collection, and compared with the current one before a refresh.
+GitLab updates it at most once per hour, so values more recent than
+ACTIVITY_GRANULARITY are not trusted.
+"""
+
+import datetime
+import logging
+from urllib.parse import quote, urljoin
+
+import requests
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Maximum time (seconds) for the request
+TIMEOUT = 30
+# Period at which GitLab updates last_activity_at
+ACTIVITY_GRANULARITY = datetime.timedelta(hours=1)
+
+
+def last_activity(repo, token):
+    """Return the date of the last activity in a repository
+
+    :param repo:  GLRepo to check
+    :param token: GitLab token string
+    :returns:     datetime, or None if it is not available
+    """
+    project = quote(f'{repo.owner}/{repo.repo}', safe='')
+    url = urljoin(repo.instance.endpoint, f'/api/v4/projects/{project}')
+    try:
+        r = requests.get(url, headers={'Authorization': f'Bearer {token}'}, timeout=TIMEOUT)
+        r.raise_for_status()
+        return parse_datetime(r.json()['last_activity_at'])
+    except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Cannot check activity of {repo.url}: {e}")
+        return None
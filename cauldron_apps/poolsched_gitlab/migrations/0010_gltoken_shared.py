@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_gitlab', '0009_gltoken_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gltoken',
+            name='shared',
+            field=models.BooleanField(default=False),
+        ),
+    ]
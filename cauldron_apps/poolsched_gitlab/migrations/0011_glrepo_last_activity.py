@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_gitlab', '0010_gltoken_shared'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='glrepo',
+            name='last_activity',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.15 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_gitlab', '0011_glrepo_last_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iglissueautorefresh',
+            name='refresh_progress',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='iglissueautorefresh',
+            name='refresh_until',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='iglmergeautorefresh',
+            name='refresh_progress',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='iglmergeautorefresh',
+            name='refresh_until',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_gitlab', '0012_autorefresh_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iglissueautorefresh',
+            name='refresh_interval',
+            field=models.PositiveIntegerField(default=60),
+        ),
+        migrations.AddField(
+            model_name='iglmergeautorefresh',
+            name='refresh_interval',
+            field=models.PositiveIntegerField(default=60),
+        ),
+    ]
@@ -8,6 +8,7 @@ from django.conf import settings
 from django.utils.timezone import now
 
 from poolsched.models import Job
+from cauldron_apps.poolsched_utils.tokens import record_rate_headers
 
 
 logger = logging.getLogger(__name__)
@@ -43,6 +44,8 @@ class GLRepo(models.Model):
         to_field='name')
     # When the repo was created in the scheduler
     created = models.DateTimeField(default=now, blank=True)
+    # Last activity in the repository covered by the last collection
+    last_activity = models.DateTimeField(null=True, default=None, blank=True)
 
     class Meta:
         db_table = TABLE_PREFIX + 'repo'
@@ -58,13 +61,15 @@ class GLRepo(models.Model):
 class GLToken(models.Model):
     """GitLab token"""
 
-    # Maximum number of jobs using a token concurrently
+    # Jobs using a token concurrently when its rate limit is unknown
     MAX_JOBS_TOKEN = 3
+    # Jobs using a token concurrently when its rate limit is full
+    MAX_JOBS_FRESH_TOKEN = 6
+    # Requests reserved for each job using the token
+    REQUESTS_PER_JOB = 200
 
     # GLToken string
     token = models.CharField(max_length=100)
-    # Rate limit remaining, last time it was checked
-    # rate = models.IntegerField(default=0)
     # Rate limit reset, last time it was checked
     reset = models.DateTimeField(default=now)
     # Instance for the token
@@ -80,6 +85,16 @@ class GLToken(models.Model):
         Job,
         related_name='gltokens',
         related_query_name='gltoken')
+    # Number of jobs using the token, updated by the token pool
+    num_jobs = models.PositiveIntegerField(default=0)
+    # Token in the shared pool of the instance, usable by other users
+    shared = models.BooleanField(default=False)
+    # Number of jobs accepted by the token with its current rate limit
+    max_jobs = models.PositiveIntegerField(default=MAX_JOBS_TOKEN)
+    # Rate limit remaining, limit and window reset, last time they were checked
+    rate_remaining = models.IntegerField(null=True, default=None, blank=True)
+    rate_limit = models.IntegerField(null=True, default=None, blank=True)
+    rate_reset = models.DateTimeField(null=True, default=None, blank=True)
     # Define whether the token can expire
     expiring_token = models.BooleanField(default=True)
     # Token used for refreshing the token when expired
@@ -109,3 +124,14 @@ class GLToken(models.Model):
             self.expiration_date = now() + datetime.timedelta(seconds=7200)
             self.save()
         return r.ok
+
+    def update_rate(self):
+        """Check the rate limit of the token with a lightweight request"""
+        try:
+            r = requests.get(urljoin(self.instance.endpoint, '/api/v4/user'),
+                             headers={'Authorization': f'Bearer {self.token}'},
+                             timeout=30)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Rate limit not available for {self}: {e}")
+            return False
+        return record_rate_headers(self, r.headers, prefix='RateLimit-')
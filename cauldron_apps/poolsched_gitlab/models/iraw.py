@@ -2,12 +2,14 @@ import datetime
 import logging
 
 from django.db import models, transaction
-from django.db.models import Count
 from django.utils.timezone import now
 
 from poolsched.models import Intention, ArchivedIntention, Job
+from cauldron_apps.poolsched_utils.tokens import available_tokens, select_tokens, borrow_tokens, \
+    record_exhausted, SHARED_JOBS_PER_USER
 from .base import GLToken, GLRepo
 
+from ..changes import last_activity, ACTIVITY_GRANULARITY
 from ..mordred import GitLabRaw
 
 
@@ -24,10 +26,9 @@ class IRawManager(models.Manager):
         """Return a list of selectable IGLRaw intentions for a user
 
         A intention is selectable if:
-        * its user has a usable token
+        * its user has a usable token for the instance of the repo,
+          or can borrow a token from the shared pool of that instance
         * no job is still associated with it
-        * (future) in fact, either its user has a usable token,
-          or there is other (public) token available
         It's not important if there is other job for the same repo,
         that will be checked later.
 
@@ -35,18 +36,28 @@ class IRawManager(models.Manager):
         :param max:  maximum number of intentions to return
         :returns:    list of IGLRaw intentions
         """
-        token_available = user.gltokens.annotate(num_jobs=Count('jobs'))\
-            .filter(num_jobs__lt=GLToken.MAX_JOBS_TOKEN)\
-            .filter(reset__lt=now())\
-            .exists()
-        if not token_available:
+        instances = set(available_tokens(user.gltokens.all()).values_list('instance', flat=True))
+        if self.borrowed_jobs(user) < SHARED_JOBS_PER_USER:
+            instances.update(available_tokens(self.pool_tokens(user)).values_list('instance', flat=True))
+        if not instances:
             logger.debug('No selectable intentions for this user (no token available)')
             return []
         intentions = self.filter(previous=None,
                                  user=user,
-                                 job=None)
+                                 job=None,
+                                 repo__instance__in=instances)
         return intentions.all()[:max]
 
+    def pool_tokens(self, user):
+        """Tokens of the shared pool that the user can borrow"""
+        return GLToken.objects.filter(shared=True).exclude(user=user)
+
+    def borrowed_jobs(self, user):
+        """Number of jobs of the user running with borrowed tokens"""
+        return self.filter(user=user, job__gltoken__shared=True)\
+            .exclude(job__gltoken__user=user)\
+            .values('job').distinct().count()
+
 
 class IGLRaw(Intention):
     """Intention for producing raw indexes for GitLab repos"""
@@ -100,6 +111,14 @@ class IGLRaw(Intention):
             return intention.update_job_worker(worker)
         return None
 
+    def _select_tokens(self):
+        """Select the least loaded token of the user, or borrow one from the pool"""
+        tokens = select_tokens(self.user.gltokens.filter(instance=self.repo.instance))
+        if not tokens:
+            pool = IGLRaw.objects.pool_tokens(self.user).filter(instance=self.repo.instance)
+            tokens = borrow_tokens(pool, IGLRaw.objects.borrowed_jobs(self.user))
+        return tokens
+
     def create_previous(self):
         """Create all needed previous intentions (no previous intention needed)"""
         return []
@@ -122,10 +141,10 @@ class IGLRaw(Intention):
             # No intention with a job for the same repo found
             return None
         self.save()
-        # Get tokens for the user, and assign them to job
-        tokens = GLToken.objects.filter(user=self.user)
-        for token in tokens:
-            token.jobs.add(self.job)
+        # Assign the best token of the user, or of the shared pool, to the job
+        tokens = self._select_tokens()
+        if tokens:
+            self.job.gltokens.add(*tokens)
         return self.job
 
     def create_job(self, worker):
@@ -135,15 +154,14 @@ class IGLRaw(Intention):
         If the worker didn't create the job, return None
 
         A IRaW intention cannot run if there are too many jobs
-        using available tokens.
+        using available tokens. The least loaded token of the user
+        is assigned to the job, or a token of the shared pool if the
+        user has no capacity left.
 
         :param worker: Worker willing to create the job.
         :returns:      Job created by the worker, or None
         """
-        tokens = self.user.gltokens\
-            .filter(instance=self.repo.instance)\
-            .annotate(num_jobs=Count('jobs'))\
-            .filter(num_jobs__lt=GLToken.MAX_JOBS_TOKEN)
+        tokens = self._select_tokens()
         # Only create the job if there is at least one token
         if tokens:
             job = super().create_job(worker)
@@ -158,7 +176,8 @@ class IGLRaw(Intention):
 
         :param job: job to be run
         """
-        token = job.gltokens.filter(reset__lt=now()).filter(instance=self.repo.instance).first()
+        token = job.gltokens.filter(reset__lt=now()).filter(instance=self.repo.instance)\
+            .order_by('num_jobs').first()
         logger.info(f"Running GitLabRaw intention: {self.repo.instance}/{self.repo.owner}/{self.repo.repo}, token: {token}")
         if not token:
             logger.error(f'Token not found for intention {self}')
@@ -166,6 +185,11 @@ class IGLRaw(Intention):
         # Refresh token
         if token.expiring_token and token.expiration_date < (now() + datetime.timedelta(seconds=60)):
             token.update_token()
+        # Activity until now will be collected. Recent values could
+        # still change without new activity, they are not stored
+        activity = last_activity(self.repo, token.token)
+        if activity and now() - activity < ACTIVITY_GRANULARITY:
+            activity = None
 
         handler = self._create_log_handler(job)
         try:
@@ -180,11 +204,14 @@ class IGLRaw(Intention):
 
         if output == 1:
             logger.error(f"Error running GitLabRaw intention {self}")
+            token.update_rate()
             raise Job.StopException
         if output:
-            token.reset = now() + datetime.timedelta(minutes=output)
-            token.save()
+            record_exhausted(token, output)
             return False
+        token.update_rate()
+        self.repo.last_activity = activity
+        self.repo.save(update_fields=['last_activity'])
         return True
 
     def archive(self, status=ArchivedIntention.OK, arch_job=None):
@@ -104,6 +104,23 @@ class TestMethods(TestCase):
         job = self.iraw1.running_job()
         self.assertEqual(job, new_job)
 
+    def test_create_job_shared(self):
+        """Test create IGLRaw job with a token of the shared pool"""
+        self.token2.shared = True
+        self.token2.save()
+        job = self.iraw1.create_job(self.worker1)
+        self.assertIn(self.token2, job.gltokens.all())
+        self.assertEqual(IGLRaw.objects.borrowed_jobs(self.user1), 1)
+
+    def test_create_job_other_instance(self):
+        """Test create IGLRaw job with tokens only for other instance"""
+        instance = GLInstance.objects.create(name='GitLab A', endpoint='https://gla.com')
+        self.token1.instance = instance
+        self.token1.save()
+        self.user1.gltokens.add(self.token1)
+        job = self.iraw1.create_job(self.worker1)
+        self.assertEqual(job, None)
+
 
 class TestSelectableIntentions(TestCase):
 
@@ -192,3 +209,16 @@ class TestSelectableIntentions(TestCase):
         """Test one ready, without token"""
         intentions = IGLRaw.objects.selectable_intentions(user=self.user7, max=2)
         self.assertEqual(len(intentions), 0)
+
+    def test_user_7_shared(self):
+        """Test one ready, with a token of the shared pool"""
+        GLToken.objects.create(token='shared', shared=True)
+        intentions = IGLRaw.objects.selectable_intentions(user=self.user7, max=2)
+        self.assertEqual(list(intentions), [self.iraw_U7_1])
+
+    def test_user_7_shared_other_instance(self):
+        """Test one ready, with a token of the shared pool of other instance"""
+        instance = GLInstance.objects.create(name='GitLab A', endpoint='https://gla.com')
+        GLToken.objects.create(token='shared', shared=True, instance=instance)
+        intentions = IGLRaw.objects.selectable_intentions(user=self.user7, max=2)
+        self.assertEqual(len(intentions), 0)
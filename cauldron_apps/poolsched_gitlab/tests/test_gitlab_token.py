@@ -5,6 +5,7 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 
 from poolsched.models import Job
+from cauldron_apps.poolsched_utils.tokens import record_rate_headers
 from ..models import GLToken
 
 User = get_user_model()
@@ -35,3 +36,27 @@ class TestBasic(TestCase):
         self.assertIsNone(token.user)
         self.assertEqual(token.jobs.count(), 1)
         self.assertEqual(token.jobs.first(), job)
+
+
+class TestRate(TestCase):
+
+    def setUp(self):
+        self.token = GLToken.objects.create(token='1234567890')
+
+    def test_record_rate_headers(self):
+        """The rate limit is read from the GitLab headers"""
+        reset = timezone.now() + datetime.timedelta(minutes=1)
+        headers = {'RateLimit-Remaining': '2000', 'RateLimit-Limit': '2000',
+                   'RateLimit-Reset': str(int(reset.timestamp()))}
+        self.assertTrue(record_rate_headers(self.token, headers, prefix='RateLimit-'))
+        token = GLToken.objects.get(pk=self.token.pk)
+        self.assertEqual(token.rate_remaining, 2000)
+        self.assertEqual(token.rate_limit, 2000)
+        self.assertEqual(token.rate_reset, reset.replace(microsecond=0))
+        self.assertEqual(token.max_jobs, GLToken.MAX_JOBS_FRESH_TOKEN)
+
+    def test_github_headers(self):
+        """GitHub headers are not read as GitLab headers"""
+        headers = {'X-RateLimit-Remaining': '0'}
+        self.assertFalse(record_rate_headers(self.token, headers, prefix='RateLimit-'))
+        self.assertIsNone(GLToken.objects.get(pk=self.token.pk).rate_remaining)
@@ -1,3 +1,5 @@
+from cauldron_apps.poolsched_utils.intentions import analyze_repos
+
 from .models import IMeetupRaw, IMeetupEnrich
 
 
@@ -8,3 +10,15 @@ def analyze_meetup_repo_obj(user, meetup_repo):
     enrich, _ = IMeetupEnrich.objects.get_or_create(user=user, repo=meetup_repo)
     enrich.previous.add(raw)
     return True
+
+
+def analyze_meetup_repos(user, meetup_repos):
+    """Create the intentions to analyze some groups in a few queries
+
+    Return the groups with intentions (none if the user has no tokens)
+    """
+    if user.meetuptokens.count() < 1:
+        return []
+    meetup_repos = list(meetup_repos)
+    analyze_repos(user, meetup_repos, IMeetupRaw, IMeetupEnrich)
+    return meetup_repos
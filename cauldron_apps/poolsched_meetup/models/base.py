@@ -28,15 +28,17 @@ class MeetupRepo(models.Model):
 class MeetupToken(models.Model):
     """Meetup token"""
 
-    # Maximum number of jobs using a token concurrently
+    # Jobs using a token concurrently when its rate limit is unknown
     MAX_JOBS_TOKEN = 1
+    # Jobs using a token concurrently when its rate limit is full
+    MAX_JOBS_FRESH_TOKEN = 1
+    # Requests reserved for each job using the token
+    REQUESTS_PER_JOB = 5
 
     # MeetupToken string
     token = models.CharField(max_length=40)
     # Refresh token in case it is necessary in the future
     refresh_token = models.CharField(max_length=50)
-    # Rate limit remaining, last time it was checked
-    # rate = models.IntegerField(default=0)
     # Rate limit reset, last time it was checked
     reset = models.DateTimeField(default=now)
     # Owner of the token
@@ -50,6 +52,14 @@ class MeetupToken(models.Model):
         Job,
         related_name='meetuptokens',
         related_query_name='meetuptoken')
+    # Number of jobs using the token, updated by the token pool
+    num_jobs = models.PositiveIntegerField(default=0)
+    # Number of jobs accepted by the token with its current rate limit
+    max_jobs = models.PositiveIntegerField(default=MAX_JOBS_TOKEN)
+    # Rate limit remaining, limit and window reset, last time they were checked
+    rate_remaining = models.IntegerField(null=True, default=None, blank=True)
+    rate_limit = models.IntegerField(null=True, default=None, blank=True)
+    rate_reset = models.DateTimeField(null=True, default=None, blank=True)
 
     class Meta:
         db_table = TABLE_PREFIX + 'token'
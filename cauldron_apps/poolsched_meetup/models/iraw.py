@@ -1,11 +1,10 @@
-import datetime
 import logging
 
 from django.db import models, transaction
-from django.db.models import Count
 from django.utils.timezone import now
 
 from poolsched.models import Intention, ArchivedIntention, Job
+from cauldron_apps.poolsched_utils.tokens import available_tokens, select_tokens, record_exhausted
 from .base import MeetupToken, MeetupRepo
 from ..mordred import MeetupRaw
 
@@ -33,10 +32,7 @@ class IRawManager(models.Manager):
         :param max:  maximum number of intentions to return
         :returns:    list of IMeetRaw intentions
         """
-        token_available = user.meetuptokens.annotate(num_jobs=Count('jobs'))\
-            .filter(num_jobs__lt=MeetupToken.MAX_JOBS_TOKEN)\
-            .filter(reset__lt=now())\
-            .exists()
+        token_available = available_tokens(user.meetuptokens.all()).exists()
         if not token_available:
             logger.debug('No selectable intentions for this user (no token available)')
             return []
@@ -123,14 +119,10 @@ class IMeetupRaw(Intention):
             # No intention with a job for the same repo found
             return None
         self.save()
-        # Get tokens for the user, and assign them to job
-        tokens = MeetupToken.objects.filter(user=self.user)
-        token_included = False
-        for token in tokens:
-            if token.jobs.count() < token.MAX_JOBS_TOKEN:
-                token_included = True
-                token.jobs.add(self.job)
-        if token_included:
+        # Assign the best token of the user to the job
+        tokens = select_tokens(MeetupToken.objects.filter(user=self.user))
+        if tokens:
+            self.job.meetuptokens.add(*tokens)
             return self.job
         else:
             return None
@@ -142,14 +134,13 @@ class IMeetupRaw(Intention):
         If the worker didn't create the job, return None
 
         A IRaW intention cannot run if there are too many jobs
-        using available tokens.
+        using available tokens. The least loaded token of the user
+        is assigned to the job.
 
         :param worker: Worker willing to create the job.
         :returns:      Job created by the worker, or None
         """
-        tokens = self.user.meetuptokens\
-            .annotate(num_jobs=Count('jobs'))\
-            .filter(num_jobs__lt=MeetupToken.MAX_JOBS_TOKEN)
+        tokens = select_tokens(self.user.meetuptokens.all())
         # Only create the job if there is at least one token
         if tokens:
             job = super().create_job(worker)
@@ -164,7 +155,7 @@ class IMeetupRaw(Intention):
 
         :param job: job to be run
         """
-        token = job.meetuptokens.filter(reset__lt=now()).first()
+        token = job.meetuptokens.filter(reset__lt=now()).order_by('num_jobs').first()
         logger.info(f"Running MeetupRaw intention: {self.repo.repo}, token: {token}")
         if not token:
             logger.error(f'Token not found for intention {self}')
@@ -184,8 +175,7 @@ class IMeetupRaw(Intention):
             logger.error(f"Error running MeetupRaw intention {self}")
             raise Job.StopException
         if output:
-            token.reset = now() + datetime.timedelta(minutes=output)
-            token.save()
+            record_exhausted(token, output)
             return False
         return True
 
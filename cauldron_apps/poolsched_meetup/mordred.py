@@ -1,16 +1,13 @@
 import logging
 import json
 import math
-import time
 import traceback
-import sqlalchemy
 
 try:
     from sirmordred.config import Config
     from sirmordred.task_projects import TaskProjects
     from sirmordred.task_collection import TaskRawDataCollection
     from sirmordred.task_enrich import TaskEnrich
-    from grimoire_elk.enriched.enrich import Enrich
 except ImportError:
     from cauldron_apps.poolsched_utils.mordred import sirmordred_fake
     Config = sirmordred_fake.Config
@@ -19,6 +16,8 @@ except ImportError:
     TaskEnrich = sirmordred_fake.TaskEnrich
 
 from cauldron_apps.poolsched_utils.mordred.backend import Backend
+from cauldron_apps.poolsched_utils.mordred.es_sizes import adaptive_bulk_size
+from cauldron_apps.poolsched_utils.mordred.retry import create_task
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +26,8 @@ BACKEND_SECTION = 'meetup'
 
 
 class MeetupRaw(Backend):
+    name = 'meetup'
+
     def __init__(self, url, token):
         super().__init__()
         projects = {'Project': {}}
@@ -63,6 +64,8 @@ class MeetupRaw(Backend):
 
 
 class MeetupEnrich(Backend):
+    name = 'meetup'
+
     def __init__(self, url):
         super().__init__()
         projects = {'Project': {}}
@@ -76,26 +79,12 @@ class MeetupEnrich(Backend):
         Return 0 or None for success, 1 for error
         """
         TaskProjects(self.config).execute()
-        task = None
-        while not task:
-            try:
-                task = TaskEnrich(self.config, backend_section=BACKEND_SECTION)
-            except sqlalchemy.exc.InternalError:
-                # There is a race condition in the code
-                logger.error('SQLAlchemy internal error')
-                task = None
-                time.sleep(1)
-
         try:
-            task.execute()
+            task = create_task(TaskEnrich, self.config, backend_section=BACKEND_SECTION)
+            with adaptive_bulk_size(self.name):
+                task.execute()
         except Exception as e:
             logger.warning("Error enriching data for Meetup. Cause: {}".format(e))
             traceback.print_exc()
             return 1
-        finally:
-            if task.db:
-                task.db._engine.dispose()
-            if Enrich.sh_db:
-                Enrich.sh_db._engine.dispose()
-                Enrich.sh_db = None
 
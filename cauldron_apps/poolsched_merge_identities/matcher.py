@@ -0,0 +1,215 @@
+"""
+Native engine to find the identities of SortingHat that should be merged.
+
+Instead of comparing every unique identity with every other one, the
+identities are grouped in blocks by some normalized values, and only
+identities in the same block are compared. Each rule defines the keys
+of the blocks it uses and when two identities of a block match:
+* `email`: same normalized email (always a match)
+* `local-part`: same email local part, and same name
+* `name`: same name token, and same full name with two words or more
+
+Blocks with more than `max_block_size` identities (e.g. `info@`, or a
+common first name) are ignored, as they are usually not the same person.
+The identities matched are joined in groups (union-find), so every
+group should be merged into a single unique identity.
+
+This module does not depend on SortingHat: records are read from it
+and the merges are applied by the caller, with `merge_groups`.
+"""
+
+import collections
+import re
+import time
+import unicodedata
+
+# Identities in a block above which it is not used
+MAX_BLOCK_SIZE = 50
+# Groups of identities merged between checks of the time limit
+MERGE_BATCH_SIZE = 100
+
+Record = collections.namedtuple('Record', 'uuid email name username')
+
+
+def normalize_name(name):
+    """Lowercase name without accents or punctuation"""
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', name.lower()))
+
+
+def normalize_email(email):
+    """Lowercase email without `+tag` in the local part, or '' if it is not valid"""
+    if not email or '@' not in email:
+        return ''
+    local, _, domain = email.strip().lower().rpartition('@')
+    local = local.split('+', 1)[0]
+    if not local or '.' not in domain:
+        return ''
+    return f'{local}@{domain}'
+
+
+class Rule:
+    """Rule to find identities to merge
+
+    Subclasses define `name`, `keys` and `match`. If every pair in a
+    block is a match, set `exact` to skip the comparisons.
+    """
+    name = None
+    exact = False
+
+    def keys(self, record):
+        """Keys of the blocks of a record"""
+        raise NotImplementedError
+
+    def match(self, a, b):
+        """Whether two records of the same block are the same person"""
+        raise NotImplementedError
+
+
+class EmailRule(Rule):
+    name = 'email'
+    exact = True
+
+    def keys(self, record):
+        email = normalize_email(record.email)
+        return [email] if email else []
+
+    def match(self, a, b):
+        return True
+
+
+class LocalPartRule(Rule):
+    name = 'local-part'
+
+    def keys(self, record):
+        email = normalize_email(record.email)
+        return [email.split('@')[0]] if email else []
+
+    def match(self, a, b):
+        name = normalize_name(a.name)
+        return bool(name) and name == normalize_name(b.name)
+
+
+class NameRule(Rule):
+    name = 'name'
+
+    def keys(self, record):
+        return normalize_name(record.name).split()
+
+    def match(self, a, b):
+        name = normalize_name(a.name)
+        return len(name.split()) > 1 and name == normalize_name(b.name)
+
+
+RULES = {rule.name: rule for rule in (EmailRule, LocalPartRule, NameRule)}
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        self.parent[max(root_a, root_b)] = min(root_a, root_b)
+        return True
+
+
+class MergeEngine:
+    """Find groups of unique identities to merge with blocking rules"""
+
+    def __init__(self, rules, blacklist=(), max_block_size=MAX_BLOCK_SIZE):
+        """
+        :param rules:          names of the rules (see RULES) or Rule instances
+        :param blacklist:      values never used to match (e.g. 'root@localhost')
+        :param max_block_size: blocks with more identities are ignored
+        """
+        self.rules = [RULES[rule]() if isinstance(rule, str) else rule for rule in rules]
+        self.blacklist = {value.lower() for value in blacklist}
+        self.max_block_size = max_block_size
+
+    def _blocks(self, records):
+        """Blocks of each rule, reading the records once"""
+        blocks = [collections.defaultdict(list) for _ in self.rules]
+        for record in records:
+            for rule, rule_blocks in zip(self.rules, blocks):
+                for key in rule.keys(record):
+                    if key not in self.blacklist:
+                        rule_blocks[key].append(record)
+        return zip(self.rules, blocks)
+
+    def keys(self, records):
+        """Keys of the blocks of some records, by rule name"""
+        keys = collections.defaultdict(set)
+        for rule in self.rules:
+            for record in records:
+                keys[rule.name].update(key for key in rule.keys(record) if key not in self.blacklist)
+        return keys
+
+    def groups(self, records, pivots=None):
+        """Groups of unique identities to merge
+
+        :param records: iterable of Record, one per identity, read once
+        :param pivots:  if given, only blocks with identities of these
+                        unique identities are compared
+        :returns:       list of sorted lists of uuids, with two or more each
+        """
+        pivots = set(pivots) if pivots is not None else None
+        uf = _UnionFind()
+        for rule, blocks in self._blocks(records):
+            for block in blocks.values():
+                uuids = {record.uuid for record in block}
+                if len(uuids) < 2 or len(block) > self.max_block_size:
+                    continue
+                if pivots is not None and not uuids & pivots:
+                    continue
+                if rule.exact:
+                    first, *others = uuids
+                    for uuid in others:
+                        uf.union(first, uuid)
+                    continue
+                for i, a in enumerate(block):
+                    for b in block[i + 1:]:
+                        if a.uuid != b.uuid and uf.find(a.uuid) != uf.find(b.uuid) and rule.match(a, b):
+                            uf.union(a.uuid, b.uuid)
+        groups = collections.defaultdict(list)
+        for uuid in list(uf.parent):
+            groups[uf.find(uuid)].append(uuid)
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def merge_groups(groups, merge, deadline=None, batch_size=MERGE_BATCH_SIZE, clock=time.monotonic):
+    """Merge groups of unique identities in batches until a deadline
+
+    The deadline is checked after each batch, so the merges of a batch
+    are never left halfway.
+
+    :param groups:     groups returned by MergeEngine.groups
+    :param merge:      function called with (from_uuid, to_uuid) for each merge
+    :param deadline:   value of `clock` after which no more batches are merged
+    :param batch_size: groups merged between checks of the deadline
+    :param clock:      function returning the current time
+    :returns:          number of groups left for the next merge
+    """
+    for start in range(0, len(groups), batch_size):
+        for group in groups[start:start + batch_size]:
+            to_uuid, *from_uuids = group
+            for from_uuid in from_uuids:
+                merge(from_uuid, to_uuid)
+        left = len(groups) - start - batch_size
+        if deadline is not None and clock() > deadline and left > 0:
+            return left
+    return 0
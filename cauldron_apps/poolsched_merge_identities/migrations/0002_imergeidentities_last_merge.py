@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-19 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_merge_identities', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imergeidentities',
+            name='last_full_merge',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='imergeidentities',
+            name='last_merge',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -10,6 +10,10 @@ from .mordred import SHMergeIdentities
 logger = logging.getLogger(__name__)
 global_logger = logging.getLogger()
 
+# Time between merges of all the identities. Merges in between only
+# consider the identities modified since the last merge
+FULL_MERGE_INTERVAL = datetime.timedelta(days=7)
+
 
 class MergeIdentitiesManager(models.Manager):
     """Model manager for instances of IMergeIdentities"""
@@ -41,6 +45,9 @@ class IMergeIdentities(Intention):
 
     # Time at which this intentions should run
     scheduled = models.DateTimeField()
+    # Time at which the last successful merge, and full merge, started
+    last_merge = models.DateTimeField(null=True)
+    last_full_merge = models.DateTimeField(null=True)
 
     class Meta:
         db_table = 'poolsched_merge_identities'
@@ -84,16 +91,33 @@ class IMergeIdentities(Intention):
         """
 
         # Schedule next merge identities
-        next_merge = now() + datetime.timedelta(days=1)
+        merge_start = now()
+        next_merge = merge_start + datetime.timedelta(days=1)
         logger.info(f"Schedule next merge identities for at {next_merge}")
-        IMergeIdentities.objects.create(user=self.user, scheduled=next_merge)
+        sched_merge = IMergeIdentities.objects.create(user=self.user, scheduled=next_merge,
+                                                      last_merge=self.last_merge,
+                                                      last_full_merge=self.last_full_merge)
+        full = not self.last_merge or not self.last_full_merge or \
+            merge_start - self.last_full_merge >= FULL_MERGE_INTERVAL
 
         handler = self._create_log_handler(job)
         try:
             global_logger.addHandler(handler)
-            logger.info(f"Running Merge identities")
-            runner = SHMergeIdentities()
-            runner.run()
+            if full:
+                logger.info("Running Merge identities")
+                runner = SHMergeIdentities()
+            else:
+                logger.info(f"Running Merge identities modified since {self.last_merge}")
+                runner = SHMergeIdentities(since=self.last_merge)
+            complete = runner.run()
+            if complete is False:
+                # Merge again the same identities in the next run
+                logger.info("Merges left for the next run")
+            else:
+                sched_merge.last_merge = merge_start
+                if full:
+                    sched_merge.last_full_merge = merge_start
+                sched_merge.save()
             logger.info(f"Finished without errors")
             return True
         except Exception as e:
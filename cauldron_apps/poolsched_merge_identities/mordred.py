@@ -20,13 +20,26 @@
 
 import json
 import logging
+import time
+
+from django.conf import settings
+
 from cauldron_apps.poolsched_utils.mordred.backend import Backend
+from cauldron_apps.poolsched_utils.mordred.retry import create_task
+from cauldron_apps.poolsched_utils.mordred.sh_database import shared_database
+
+from .matcher import MergeEngine, Record, merge_groups
 
 
 try:
+    import sqlalchemy
     from sirmordred.task import Task
     from sirmordred.task_projects import TaskProjects
     from sirmordred.task_identities import TaskIdentitiesMerge
+    from sortinghat import api
+    from sortinghat.db.model import Identity
+    from sortinghat.exceptions import AlreadyExistsError, NotFoundError
+    from sortinghat.matcher import create_identity_matcher
 except ImportError:
     from cauldron_apps.poolsched_utils.mordred import sirmordred_fake
     Task = sirmordred_fake.Task
@@ -37,26 +50,244 @@ logger = logging.getLogger(__name__)
 
 PROJECTS_FILE = '/tmp/tmp_projects.json'
 
+# Unique identities, or query conditions, in each query of the native merge
+PIVOTS_BATCH_SIZE = 500
+
+# Identity fields compared by each SortingHat matching algorithm
+MATCHING_FIELDS = {
+    'default': ['email', 'name', 'username'],
+    'email': ['email'],
+    'email-name': ['email', 'name'],
+    'github': ['username'],
+    'name': ['name'],
+    'username': ['username'],
+}
+
 
 class SHMergeIdentities(Backend):
-    def __init__(self):
+    def __init__(self, since=None, engine=None, time_limit=None):
+        """
+        :param since:      merge only the identities modified after this datetime,
+                           or all of them if it is None
+        :param engine:     'native' to find the identities to merge with MergeEngine,
+                           or 'sortinghat'. settings.MERGE_IDENTITIES_ENGINE by default
+        :param time_limit: minutes for the native merges, 0 for no limit.
+                           settings.MERGE_IDENTITIES_TIME_LIMIT by default
+        """
         super().__init__()
+        self.since = since
+        self.engine = engine or settings.MERGE_IDENTITIES_ENGINE
+        if time_limit is None:
+            time_limit = settings.MERGE_IDENTITIES_TIME_LIMIT
+        self.time_limit = time_limit
         projects = {'Project': {}}
         with open(PROJECTS_FILE, 'w+') as f:
             json.dump(projects, f)
         self.config.set_param('projects', 'projects_file', PROJECTS_FILE)
 
     def run(self):
-        """ Execute the refresh for this datasource."""
+        """ Execute the refresh for this datasource.
+        Return False if the merges were not completed in the time limit
+        """
         TaskProjects(self.config).execute()
 
-        task = TaskIdentitiesMerge(self.config)
+        complete = True
+        if self.engine == 'native':
+            task = create_task(TaskIdentitiesMergeNative, self.config,
+                               since=self.since, time_limit=self.time_limit)
+            task.execute()
+            complete = task.complete
+            # SortingHat only affiliates and completes profiles
+            self.config.set_param('sortinghat', 'matching', [])
+
+        if self.since:
+            task = create_task(TaskIdentitiesMergeIncremental, self.config, since=self.since)
+        else:
+            task = create_task(TaskIdentitiesMerge, self.config)
         try:
             task.execute()
             logger.info(f"Finish merging identities.")
         except Exception as e:
             logger.error(f"Error merging identities. Cause: {e}")
             raise e
-        finally:
-            if task.db:
-                task.db._engine.dispose()
+        return complete
+
+
+class TaskIdentitiesMergeIncremental(Task):
+    """Merge the identities modified since a date
+
+    Like TaskIdentitiesMerge, it unifies identities with the matching
+    algorithms of the configuration, and affiliates them by email
+    domain. But only the unique identities modified since `since` are
+    compared, with the identities that share the value of any field
+    used by the matching algorithms, found with a query instead of
+    reading the whole database. Profiles are not completed: that is
+    left for the full merge.
+    """
+
+    def __init__(self, config, since):
+        super().__init__(config)
+        self.since = since
+        self.db = shared_database(**self.sh_kwargs)
+        sh_conf = self.conf['sortinghat']
+        self.matching = [algo for algo in sh_conf['matching'] if algo]
+        self.affiliate = sh_conf.get('affiliate', False)
+        self.strict = sh_conf.get('strict_mapping', True)
+        self.fields = sorted({field for algo in self.matching for field in MATCHING_FIELDS.get(algo, [])})
+
+    def __unique_identity(self, uuid):
+        try:
+            return api.unique_identities(self.db, uuid=uuid)[0]
+        except NotFoundError:
+            # Merged into another one
+            return None
+
+    def __candidates(self, uidentity):
+        """Unique identities sharing the value of a matching field"""
+        conditions = []
+        for field in self.fields:
+            values = {getattr(identity, field) for identity in uidentity.identities} - {None, ''}
+            if values:
+                conditions.append(getattr(Identity, field).in_(values))
+        if not conditions:
+            return []
+        with self.db.connect() as session:
+            uuids = {row[0] for row in session.query(Identity.uuid)
+                                              .filter(sqlalchemy.or_(*conditions))
+                                              .distinct()}
+        uuids.discard(uidentity.uuid)
+        return [uid for uid in map(self.__unique_identity, sorted(uuids)) if uid]
+
+    def __unify(self, uuid, matchers):
+        uidentity = self.__unique_identity(uuid)
+        if not uidentity:
+            return 0
+        merged = 0
+        for candidate in self.__candidates(uidentity):
+            if any(matcher.match(uidentity, candidate) for matcher in matchers):
+                logger.debug(f"Merging {candidate.uuid} into {uidentity.uuid}")
+                api.merge_unique_identities(self.db, candidate.uuid, uidentity.uuid)
+                merged += 1
+        return merged
+
+    def __affiliate_identity(self, uuid):
+        """Enroll a unique identity in the organizations of its email domains"""
+        uidentity = self.__unique_identity(uuid)
+        if not uidentity:
+            return
+        for identity in sorted(uidentity.identities, key=lambda x: x.id):
+            if not identity.email:
+                continue
+            domain = identity.email.split('@')[-1]
+            try:
+                domains = api.domains(self.db, domain=domain, top=True)
+            except NotFoundError:
+                continue
+            domains.sort(key=lambda x: len(x.domain), reverse=True)
+            try:
+                api.add_enrollment(self.db, uidentity.uuid, domains[0].organization.name)
+            except AlreadyExistsError:
+                pass
+
+    def execute(self):
+        uuids = api.search_last_modified_unique_identities(self.db, self.since)
+        logger.info(f"{len(uuids)} unique identities modified since {self.since}")
+        try:
+            blacklist = api.blacklist(self.db)
+        except NotFoundError:
+            blacklist = None
+        matchers = [create_identity_matcher(algo, blacklist=blacklist, strict=self.strict)
+                    for algo in self.matching]
+        merged = 0
+        for uuid in uuids:
+            merged += self.__unify(uuid, matchers)
+        logger.info(f"{merged} unique identities merged")
+        if self.affiliate:
+            for uuid in uuids:
+                self.__affiliate_identity(uuid)
+
+
+class TaskIdentitiesMergeNative(Task):
+    """Merge identities found by MergeEngine
+
+    All the identities are read from SortingHat and grouped with the
+    rules in settings.MERGE_IDENTITIES_RULES. With `since`, only the
+    identities that may share a block with the unique identities
+    modified after it are read, and only their groups are merged. Merges
+    are applied in batches, stopping after `time_limit` minutes; the
+    rest are found again in the next run.
+    """
+
+    def __init__(self, config, since=None, time_limit=0):
+        super().__init__(config)
+        self.since = since
+        self.time_limit = time_limit
+        self.db = shared_database(**self.sh_kwargs)
+        self.complete = False
+
+    def __records(self):
+        """Records of all the identities, read in chunks"""
+        with self.db.connect() as session:
+            query = session.query(Identity.uuid, Identity.email, Identity.name, Identity.username)
+            for row in query.yield_per(10000):
+                yield Record(*row)
+
+    def __pivot_records(self, engine, pivots):
+        """Records of the identities that may be in a block with the pivots
+
+        The identities of the pivots are read first, and then those whose
+        email starts with the local part of their emails, or whose name
+        contains a token of their names. That is a superset of every block
+        of the pivots (names with accents are found thanks to the accent
+        insensitive collation of SortingHat), so the blocks and their sizes
+        are the same as with all the identities.
+        """
+        fields = (Identity.id, Identity.uuid, Identity.email, Identity.name, Identity.username)
+        identities = {}
+        with self.db.connect() as session:
+            for start in range(0, len(pivots), PIVOTS_BATCH_SIZE):
+                batch = pivots[start:start + PIVOTS_BATCH_SIZE]
+                for pk, *row in session.query(*fields).filter(Identity.uuid.in_(batch)):
+                    identities[pk] = Record(*row)
+            keys = engine.keys(identities.values())
+            local_parts = {key.split('@')[0] for key in keys['email']} | keys['local-part']
+            conditions = [condition for local in sorted(local_parts)
+                          for condition in (Identity.email.ilike(f'{local}@%'), Identity.email.ilike(f'{local}+%'))]
+            conditions += [Identity.name.ilike(f'%{token}%') for token in sorted(keys['name'])]
+            for start in range(0, len(conditions), PIVOTS_BATCH_SIZE):
+                batch = conditions[start:start + PIVOTS_BATCH_SIZE]
+                for pk, *row in session.query(*fields).filter(sqlalchemy.or_(*batch)):
+                    identities[pk] = Record(*row)
+        return identities.values()
+
+    def __blacklist(self):
+        try:
+            return [entry.excluded for entry in api.blacklist(self.db)]
+        except NotFoundError:
+            return []
+
+    def __merge(self, from_uuid, to_uuid):
+        try:
+            api.merge_unique_identities(self.db, from_uuid, to_uuid)
+        except NotFoundError:
+            # Merged or removed since it was read
+            pass
+
+    def execute(self):
+        deadline = time.monotonic() + self.time_limit * 60 if self.time_limit else None
+        pivots = None
+        if self.since:
+            pivots = api.search_last_modified_unique_identities(self.db, self.since)
+            logger.info(f"{len(pivots)} unique identities modified since {self.since}")
+            if not pivots:
+                self.complete = True
+                return
+        engine = MergeEngine(settings.MERGE_IDENTITIES_RULES, blacklist=self.__blacklist())
+        records = self.__pivot_records(engine, pivots) if pivots else self.__records()
+        groups = engine.groups(records, pivots=pivots)
+        logger.info(f"{len(groups)} groups of unique identities to merge")
+        left = merge_groups(groups, self.__merge, deadline=deadline)
+        if left:
+            logger.warning(f"Time limit reached, {left} groups left for the next merge")
+            return
+        self.complete = True
@@ -1,3 +1,211 @@
-from django.test import TestCase
+import datetime
+import logging
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from django.utils.timezone import now
+
+from .models import IMergeIdentities, FULL_MERGE_INTERVAL
+from .matcher import Record, MergeEngine, EmailRule, LocalPartRule, NameRule, \
+    normalize_email, normalize_name, merge_groups
+
+
+def record(uuid, email=None, name=None, username=None):
+    return Record(uuid, email, name, username)
+
+
+class TestNormalize(SimpleTestCase):
+
+    def test_normalize_name(self):
+        """Names are lowercase, without accents or punctuation"""
+        self.assertEqual(normalize_name('José  Pérez-López'), 'jose perez lopez')
+        self.assertEqual(normalize_name('O\'Brien, J.'), 'o brien j')
+        self.assertEqual(normalize_name(None), '')
+
+    def test_normalize_email(self):
+        """Emails are lowercase, without +tag"""
+        self.assertEqual(normalize_email(' John.Doe+github@Example.COM '), 'john.doe@example.com')
+        self.assertEqual(normalize_email('a@b@example.com'), 'a@b@example.com')
+
+    def test_normalize_email_invalid(self):
+        """Invalid emails are empty"""
+        for email in (None, '', 'john', '@example.com', 'john@localhost', '+tag@example.com'):
+            self.assertEqual(normalize_email(email), '', email)
+
+
+class TestRules(SimpleTestCase):
+
+    def test_email_keys(self):
+        """The email rule blocks by normalized email"""
+        rule = EmailRule()
+        self.assertEqual(rule.keys(record('a', email='John+x@Example.com')), ['john@example.com'])
+        self.assertEqual(rule.keys(record('a', email='john')), [])
+        self.assertTrue(rule.exact)
+
+    def test_local_part(self):
+        """The local-part rule blocks by local part and matches by name"""
+        rule = LocalPartRule()
+        a = record('a', email='jdoe@example.com', name='John Doe')
+        b = record('b', email='JDoe@other.org', name='john  doe')
+        c = record('c', email='jdoe@third.net', name='Jane Doe')
+        self.assertEqual(rule.keys(a), ['jdoe'])
+        self.assertEqual(rule.keys(b), ['jdoe'])
+        self.assertTrue(rule.match(a, b))
+        self.assertFalse(rule.match(a, c))
+        self.assertFalse(rule.match(record('d'), record('e')))
+
+    def test_name(self):
+        """The name rule blocks by name token and matches full names"""
+        rule = NameRule()
+        a = record('a', name='John Doe')
+        self.assertEqual(rule.keys(a), ['john', 'doe'])
+        self.assertTrue(rule.match(a, record('b', name='JOHN DOE')))
+        self.assertFalse(rule.match(a, record('b', name='John Smith')))
+        self.assertFalse(rule.match(record('a', name='John'), record('b', name='John')))
+
+
+class TestMergeEngine(SimpleTestCase):
+
+    def test_email(self):
+        """Identities with the same email are merged"""
+        engine = MergeEngine(['email'])
+        groups = engine.groups([record('1', email='john@example.com'),
+                                record('2', email='John@Example.com'),
+                                record('3', email='jane@example.com')])
+        self.assertEqual(groups, [['1', '2']])
+
+    def test_same_unique_identity(self):
+        """Identities of the same unique identity are not a group"""
+        engine = MergeEngine(['email'])
+        groups = engine.groups([record('1', email='john@example.com'),
+                                record('1', email='john@example.com')])
+        self.assertEqual(groups, [])
+
+    def test_transitive(self):
+        """Groups join identities matched by different rules"""
+        engine = MergeEngine(['email', 'local-part', 'name'])
+        groups = engine.groups([record('1', email='jdoe@example.com', name='J. Doe'),
+                                record('2', email='jdoe@example.com', name='John Doe'),
+                                record('3', email='john@other.org', name='John Doe'),
+                                record('4', email='jane@other.org', name='Jane Roe')])
+        self.assertEqual(groups, [['1', '2', '3']])
+
+    def test_local_part_other_name(self):
+        """Identities with the same local part and other name are not merged"""
+        engine = MergeEngine(['local-part'])
+        groups = engine.groups([record('1', email='admin@example.com', name='John Doe'),
+                                record('2', email='admin@other.org', name='Jane Roe')])
+        self.assertEqual(groups, [])
+
+    def test_blacklist(self):
+        """Blacklisted values are not used to match"""
+        engine = MergeEngine(['email', 'local-part'], blacklist=['Root@localhost.localdomain', 'root'])
+        groups = engine.groups([record('1', email='root@localhost.localdomain', name='Root'),
+                                record('2', email='root@localhost.localdomain', name='Root'),
+                                record('3', email='root@example.com', name='Root')])
+        self.assertEqual(groups, [])
+
+    def test_max_block_size(self):
+        """Blocks with too many identities are ignored"""
+        records = [record(str(i), email='info@example.com') for i in range(3)]
+        self.assertEqual(MergeEngine(['email'], max_block_size=2).groups(records), [])
+        self.assertEqual(MergeEngine(['email'], max_block_size=3).groups(records), [['0', '1', '2']])
+
+    def test_pivots(self):
+        """With pivots, only blocks with their identities are merged"""
+        engine = MergeEngine(['email'])
+        records = [record('1', email='john@example.com'),
+                   record('2', email='john@example.com'),
+                   record('3', email='jane@example.com'),
+                   record('4', email='jane@example.com')]
+        self.assertEqual(engine.groups(records, pivots=['3']), [['3', '4']])
+        self.assertEqual(engine.groups(records, pivots=[]), [])
+
+    def test_iterator(self):
+        """Records can be read only once"""
+        engine = MergeEngine(['email', 'local-part'])
+        records = iter([record('1', email='jdoe@example.com', name='John Doe'),
+                        record('2', email='jdoe@example.com'),
+                        record('3', email='jdoe@other.org', name='John Doe')])
+        self.assertEqual(engine.groups(records), [['1', '2', '3']])
+
+    def test_keys(self):
+        """Keys of the blocks of some records, by rule"""
+        engine = MergeEngine(['email', 'local-part', 'name'], blacklist=['root'])
+        keys = engine.keys([record('1', email='JDoe+x@example.com', name='John Doe'),
+                            record('2', email='root@example.com')])
+        self.assertEqual(keys['email'], {'jdoe@example.com', 'root@example.com'})
+        self.assertEqual(keys['local-part'], {'jdoe'})
+        self.assertEqual(keys['name'], {'john', 'doe'})
+
+
+class TestMergeGroups(SimpleTestCase):
+
+    def test_merge_all(self):
+        """Every identity of a group is merged into the first one"""
+        merges = []
+        left = merge_groups([['1', '2', '3'], ['4', '5']], lambda *args: merges.append(args))
+        self.assertEqual(left, 0)
+        self.assertEqual(merges, [('2', '1'), ('3', '1'), ('5', '4')])
+
+    def test_time_limit(self):
+        """Batches are not merged after the deadline"""
+        merges = []
+        clock = iter([1, 2, 3]).__next__
+        groups = [[str(i), f'{i}b'] for i in range(5)]
+        left = merge_groups(groups, lambda *args: merges.append(args),
+                            deadline=1.5, batch_size=2, clock=clock)
+        self.assertEqual(left, 1)
+        self.assertEqual(len(merges), 4)
+
+    def test_time_limit_last_batch(self):
+        """Reaching the deadline in the last batch completes the merge"""
+        merges = []
+        left = merge_groups([['1', '2']], lambda *args: merges.append(args),
+                            deadline=0, clock=lambda: 1)
+        self.assertEqual(left, 0)
+        self.assertEqual(merges, [('2', '1')])
+
+
+@mock.patch.object(IMergeIdentities, '_create_log_handler', return_value=logging.NullHandler())
+@mock.patch('cauldron_apps.poolsched_merge_identities.models.SHMergeIdentities')
+class TestMergeIdentities(TestCase):
+
+    def run_merge(self, last_merge=None, last_full_merge=None):
+        intention = IMergeIdentities.objects.create(scheduled=now(), last_merge=last_merge,
+                                                    last_full_merge=last_full_merge)
+        self.assertTrue(intention.run(None))
+        return IMergeIdentities.objects.exclude(pk=intention.pk).get()
+
+    def test_first_merge(self, merge_class, create_log_handler):
+        """The first merge is a full merge"""
+        scheduled = self.run_merge()
+        merge_class.assert_called_once_with()
+        self.assertIsNotNone(scheduled.last_merge)
+        self.assertEqual(scheduled.last_full_merge, scheduled.last_merge)
+
+    def test_incremental(self, merge_class, create_log_handler):
+        """Merges in between full merges consider the identities modified since the last merge"""
+        last_merge = now() - datetime.timedelta(days=1)
+        last_full_merge = now() - FULL_MERGE_INTERVAL + datetime.timedelta(hours=1)
+        scheduled = self.run_merge(last_merge, last_full_merge)
+        merge_class.assert_called_once_with(since=last_merge)
+        self.assertGreater(scheduled.last_merge, last_merge)
+        self.assertEqual(scheduled.last_full_merge, last_full_merge)
+
+    def test_full_merge_interval(self, merge_class, create_log_handler):
+        """All the identities are merged again after FULL_MERGE_INTERVAL"""
+        last_merge = now() - datetime.timedelta(days=1)
+        last_full_merge = now() - FULL_MERGE_INTERVAL
+        scheduled = self.run_merge(last_merge, last_full_merge)
+        merge_class.assert_called_once_with()
+        self.assertEqual(scheduled.last_full_merge, scheduled.last_merge)
+
+    def test_not_complete(self, merge_class, create_log_handler):
+        """Merges left for the next run keep the last merge"""
+        merge_class.return_value.run.return_value = False
+        last_merge = now() - datetime.timedelta(days=1)
+        last_full_merge = now() - datetime.timedelta(days=2)
+        scheduled = self.run_merge(last_merge, last_full_merge)
+        self.assertEqual(scheduled.last_merge, last_merge)
+        self.assertEqual(scheduled.last_full_merge, last_full_merge)
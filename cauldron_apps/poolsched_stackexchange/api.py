@@ -1,3 +1,5 @@
+from cauldron_apps.poolsched_utils.intentions import analyze_repos
+
 from .models import IStackExchangeRaw, IStackExchangeEnrich
 
 
@@ -8,3 +10,15 @@ def analyze_stack_repo_obj(user, repo):
     enrich, _ = IStackExchangeEnrich.objects.get_or_create(user=user, question_tag=repo)
     enrich.previous.add(raw)
     return True
+
+
+def analyze_stack_repos(user, repos):
+    """Create the intentions to analyze some question tags in a few queries
+
+    Return the question tags with intentions (none if the user has no tokens)
+    """
+    if user.stackexchangetokens.count() < 1:
+        return []
+    repos = list(repos)
+    analyze_repos(user, repos, IStackExchangeRaw, IStackExchangeEnrich, field='question_tag')
+    return repos
@@ -1,5 +1,11 @@
 from django.apps import AppConfig
 
+from cauldron_apps.poolsched_utils.tokens import track_jobs
+
 
 class PoolschedStackexchangeConfig(AppConfig):
     name = 'cauldron_apps.poolsched_stackexchange'
+
+    def ready(self):
+        # Keep the number of jobs of each token updated
+        track_jobs(self.get_model('StackExchangeToken'))
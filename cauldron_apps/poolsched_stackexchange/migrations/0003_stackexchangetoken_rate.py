@@ -0,0 +1,33 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poolsched_stackexchange', '0002_stackexchangetoken_num_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stackexchangetoken',
+            name='max_jobs',
+            field=models.PositiveIntegerField(default=3),
+        ),
+        migrations.AddField(
+            model_name='stackexchangetoken',
+            name='rate_limit',
+            field=models.IntegerField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='stackexchangetoken',
+            name='rate_remaining',
+            field=models.IntegerField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='stackexchangetoken',
+            name='rate_reset',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -30,7 +30,12 @@ class StackExchangeQuestionTag(models.Model):
 
 
 class StackExchangeToken(models.Model):
+    # Jobs using a token concurrently when its rate limit is unknown
     MAX_JOBS_TOKEN = 3
+    # Jobs using a token concurrently when its rate limit is full
+    MAX_JOBS_FRESH_TOKEN = 6
+    # Requests reserved for each job using the token
+    REQUESTS_PER_JOB = 300
 
     # StackExchange token
     token = models.CharField(max_length=40)
@@ -48,6 +53,14 @@ class StackExchangeToken(models.Model):
         Job,
         related_name='stackexchangetokens',
         related_query_name='stackexchangetoken')
+    # Number of jobs using the token, updated by the token pool
+    num_jobs = models.PositiveIntegerField(default=0)
+    # Number of jobs accepted by the token with its current rate limit
+    max_jobs = models.PositiveIntegerField(default=MAX_JOBS_TOKEN)
+    # Rate limit remaining, limit and window reset, last time they were checked
+    rate_remaining = models.IntegerField(null=True, default=None, blank=True)
+    rate_limit = models.IntegerField(null=True, default=None, blank=True)
+    rate_reset = models.DateTimeField(null=True, default=None, blank=True)
 
     class Meta:
         db_table = TABLE_PREFIX + 'token'
@@ -1,11 +1,10 @@
 import logging
-import datetime
 
 from django.db import models, transaction
-from django.db.models import Count
 from django.utils.timezone import now
 
 from poolsched.models import Intention, Job, ArchivedIntention
+from cauldron_apps.poolsched_utils.tokens import available_tokens, select_tokens, record_exhausted
 from .base import StackExchangeToken, StackExchangeQuestionTag
 from ..mordred import StackExchangeRaw
 
@@ -32,10 +31,7 @@ class IStackExchangeRawManager(models.Manager):
         :param max:  maximum number of intentions to return
         :returns:    list of IStackExchangeRaw intentions
         """
-        token_available = user.stackexchangetokens.annotate(num_jobs=Count('jobs')) \
-            .filter(num_jobs__lt=StackExchangeToken.MAX_JOBS_TOKEN) \
-            .filter(reset__lt=now()) \
-            .exists()
+        token_available = available_tokens(user.stackexchangetokens.all()).exists()
         if not token_available:
             logger.debug('No selectable intentions for this user (no token available)')
             return []
@@ -101,14 +97,10 @@ class IStackExchangeRaw(Intention):
             # No intention with a job for the same repo found
             return None
 
-        # Get tokens for the user, and assign them to job
-        tokens = StackExchangeToken.objects.filter(user=self.user)
-        token_included = False
-        for token in tokens:
-            if token.jobs.count() < token.MAX_JOBS_TOKEN:
-                token_included = True
-                token.jobs.add(self.job)
-        if token_included:
+        # Assign the best token of the user to the job
+        tokens = select_tokens(StackExchangeToken.objects.filter(user=self.user))
+        if tokens:
+            self.job.stackexchangetokens.add(*tokens)
             return self.job
         else:
             return None
@@ -120,14 +112,13 @@ class IStackExchangeRaw(Intention):
         If the worker didn't create the job, return None
 
         A IRaW intention cannot run if there are too many jobs
-        using available tokens.
+        using available tokens. The least loaded token of the user
+        is assigned to the job.
 
         :param worker: Worker willing to create the job.
         :returns:      Job created by the worker, or None
         """
-        tokens = self.user.stackexchangetokens\
-            .annotate(num_jobs=Count('jobs'))\
-            .filter(num_jobs__lt=StackExchangeToken.MAX_JOBS_TOKEN)
+        tokens = select_tokens(self.user.stackexchangetokens.all())
         # Only create the job if there is at least one token
         if tokens:
             job = super().create_job(worker)
@@ -142,7 +133,7 @@ class IStackExchangeRaw(Intention):
 
         :param job: job to be run
         """
-        token = job.stackexchangetokens.filter(reset__lt=now()).first()
+        token = job.stackexchangetokens.filter(reset__lt=now()).order_by('num_jobs').first()
         logger.info(f"Running StackExchange intention: {self.question_tag.site}/{self.question_tag.tagged}, token: {token}")
         if not token:
             logger.error(f'Token not found for intention {self}')
@@ -162,8 +153,7 @@ class IStackExchangeRaw(Intention):
             logger.error(f"Error running IStackExchangeRaw intention {self}")
             raise Job.StopException
         if output:
-            token.reset = now() + datetime.timedelta(minutes=output)
-            token.save()
+            record_exhausted(token, output)
             return False
         return True
 
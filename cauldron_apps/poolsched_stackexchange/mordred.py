@@ -1,19 +1,17 @@
 import json
 import logging
 import math
-import time
 import traceback
 
-import sqlalchemy
-
 from cauldron_apps.poolsched_utils.mordred.backend import Backend
+from cauldron_apps.poolsched_utils.mordred.es_sizes import adaptive_bulk_size
+from cauldron_apps.poolsched_utils.mordred.retry import create_task
 
 try:
     from sirmordred.config import Config
     from sirmordred.task_projects import TaskProjects
     from sirmordred.task_collection import TaskRawDataCollection
     from sirmordred.task_enrich import TaskEnrich
-    from grimoire_elk.enriched.enrich import Enrich
 except ImportError:
     from cauldron_apps.poolsched_utils.mordred import sirmordred_fake
     Config = sirmordred_fake.Config
@@ -28,6 +26,8 @@ BACKEND_SECTION = 'stackexchange'
 
 
 class StackExchangeRaw(Backend):
+    name = 'stackexchange'
+
     def __init__(self, url, token, api_key):
         super().__init__()
         projects = {'Project': {}}
@@ -65,6 +65,8 @@ class StackExchangeRaw(Backend):
 
 
 class StackExchangeEnrich(Backend):
+    name = 'stackexchange'
+
     def __init__(self, url):
         super().__init__()
         projects = {'Project': {}}
@@ -78,24 +80,11 @@ class StackExchangeEnrich(Backend):
         Return 0 or None for success, 1 for error
         """
         TaskProjects(self.config).execute()
-        task = None
-        while not task:
-            try:
-                task = TaskEnrich(self.config, backend_section=BACKEND_SECTION)
-            except sqlalchemy.exc.InternalError:
-                logger.error('SQLAlchemy internal error')
-                task = None
-                time.sleep(1)
-
         try:
-            task.execute()
+            task = create_task(TaskEnrich, self.config, backend_section=BACKEND_SECTION)
+            with adaptive_bulk_size(self.name):
+                task.execute()
         except Exception as e:
             logger.warning("Error enriching data for StackExchange. Cause: {}".format(e))
             traceback.print_exc()
             return 1
-        finally:
-            if task.db:
-                task.db._engine.dispose()
-            if Enrich.sh_db:
-                Enrich.sh_db._engine.dispose()
-                Enrich.sh_db = None
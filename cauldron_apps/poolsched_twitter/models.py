@@ -20,6 +20,10 @@ TABLE_PREFIX = "poolsched_twitter"
 class ITwitterNotifyManager(models.Manager):
     """Model manager for instances of ITwitterNotify"""
 
+    def ready(self):
+        """Intentions whose project has no intentions pending"""
+        return self.filter(project__running_repos=0, project__pending_owners=0)
+
     def selectable_intentions(self, user, max=1):
         """Return a list of selectable ITwitterNotify intentions for a user
 
@@ -34,20 +38,10 @@ class ITwitterNotifyManager(models.Manager):
         :param max:  maximum number of intentions to return
         :returns:    list of ITwitterNotify intentions
         """
-        ready_intentions = []
-        intentions = self.filter(user=user,
-                                 job=None,
-                                 previous=None)
-
-        for intention in intentions:
-            dependent_intentions = intention.project.repos_running() + \
-                                   intention.project.iaddghowner_set.count() + \
-                                   intention.project.iaddglowner_set.count()
-
-            if dependent_intentions == 0:
-                ready_intentions.append(intention)
-
-        return ready_intentions[:max]
+        intentions = self.ready().filter(user=user,
+                                         job=None,
+                                         previous=None)
+        return list(intentions[:max])
 
 
 class ITwitterNotify(Intention):
@@ -81,18 +75,10 @@ class ITwitterNotify(Intention):
         # are never rescheduled but we provide the same implementation
         # as selectable_intentions
 
-        intentions = cls.objects \
+        intention = cls.objects.ready() \
             .select_related('job') \
-            .exclude(job=None).filter(job__worker=None)
-
-        intention = None
-        for intention in intentions:
-            dependent_intentions = intention.project.repos_running() + \
-                                   intention.project.iaddghowner_set.count() + \
-                                   intention.project.iaddglowner_set.count()
-
-            if dependent_intentions == 0:
-                break
+            .exclude(job=None).filter(job__worker=None) \
+            .first()
 
         if intention:
             return intention.update_job_worker(worker)
@@ -1,3 +1,43 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from cauldron_apps.cauldron.models import Project, GitRepository, IAddGHOwner
+from cauldron_apps.poolsched_git.models import IGitRaw
+from .models import ITwitterNotify
+
+User = get_user_model()
+
+
+class TestReady(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='A')
+        self.project = Project.objects.create(name='project', creator=self.user)
+        self.repo = GitRepository.objects.create(url='https://github.com/my-org/project')
+        self.repo.projects.add(self.project)
+        self.repo.link_sched_repo()
+        self.intention = ITwitterNotify.objects.create(user=self.user, project=self.project,
+                                                       report_url='https://cauldron.io/report')
+
+    def test_ready(self):
+        """Intentions are ready when their project has no intentions pending"""
+        self.assertEqual(list(ITwitterNotify.objects.ready()), [self.intention])
+        self.assertEqual(ITwitterNotify.objects.selectable_intentions(self.user), [self.intention])
+
+    def test_repository_pending(self):
+        """Intentions are not ready while a repository of the project is analyzed"""
+        raw = IGitRaw.objects.create(user=self.user, repo=self.repo.repo_sched)
+        self.assertFalse(ITwitterNotify.objects.ready().exists())
+        self.assertEqual(ITwitterNotify.objects.selectable_intentions(self.user), [])
+        raw.delete()
+        self.assertTrue(ITwitterNotify.objects.ready().exists())
+
+    def test_owner_pending(self):
+        """Intentions are not ready while owners are added to the project"""
+        IAddGHOwner.objects.create(user=self.user, owner='my-org', project=self.project)
+        self.assertFalse(ITwitterNotify.objects.ready().exists())
+
+    def test_other_user(self):
+        """Intentions are selectable only for their user"""
+        other = User.objects.create(username='B')
+        self.assertEqual(ITwitterNotify.objects.selectable_intentions(other), [])
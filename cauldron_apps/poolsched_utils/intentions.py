@@ -0,0 +1,200 @@
+"""
+Bulk creation of the raw and enrich intentions of many repositories.
+
+Creating the intentions of a repository with `get_or_create` and
+`previous.add` takes several queries, thousands of them for big
+projects. `analyze_repos` reads the intentions a user already has for
+the repositories with one query per model, inserts the missing ones in
+batches and links every enrich intention with its raw intention with a
+single insert in the `previous` table. `archive_repos` does the same
+for repositories archived without being analyzed, and `finished_repos`
+finds the repositories whose last analysis finished with one query for
+each batch of repositories.
+
+Intentions are multi-table models (their parent is poolsched's
+Intention or ArchivedIntention), which `bulk_create` does not support:
+`bulk_create_inherited` inserts the parent rows first, and then the
+rows of the model with the ids returned. MySQL (and MariaDB before 10.5)
+cannot return the ids of a bulk insert, but InnoDB gives consecutive ids
+to the rows of a multi-row INSERT and LAST_INSERT_ID() is the first of
+them: the ids of each batch are that range, checked with one query. If
+they do not match, or with other databases without returned ids, every
+object is saved on its own.
+
+Signals are not sent for the objects created in bulk.
+"""
+
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils.timezone import now
+
+from poolsched.models import Intention, ArchivedIntention
+
+# Rows inserted, or ids queried, in each statement
+BATCH_SIZE = 500
+
+
+def _batches(items):
+    items = list(items)
+    for start in range(0, len(items), BATCH_SIZE):
+        yield items[start:start + BATCH_SIZE]
+
+
+class _NotConsecutive(Exception):
+    """The ids of a bulk insert in MySQL are not a consecutive range"""
+
+
+def _insert_parents(parent_model, parents, fields, db):
+    """Insert the parents in MySQL and set their ids, see the module docstring"""
+    connection = connections[db]
+    for batch in _batches(parents):
+        parent_model._base_manager._insert(batch, fields=fields, using=db)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT LAST_INSERT_ID(), @@auto_increment_increment')
+            first, step = cursor.fetchone()
+        ids = range(first, first + step * len(batch), step)
+        if parent_model._base_manager.using(db).filter(pk__in=list(ids)).count() != len(batch):
+            raise _NotConsecutive
+        for parent, pk in zip(batch, ids):
+            parent.pk = pk
+
+
+def bulk_create_inherited(model, objs):
+    """Insert objects of a model with a concrete parent model in a few statements
+
+    :param model: model of the objects, e.g. IGitRaw
+    :param objs:  list of objects to insert
+    :returns:     the objects, with their primary keys set
+    """
+    if not objs:
+        return objs
+    db = router.db_for_write(model)
+    connection = connections[db]
+    if not (connection.features.can_return_rows_from_bulk_insert or connection.vendor == 'mysql'):
+        return _save_each(objs, db)
+    (parent_model, link), = model._meta.parents.items()
+    parent_fields = [field for field in parent_model._meta.concrete_fields if not field.primary_key]
+    parents = [parent_model(**{field.attname: getattr(obj, field.attname) for field in parent_fields})
+               for obj in objs]
+    try:
+        with transaction.atomic(using=db):
+            if connection.features.can_return_rows_from_bulk_insert:
+                parent_model._base_manager.using(db).bulk_create(parents, batch_size=BATCH_SIZE)
+            else:
+                _insert_parents(parent_model, parents, parent_fields, db)
+            for obj, parent in zip(objs, parents):
+                # Values set when inserting the parent (e.g. auto_now_add)
+                for field in parent_fields:
+                    setattr(obj, field.attname, getattr(parent, field.attname))
+                setattr(obj, link.attname, parent.pk)
+            for batch in _batches(objs):
+                model._base_manager._insert(batch, fields=model._meta.local_concrete_fields, using=db)
+    except _NotConsecutive:
+        return _save_each(objs, db)
+    for obj in objs:
+        obj._state.adding = False
+        obj._state.db = db
+    return objs
+
+
+def _save_each(objs, db):
+    for obj in objs:
+        obj.save(using=db)
+    return objs
+
+
+def _existing(model, user, field, repo_ids):
+    """Ids of the intentions of a user for some repositories, by repository id"""
+    existing = {}
+    for batch in _batches(repo_ids):
+        existing.update(model.objects.filter(user=user, **{f'{field}__in': batch})
+                        .values_list(f'{field}_id', 'pk'))
+    return existing
+
+
+def _create(model, user, field, repos, existing):
+    """Create the intentions of the repositories not in `existing`, and add their ids"""
+    intentions = [model(user=user, **{field: repo}) for repo in repos if repo.pk not in existing]
+    bulk_create_inherited(model, intentions)
+    existing.update((getattr(intention, f'{field}_id'), intention.pk) for intention in intentions)
+
+
+def analyze_repos(user, repos, raw_model, enrich_model, field='repo'):
+    """Create the raw and enrich intentions of a user for some repositories
+
+    It is the same as running this for every repository, without the signals:
+        raw, _ = raw_model.objects.get_or_create(user=user, repo=repo)
+        enrich, _ = enrich_model.objects.get_or_create(user=user, repo=repo)
+        enrich.previous.add(raw)
+
+    :param user:         user of the intentions
+    :param repos:        scheduler repositories to analyze
+    :param raw_model:    model of the raw intentions, e.g. IGitRaw
+    :param enrich_model: model of the enrich intentions, e.g. IGitEnrich
+    :param field:        field of the intentions with the repository
+    """
+    repos = list({repo.pk: repo for repo in repos}.values())
+    repo_ids = [repo.pk for repo in repos]
+    raws = _existing(raw_model, user, field, repo_ids)
+    enrichs = _existing(enrich_model, user, field, repo_ids)
+    _create(raw_model, user, field, repos, raws)
+    _create(enrich_model, user, field, repos, enrichs)
+
+    through = Intention.previous.through
+    source = Intention.previous.field.m2m_field_name()
+    target = Intention.previous.field.m2m_reverse_field_name()
+    links = [through(**{f'{source}_id': enrichs[repo_id], f'{target}_id': raws[repo_id]})
+             for repo_id in repo_ids]
+    through.objects.bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def archive_repos(user, repos, raw_archived_model, enrich_archived_model, field='repo'):
+    """Archive as done the raw and enrich intentions of a user for some repositories
+
+    :param user:                  user of the intentions
+    :param repos:                 scheduler repositories with no changes
+    :param raw_archived_model:    model of the archived raw intentions
+    :param enrich_archived_model: model of the archived enrich intentions
+    :param field:                 field of the intentions with the repository
+    """
+    created = now()
+    for model in (raw_archived_model, enrich_archived_model):
+        archived = [model(user=user, created=created, status=ArchivedIntention.OK, **{field: repo})
+                    for repo in repos]
+        bulk_create_inherited(model, archived)
+
+
+def finished_repos(repos, raw_model, enrich_model, enrich_archived_model, field='repo'):
+    """Ids of the repositories without intentions whose last enrichment finished
+
+    It is the same as checking these conditions for every repository,
+    with a single query for each batch of repositories:
+        not raw_model.objects.filter(repo=repo).exists()
+        not enrich_model.objects.filter(repo=repo).exists()
+        enrich_archived_model.objects.filter(repo=repo).latest('completed').status == ArchivedIntention.OK
+
+    :param repos:                 scheduler repositories to check
+    :param raw_model:             model of the raw intentions
+    :param enrich_model:          model of the enrich intentions
+    :param enrich_archived_model: model of the archived enrich intentions
+    :param field:                 field of the intentions with the repository
+    :returns:                     set of repository ids
+    """
+    repos = list(repos)
+    if not repos:
+        return set()
+    repo_model = type(repos[0])
+
+    def of_repo(model):
+        return model.objects.filter(**{field: OuterRef('pk')})
+
+    last_status = of_repo(enrich_archived_model).order_by('-completed').values('status')[:1]
+    finished = set()
+    for batch in _batches(repo.pk for repo in repos):
+        finished.update(repo_model.objects.filter(pk__in=batch)
+                        .exclude(Exists(of_repo(raw_model)))
+                        .exclude(Exists(of_repo(enrich_model)))
+                        .annotate(last_status=Subquery(last_status))
+                        .filter(last_status=ArchivedIntention.OK)
+                        .values_list('pk', flat=True))
+    return finished
@@ -1,16 +1,28 @@
+import concurrent.futures
+import copy
 import logging
+import math
 import os
+import threading
+import traceback
 
 from django.conf import settings
 
+from . import es_sizes, sh_database
+
 try:
     from sirmordred.config import Config
+    from sirmordred.task_collection import TaskRawDataCollection
 except ImportError:
     from . import sirmordred_fake
     Config = sirmordred_fake.Config
+    TaskRawDataCollection = sirmordred_fake.TaskRawDataCollection
 
 logger = logging.getLogger("mordred-worker")
 
+# Tasks and enrichers share a pooled SortingHat database per process
+sh_database.install()
+
 ELASTIC_URL = 'https://admin:{}@{}:{}'.format(settings.ES_ADMIN_PASSWORD,
                                               settings.ES_IN_HOST,
                                               settings.ES_IN_PORT)
@@ -22,20 +34,108 @@ else:
     MORDRED_FILE = os.path.join(MORDRED_UTILS_DIR, 'setup.cfg')
 
 
+# Configuration shared by all the backends, parsed once per process
+_base_config = None
+_base_config_lock = threading.Lock()
+
+
+def base_config():
+    """Return a copy of the configuration shared by all the backends
+
+    MORDRED_FILE is parsed, and the common parameters are set, only
+    the first time. Each backend gets its own copy to modify.
+    """
+    global _base_config
+    with _base_config_lock:
+        if _base_config is None:
+            config = Config(MORDRED_FILE)
+            config.set_param('es_collection', 'url', ELASTIC_URL)
+            config.set_param('es_enrichment', 'url', ELASTIC_URL)
+            config.set_param('general', 'aliases_file', ALIASES_FILE)
+            if settings.SORTINGHAT:
+                config.set_param('sortinghat', 'host', settings.SORTINGHAT_HOST)
+                config.set_param('sortinghat', 'database', settings.SORTINGHAT_DATABASE)
+                config.set_param('sortinghat', 'user', settings.SORTINGHAT_USER)
+                config.set_param('sortinghat', 'password', settings.SORTINGHAT_PASSWORD)
+            _base_config = config
+        return copy.deepcopy(_base_config)
+
+
 class Backend:
+    # Name of the backend for its Elasticsearch sizes, see es_sizes
+    name = None
+
     def __init__(self):
-        self.config = Config(MORDRED_FILE)
-        self.config.set_param('es_collection', 'url', ELASTIC_URL)
-        self.config.set_param('es_enrichment', 'url', ELASTIC_URL)
-        self.config.set_param('general', 'aliases_file', ALIASES_FILE)
-        if settings.SORTINGHAT:
-            self.config.set_param('sortinghat', 'host', settings.SORTINGHAT_HOST)
-            self.config.set_param('sortinghat', 'database', settings.SORTINGHAT_DATABASE)
-            self.config.set_param('sortinghat', 'user', settings.SORTINGHAT_USER)
-            self.config.set_param('sortinghat', 'password', settings.SORTINGHAT_PASSWORD)
+        self.config = base_config()
+        es_sizes.apply(self.config, self.name)
 
     def start_analysis(self):
         """Call to Grimoirelab"""
 
     def run(self):
         raise NotImplementedError
+
+
+def collect_section(config, section):
+    """Run the raw data collection of a backend section.
+    Return 0 or None for success, 1 for error, other for time to reset in minutes
+    """
+    task = TaskRawDataCollection(config, backend_section=section)
+    try:
+        out_repos = task.execute()
+        repo = out_repos[0]
+        if 'error' in repo and repo['error']:
+            logger.error(repo['error'])
+            if repo['error'].startswith('RateLimitError'):
+                seconds_to_reset = float(repo['error'].split(' ')[-1])
+                restart_minutes = math.ceil(seconds_to_reset / 60) + 2
+                logger.warning("RateLimitError. This task will be restarted in: "
+                               "{} minutes".format(restart_minutes))
+                return restart_minutes
+            return 1
+    except Exception as e:
+        logger.error("Error in raw data retrieval from {}. Cause: {}".format(section, e))
+        traceback.print_exc()
+        return 1
+
+
+def collect_sections(config, sections, parallel=False, completed=None):
+    """Run the raw data collection of several backend sections.
+
+    Sections are collected one after the other, stopping at the first
+    one that fails. With parallel, all of them are collected at the same
+    time in threads, using the same token: any error is an error, and
+    the restart time is the longest one among the sections rate limited.
+
+    If a list of completed sections is given, those sections are skipped,
+    and the sections collected successfully are added to it. Sections
+    interrupted are resumed by grimoire_elk from the last item stored.
+
+    Return 0 or None for success, 1 for error, other for time to reset in minutes
+    """
+    if completed is None:
+        completed = []
+    pending = [section for section in sections if section not in completed]
+    if completed:
+        logger.info("Skipping sections already collected: {}".format(completed))
+
+    def collect(section):
+        output = collect_section(config, section)
+        if not output:
+            completed.append(section)
+        return output
+
+    if not parallel:
+        for section in pending:
+            output = collect(section)
+            if output:
+                return output
+        return None
+
+    if not pending:
+        return None
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(pending)) as executor:
+        outputs = list(executor.map(collect, pending))
+    if 1 in outputs:
+        return 1
+    return max((output for output in outputs if output), default=None)
@@ -0,0 +1,125 @@
+"""
+Sizes of the Elasticsearch requests made by the backends.
+
+`bulk_size` is the number of items written in each bulk request and
+`scroll_size` the number of items read in each scroll page. They are
+settings.BULK_SIZE and settings.SCROLL_SIZE, unless the backend has its
+own value in settings.BACKEND_BULK_SIZES or settings.BACKEND_SCROLL_SIZES
+(e.g. `{"git": 1000}`).
+
+With settings.ADAPTIVE_BULK_SIZE, the bulk size of each backend starts
+with its configured value and is adapted after each enrichment, looking
+at the statistics of the cluster during the run:
+* if the write thread pool rejected requests, or the average time of a
+  bulk request was over settings.BULK_LATENCY_THRESHOLD_MS, it is halved
+* if there were bulk requests below the threshold, it is doubled up to
+  settings.BULK_SIZE_MAX
+* otherwise (no bulk requests observed), it is left unchanged
+The statistics are those of the whole cluster, so requests made by other
+workers at the same time count too: a busy cluster makes every backend
+shrink its bulk size, which is the intended back-off, but a backend
+only grows when the cluster as a whole is responsive.
+The adapted sizes are kept for the lifetime of the worker process.
+"""
+
+import contextlib
+import logging
+import ssl
+import threading
+
+from django.conf import settings
+
+from elasticsearch import Elasticsearch, ElasticsearchException
+from elasticsearch.connection import create_ssl_context
+
+logger = logging.getLogger(__name__)
+
+# Smallest bulk size used by the adaptive mode
+BULK_SIZE_MIN = 50
+
+_adapted = {}
+_adapted_lock = threading.Lock()
+
+
+def configured_bulk_size(backend):
+    return settings.BACKEND_BULK_SIZES.get(backend, settings.BULK_SIZE)
+
+
+def bulk_size(backend):
+    """Bulk size to use for a backend now"""
+    with _adapted_lock:
+        return _adapted.get(backend) or configured_bulk_size(backend)
+
+
+def scroll_size(backend):
+    """Scroll size to use for a backend"""
+    return settings.BACKEND_SCROLL_SIZES.get(backend, settings.SCROLL_SIZE)
+
+
+def apply(config, backend):
+    """Set the sizes of a backend in its mordred configuration"""
+    config.set_param('general', 'bulk_size', bulk_size(backend))
+    config.set_param('general', 'scroll_size', scroll_size(backend))
+
+
+def cluster_stats():
+    """Write rejections and bulk requests of the cluster since it started
+
+    :returns: tuple (rejected, bulk requests, bulk time in ms),
+              or None if the statistics are not available
+    """
+    context = create_ssl_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    elastic = Elasticsearch(hosts=[settings.ES_IN_HOST], scheme='https', port=settings.ES_IN_PORT,
+                            http_auth=("admin", settings.ES_ADMIN_PASSWORD),
+                            ssl_context=context, timeout=5)
+    try:
+        nodes = elastic.nodes.stats(metric='thread_pool,indices')['nodes']
+    except ElasticsearchException as e:
+        logger.warning(f"Cannot read Elasticsearch statistics: {e}")
+        return None
+    rejected = requests = time_ms = 0
+    for node in nodes.values():
+        rejected += node.get('thread_pool', {}).get('write', {}).get('rejected', 0)
+        bulk = node.get('indices', {}).get('bulk', {})
+        requests += bulk.get('total_operations', 0)
+        time_ms += bulk.get('total_time_in_millis', 0)
+    return rejected, requests, time_ms
+
+
+def next_bulk_size(size, rejected, latency_ms):
+    """Bulk size after a run with `rejected` requests and `latency_ms` per request
+
+    `latency_ms` is None if no bulk requests were observed.
+    """
+    if rejected or (latency_ms is not None and latency_ms > settings.BULK_LATENCY_THRESHOLD_MS):
+        return max(BULK_SIZE_MIN, size // 2)
+    if latency_ms is None:
+        return size
+    return min(settings.BULK_SIZE_MAX, size * 2)
+
+
+@contextlib.contextmanager
+def adaptive_bulk_size(backend):
+    """Adapt the bulk size of a backend with the run inside the context
+
+    Does nothing unless settings.ADAPTIVE_BULK_SIZE is set.
+    """
+    if not settings.ADAPTIVE_BULK_SIZE:
+        yield
+        return
+    before = cluster_stats()
+    yield
+    after = cluster_stats()
+    if not before or not after:
+        return
+    rejected = after[0] - before[0]
+    requests = after[1] - before[1]
+    latency_ms = (after[2] - before[2]) / requests if requests > 0 else None
+    with _adapted_lock:
+        size = _adapted.get(backend) or configured_bulk_size(backend)
+        _adapted[backend] = next_bulk_size(size, rejected, latency_ms)
+    if _adapted[backend] != size:
+        logger.info(f"Bulk size for {backend}: {size} -> {_adapted[backend]} "
+                    f"(rejected: {rejected}, latency: {latency_ms} ms)")
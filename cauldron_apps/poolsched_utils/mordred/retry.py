@@ -0,0 +1,75 @@
+"""
+Bounded retries for the construction of sirmordred tasks.
+
+Creating a task that uses SortingHat (e.g. TaskEnrich) can fail with a
+database error when other workers are creating the schema or holding
+locks at the same time. `create_task` retries the construction with
+exponential backoff and jitter, up to `MAX_ATTEMPTS`, and then raises
+`TaskCreationError`, so the job fails and the worker is free for other
+jobs instead of retrying forever.
+
+The number of races seen in this process is kept in `stats`.
+"""
+
+import collections
+import logging
+import random
+import threading
+import time
+
+try:
+    import sqlalchemy
+    RETRY_ERRORS = (sqlalchemy.exc.InternalError, sqlalchemy.exc.OperationalError)
+except ImportError:
+    RETRY_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# Seconds before the first retry, doubled on every attempt up to BACKOFF_MAX
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+# Counters of this process: tasks created, retries and tasks not created
+stats = collections.Counter()
+_stats_lock = threading.Lock()
+
+
+class TaskCreationError(Exception):
+    """The task could not be created after MAX_ATTEMPTS"""
+
+
+def _count(name):
+    with _stats_lock:
+        stats[name] += 1
+
+
+def backoff(attempt):
+    """Seconds to wait after a failed attempt (starting at 1), with full jitter"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+def create_task(task_class, *args, max_attempts=MAX_ATTEMPTS, **kwargs):
+    """Create a task, retrying on database races
+
+    :param task_class:   class of the task, e.g. TaskEnrich
+    :param max_attempts: maximum number of attempts
+    :returns:            the task created
+    :raises TaskCreationError: when every attempt failed
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            task = task_class(*args, **kwargs)
+        except RETRY_ERRORS as e:
+            _count('retries')
+            logger.warning(f"Race creating {task_class.__name__} "
+                           f"(attempt {attempt}/{max_attempts}): {e}")
+            if attempt < max_attempts:
+                time.sleep(backoff(attempt))
+            continue
+        _count('created')
+        return task
+    _count('failed')
+    logger.error(f"{task_class.__name__} not created after {max_attempts} attempts. "
+                 f"Races in this process: {stats['retries']}")
+    raise TaskCreationError(f"{task_class.__name__} not created after {max_attempts} attempts")
@@ -0,0 +1,97 @@
+"""
+SortingHat database shared by all the tasks of a worker process.
+
+sirmordred tasks and grimoire_elk enrichers create a SortingHat
+`Database` (a SQLAlchemy engine) every time they are instantiated, and
+each database creates the SortingHat schema if it is not there. Workers
+running that at the same time could fail with InternalError.
+
+`install()` makes them use `shared_database`, which creates a single
+database per process, with a bounded pool of connections checked before
+use, and creates it holding a MySQL lock, so only one worker creates
+the schema at a time.
+"""
+
+import logging
+import threading
+from urllib.parse import quote_plus
+
+try:
+    import sqlalchemy
+    from sortinghat.db.database import Database
+except ImportError:
+    sqlalchemy = None
+    Database = None
+
+logger = logging.getLogger(__name__)
+
+# Connections kept in the pool, and extra connections allowed
+SH_POOL_SIZE = 5
+SH_MAX_OVERFLOW = 5
+# Seconds after which connections are recycled, below MySQL wait_timeout
+SH_POOL_RECYCLE = 1800
+# Name of the MySQL lock held while a database is created, and timeout
+SCHEMA_LOCK = 'cauldron_sortinghat_schema'
+SCHEMA_LOCK_TIMEOUT = 60
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def _build_engine(url):
+    return sqlalchemy.create_engine(url,
+                                    pool_size=SH_POOL_SIZE,
+                                    max_overflow=SH_MAX_OVERFLOW,
+                                    pool_recycle=SH_POOL_RECYCLE,
+                                    pool_pre_ping=True,
+                                    connect_args={'charset': 'utf8mb4'})
+
+
+def _create_database(**kwargs):
+    """Create a database holding the schema lock of the server"""
+    url = 'mysql+pymysql://{}:{}@{}:{}/{}'.format(quote_plus(kwargs.get('user') or ''),
+                                                  quote_plus(kwargs.get('password') or ''),
+                                                  kwargs.get('host') or 'localhost',
+                                                  kwargs.get('port') or '3306',
+                                                  kwargs.get('database'))
+    engine = _build_engine(url)
+    with engine.connect() as conn:
+        locked = conn.execute(sqlalchemy.text('SELECT GET_LOCK(:name, :timeout)'),
+                              {'name': SCHEMA_LOCK, 'timeout': SCHEMA_LOCK_TIMEOUT}).scalar()
+        if not locked:
+            logger.warning("SortingHat schema lock not acquired, creating the database anyway")
+        try:
+            db = Database(**kwargs)
+        finally:
+            if locked:
+                conn.execute(sqlalchemy.text('SELECT RELEASE_LOCK(:name)'), {'name': SCHEMA_LOCK})
+    # Use the bounded pool instead of the one created by SortingHat
+    db._engine.dispose()
+    db._engine = engine
+    db._Session.configure(bind=engine)
+    return db
+
+
+def shared_database(**kwargs):
+    """Return the SortingHat database of this process for the parameters given
+
+    It accepts the same parameters as sortinghat's Database.
+    """
+    key = tuple(sorted(kwargs.items()))
+    with _databases_lock:
+        db = _databases.get(key)
+        if db is None:
+            logger.info(f"Creating SortingHat database for {kwargs.get('host')}/{kwargs.get('database')}")
+            db = _create_database(**kwargs)
+            _databases[key] = db
+        return db
+
+
+def install():
+    """Make sirmordred and grimoire_elk use the shared database"""
+    if Database is None:
+        return
+    from sirmordred import task_enrich, task_identities
+    from grimoire_elk.enriched import enrich
+    for module in (task_enrich, task_identities, enrich):
+        module.Database = shared_database
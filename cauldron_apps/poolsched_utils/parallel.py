@@ -0,0 +1,46 @@
+"""
+Checks of many repositories in parallel, within a deadline.
+
+Refreshing a project checks whether each of its repositories changed
+with a request to a remote (git ls-remote, GitHub events, GitLab
+activity). `check_repos` runs those checks in a small pool of threads
+and stops waiting when the deadline is over, so a slow remote does not
+block the refresh of the whole project. The checks still running are
+left to finish in the background, and their repositories are missing
+from the result.
+"""
+
+import concurrent.futures
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def check_repos(check, repos, workers, timeout):
+    """Run a check for some repositories in parallel
+
+    The check runs in other threads, so it must not access the database.
+
+    :param check:   function called with each repository
+    :param repos:   scheduler repositories to check
+    :param workers: maximum number of checks running at once
+    :param timeout: maximum time (seconds) for all the checks
+    :returns:       dict with the result of each check, by repository id
+    """
+    results = {}
+    repos = list(repos)
+    if not repos:
+        return results
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(repos)))
+    futures = {executor.submit(check, repo): repo for repo in repos}
+    try:
+        for future in concurrent.futures.as_completed(futures, timeout=timeout):
+            results[futures[future].pk] = future.result()
+    except concurrent.futures.TimeoutError:
+        logger.warning(f"{len(futures) - len(results)} of {len(futures)} repositories "
+                       f"not checked in {timeout} seconds")
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+    return results
@@ -0,0 +1,88 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..mordred.backend import base_config, collect_sections
+
+SECTIONS = ['github:issue', 'github:pull', 'github:repo']
+
+
+class TestCollectSections(SimpleTestCase):
+
+    def collect(self, outputs, **kwargs):
+        """Collect SECTIONS, with the output of each section in `outputs`"""
+        collected = []
+        lock = threading.Lock()
+
+        def collect_section(config, section):
+            with lock:
+                collected.append(section)
+            return outputs.get(section)
+
+        with mock.patch('cauldron_apps.poolsched_utils.mordred.backend.collect_section',
+                        side_effect=collect_section):
+            output = collect_sections(None, SECTIONS, **kwargs)
+        return output, collected
+
+    def test_sequential(self):
+        """Sections are collected in order, stopping at the first failure"""
+        completed = []
+        output, collected = self.collect({'github:pull': 5}, completed=completed)
+        self.assertEqual(output, 5)
+        self.assertEqual(collected, ['github:issue', 'github:pull'])
+        self.assertEqual(completed, ['github:issue'])
+
+    def test_parallel(self):
+        """All the sections are collected in parallel"""
+        completed = []
+        output, collected = self.collect({}, parallel=True, completed=completed)
+        self.assertIsNone(output)
+        self.assertEqual(sorted(collected), SECTIONS)
+        self.assertEqual(sorted(completed), SECTIONS)
+
+    def test_parallel_rate_limit(self):
+        """The restart time is the longest one among the sections rate limited"""
+        completed = []
+        output, collected = self.collect({'github:issue': 5, 'github:repo': 20}, parallel=True,
+                                         completed=completed)
+        self.assertEqual(output, 20)
+        self.assertEqual(sorted(collected), SECTIONS)
+        self.assertEqual(completed, ['github:pull'])
+
+    def test_parallel_error(self):
+        """Errors prevail over rate limits"""
+        output, _ = self.collect({'github:issue': 5, 'github:pull': 1}, parallel=True)
+        self.assertEqual(output, 1)
+
+    def test_completed(self):
+        """Sections completed are skipped"""
+        for parallel in (False, True):
+            completed = ['github:issue', 'github:pull']
+            output, collected = self.collect({}, parallel=parallel, completed=completed)
+            self.assertIsNone(output)
+            self.assertEqual(collected, ['github:repo'])
+            self.assertEqual(completed, SECTIONS)
+
+
+class FakeConfig:
+    def __init__(self, filename):
+        self.params = {}
+
+    def set_param(self, section, param, value):
+        self.params[(section, param)] = value
+
+
+@mock.patch('cauldron_apps.poolsched_utils.mordred.backend._base_config', None)
+@mock.patch('cauldron_apps.poolsched_utils.mordred.backend.Config', side_effect=FakeConfig)
+class TestBaseConfig(SimpleTestCase):
+
+    def test_parsed_once(self, config_class):
+        """The configuration is parsed once, and each call gets a copy"""
+        first = base_config()
+        second = base_config()
+        config_class.assert_called_once()
+        self.assertIsNot(first, second)
+        self.assertEqual(first.params, second.params)
+        first.set_param('general', 'bulk_size', 10)
+        self.assertNotIn(('general', 'bulk_size'), base_config().params)
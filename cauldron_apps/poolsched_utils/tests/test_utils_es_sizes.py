@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ..mordred import es_sizes
+
+
+@override_settings(BULK_SIZE=100, SCROLL_SIZE=200, BACKEND_BULK_SIZES={'git': 1000},
+                   BACKEND_SCROLL_SIZES={'github': 50}, ADAPTIVE_BULK_SIZE=False,
+                   BULK_SIZE_MAX=400, BULK_LATENCY_THRESHOLD_MS=1000)
+class TestSizes(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(es_sizes, '_adapted', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_overrides(self):
+        """Backends use their own sizes, or the default ones"""
+        self.assertEqual(es_sizes.bulk_size('git'), 1000)
+        self.assertEqual(es_sizes.bulk_size('github'), 100)
+        self.assertEqual(es_sizes.scroll_size('git'), 200)
+        self.assertEqual(es_sizes.scroll_size('github'), 50)
+
+    def test_apply(self):
+        """The sizes are set in the mordred configuration"""
+        config = mock.Mock()
+        es_sizes.apply(config, 'git')
+        config.set_param.assert_any_call('general', 'bulk_size', 1000)
+        config.set_param.assert_any_call('general', 'scroll_size', 200)
+
+    def test_next_bulk_size(self):
+        """The size is halved on rejections or slow requests, and doubled otherwise"""
+        self.assertEqual(es_sizes.next_bulk_size(100, 1, 10), 50)
+        self.assertEqual(es_sizes.next_bulk_size(100, 0, 2000), 50)
+        self.assertEqual(es_sizes.next_bulk_size(60, 0, 2000), es_sizes.BULK_SIZE_MIN)
+        self.assertEqual(es_sizes.next_bulk_size(100, 0, 10), 200)
+        self.assertEqual(es_sizes.next_bulk_size(300, 0, 10), 400)
+        self.assertEqual(es_sizes.next_bulk_size(100, 0, None), 100)
+
+    @mock.patch.object(es_sizes, 'cluster_stats')
+    def test_disabled(self, cluster_stats):
+        """Sizes are not adapted unless ADAPTIVE_BULK_SIZE is set"""
+        with es_sizes.adaptive_bulk_size('github'):
+            pass
+        cluster_stats.assert_not_called()
+        self.assertEqual(es_sizes.bulk_size('github'), 100)
+
+    @override_settings(ADAPTIVE_BULK_SIZE=True)
+    @mock.patch.object(es_sizes, 'cluster_stats')
+    def test_adaptive(self, cluster_stats):
+        """The size of a backend is adapted with the statistics of each run"""
+        # 10 fast bulk requests
+        cluster_stats.side_effect = [(0, 0, 0), (0, 10, 100)]
+        with es_sizes.adaptive_bulk_size('github'):
+            pass
+        self.assertEqual(es_sizes.bulk_size('github'), 200)
+        # Rejected requests
+        cluster_stats.side_effect = [(0, 10, 100), (3, 20, 200)]
+        with es_sizes.adaptive_bulk_size('github'):
+            pass
+        self.assertEqual(es_sizes.bulk_size('github'), 100)
+        self.assertEqual(es_sizes.bulk_size('git'), 1000)
+
+    @override_settings(ADAPTIVE_BULK_SIZE=True)
+    @mock.patch.object(es_sizes, 'cluster_stats', return_value=None)
+    def test_no_stats(self, cluster_stats):
+        """Sizes are not changed without statistics"""
+        with es_sizes.adaptive_bulk_size('github'):
+            pass
+        self.assertEqual(es_sizes.bulk_size('github'), 100)
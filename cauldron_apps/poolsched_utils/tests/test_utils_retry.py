@@ -0,0 +1,64 @@
+import collections
+from unittest import mock
+
+import sqlalchemy
+from django.test import SimpleTestCase
+
+from ..mordred import retry
+from ..mordred.retry import create_task, backoff, TaskCreationError
+
+
+def race():
+    return sqlalchemy.exc.OperationalError('CREATE TABLE', {}, Exception('Lock wait timeout'))
+
+
+@mock.patch('time.sleep')
+class TestCreateTask(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(retry, 'stats', collections.Counter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_created(self, sleep):
+        """Tasks are created at the first attempt without waiting"""
+        task_class = mock.Mock(__name__='Task')
+        self.assertIs(create_task(task_class, 'config', backend_section='git'), task_class.return_value)
+        task_class.assert_called_once_with('config', backend_section='git')
+        sleep.assert_not_called()
+        self.assertEqual(retry.stats['created'], 1)
+
+    def test_retry(self, sleep):
+        """Races are retried with backoff"""
+        task_class = mock.Mock(__name__='Task', side_effect=[race(), race(), 'task'])
+        self.assertEqual(create_task(task_class), 'task')
+        self.assertEqual(task_class.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(retry.stats['retries'], 2)
+
+    def test_max_attempts(self, sleep):
+        """TaskCreationError is raised after max_attempts"""
+        task_class = mock.Mock(__name__='Task', side_effect=[race() for _ in range(3)])
+        with self.assertRaises(TaskCreationError):
+            create_task(task_class, max_attempts=3)
+        self.assertEqual(task_class.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(retry.stats['failed'], 1)
+
+    def test_other_errors(self, sleep):
+        """Other errors are not retried"""
+        task_class = mock.Mock(__name__='Task', side_effect=ValueError)
+        with self.assertRaises(ValueError):
+            create_task(task_class)
+        task_class.assert_called_once()
+        sleep.assert_not_called()
+
+
+class TestBackoff(SimpleTestCase):
+
+    def test_bounds(self):
+        """The wait is below the exponential bound and BACKOFF_MAX"""
+        for attempt in range(1, 10):
+            bound = min(retry.BACKOFF_MAX, retry.BACKOFF_BASE * 2 ** (attempt - 1))
+            for _ in range(20):
+                self.assertTrue(0 <= backoff(attempt) <= bound)
@@ -0,0 +1,23 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..mordred.sh_database import shared_database
+
+
+@mock.patch('cauldron_apps.poolsched_utils.mordred.sh_database._databases', {})
+@mock.patch('cauldron_apps.poolsched_utils.mordred.sh_database._create_database',
+            side_effect=lambda **kwargs: mock.Mock(kwargs=kwargs))
+class TestSharedDatabase(SimpleTestCase):
+
+    def test_shared(self, create_database):
+        """A database is created once for the same parameters"""
+        db = shared_database(user='root', password='', database='sh', host='mariadb')
+        self.assertIs(shared_database(host='mariadb', database='sh', password='', user='root'), db)
+        create_database.assert_called_once_with(user='root', password='', database='sh', host='mariadb')
+
+    def test_parameters(self, create_database):
+        """Databases with other parameters are different"""
+        db = shared_database(user='root', database='sh')
+        self.assertIsNot(shared_database(user='root', database='other'), db)
+        self.assertEqual(create_database.call_count, 2)
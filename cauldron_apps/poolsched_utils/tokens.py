@@ -0,0 +1,189 @@
+"""
+Token pool shared by the backends that use API tokens
+(GHToken, GLToken, MeetupToken and StackExchangeToken).
+
+Every token keeps the number of jobs using it in `num_jobs`, so
+the scheduler can find tokens with capacity with a single query on
+the token table, without counting the jobs of each token. The
+counter is updated by signals whenever a job is added to a token,
+removed from it or deleted.
+
+The number of jobs a token accepts depends on its remaining rate
+limit: tokens with a full quota accept `MAX_JOBS_FRESH_TOKEN` jobs,
+tokens close to exhaustion accept none, and tokens whose rate limit
+is unknown accept `MAX_JOBS_TOKEN`. The rate limit is recorded with
+`record_rate` from API responses and raw collection errors.
+
+Token models using the pool must define:
+* `MAX_JOBS_TOKEN`: jobs using a token concurrently when its rate is unknown
+* `MAX_JOBS_FRESH_TOKEN`: jobs using a token concurrently with a full rate
+* `REQUESTS_PER_JOB`: requests reserved for each job using the token
+* `num_jobs`: counter of jobs using the token
+* `max_jobs`: jobs accepted by the token with its current rate
+* `rate_remaining`, `rate_limit`, `rate_reset`: last rate limit known
+* `reset`: time at which the token can be used again
+* `jobs`: ManyToManyField with the jobs using the token
+
+Tokens marked as `shared` (donated by users, or service tokens without
+user) form the pool of their instance. Users without capacity in their
+own tokens can borrow them with `borrow_tokens`, for a limited number
+of jobs at once.
+"""
+
+import datetime
+import logging
+
+from django.db.models import F, Q
+from django.db.models.signals import m2m_changed, post_delete
+from django.utils.timezone import now
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of jobs of a user running with tokens of the shared pool
+SHARED_JOBS_PER_USER = 2
+
+
+def available_tokens(tokens):
+    """Filter the tokens that can be assigned to a new job
+
+    :param tokens: queryset of tokens
+    :returns:      queryset of tokens ready and below the job limit
+    """
+    # Once the rate window is over the token has its full quota again
+    fresh = Q(rate_reset__lt=now(), num_jobs__lt=tokens.model.MAX_JOBS_FRESH_TOKEN)
+    return tokens.filter(Q(num_jobs__lt=F('max_jobs')) | fresh,
+                         reset__lt=now())
+
+
+def select_tokens(tokens, count=1):
+    """Select the best tokens for a new job
+
+    Tokens with fewer jobs are preferred, then tokens with more
+    requests remaining, and then tokens that were reset before.
+
+    :param tokens: queryset of tokens
+    :param count:  maximum number of tokens to return
+    :returns:      list of tokens
+    """
+    order = ('num_jobs', F('rate_remaining').desc(nulls_last=True), 'reset')
+    return list(available_tokens(tokens).order_by(*order)[:count])
+
+
+def borrow_tokens(tokens, jobs_borrowed, count=1):
+    """Select tokens of the shared pool for a user without capacity
+
+    Each user can borrow tokens for SHARED_JOBS_PER_USER jobs at once,
+    so the pool is shared fairly among the users that need it.
+
+    :param tokens:        queryset of tokens not owned by the user
+    :param jobs_borrowed: jobs of the user already running with borrowed tokens
+    :param count:         maximum number of tokens to return
+    :returns:             list of tokens
+    """
+    if jobs_borrowed >= SHARED_JOBS_PER_USER:
+        return []
+    return select_tokens(tokens.filter(shared=True), count)
+
+
+def max_jobs(token_model, remaining):
+    """Number of concurrent jobs for a token with `remaining` requests"""
+    if remaining is None:
+        return token_model.MAX_JOBS_TOKEN
+    return min(token_model.MAX_JOBS_FRESH_TOKEN,
+               max(remaining, 0) // token_model.REQUESTS_PER_JOB)
+
+
+def record_rate(token, remaining, limit=None, reset=None):
+    """Store the rate limit of a token and adjust its capacity
+
+    When the token is exhausted it will not be used until `reset`.
+
+    :param token:     token to update
+    :param remaining: requests remaining in the current window
+    :param limit:     requests allowed in a window, if known
+    :param reset:     datetime when the window is over, if known
+    """
+    token.rate_remaining = remaining
+    if limit is not None:
+        token.rate_limit = limit
+    token.rate_reset = reset
+    token.max_jobs = max_jobs(type(token), remaining)
+    fields = ['rate_remaining', 'rate_limit', 'rate_reset', 'max_jobs']
+    if remaining <= 0 and reset:
+        token.reset = reset
+        fields.append('reset')
+    token.save(update_fields=fields)
+    logger.debug(f'{token} rate: {remaining}/{token.rate_limit}, max jobs: {token.max_jobs}')
+
+
+def record_rate_headers(token, headers, prefix='X-RateLimit-'):
+    """Store the rate limit of a token from the headers of a response
+
+    The reset header must be an epoch timestamp, as used by GitHub
+    (`X-RateLimit-`) and GitLab (`RateLimit-`). Responses without
+    rate limit headers are ignored.
+
+    :returns: True if the rate was recorded
+    """
+    try:
+        remaining = int(headers[f'{prefix}Remaining'])
+    except (KeyError, ValueError):
+        return False
+    limit = headers.get(f'{prefix}Limit')
+    reset = headers.get(f'{prefix}Reset')
+    if reset:
+        reset = datetime.datetime.fromtimestamp(int(reset), tz=datetime.timezone.utc)
+    record_rate(token, remaining,
+                limit=int(limit) if limit else None,
+                reset=reset or None)
+    return True
+
+
+def record_exhausted(token, minutes):
+    """Store that a token run out of requests, as reported by a raw collection error"""
+    record_rate(token, 0, reset=now() + datetime.timedelta(minutes=minutes))
+
+
+def _token_field(token_model):
+    return f'{token_model._meta.model_name}_id'
+
+
+def track_jobs(token_model):
+    """Keep `num_jobs` updated for a token model
+
+    Call it from the `ready` method of the application.
+
+    :param token_model: token model with a `jobs` ManyToManyField
+    """
+    through = token_model.jobs.through
+    token_field = _token_field(token_model)
+
+    def jobs_added(sender, instance, action, reverse, pk_set, **kwargs):
+        if action != 'post_add' or not pk_set:
+            return
+        if reverse:
+            # job.<tokens>.add(*tokens)
+            token_model.objects.filter(pk__in=pk_set).update(num_jobs=F('num_jobs') + 1)
+        else:
+            # token.jobs.add(*jobs)
+            token_model.objects.filter(pk=instance.pk).update(num_jobs=F('num_jobs') + len(pk_set))
+
+    def job_removed(sender, instance, **kwargs):
+        # Rows of the relation are removed with remove(), clear() and
+        # when the job is deleted
+        token_model.objects.filter(pk=getattr(instance, token_field), num_jobs__gt=0)\
+            .update(num_jobs=F('num_jobs') - 1)
+
+    m2m_changed.connect(jobs_added, sender=through, weak=False,
+                        dispatch_uid=f'{token_model._meta.label}.jobs_added')
+    post_delete.connect(job_removed, sender=through, weak=False,
+                        dispatch_uid=f'{token_model._meta.label}.job_removed')
+
+
+def count_jobs(token_model):
+    """Recompute `num_jobs` for all the tokens of a model
+
+    Used by migrations, or to fix the counters if they are out of sync.
+    """
+    for token in token_model.objects.all():
+        token_model.objects.filter(pk=token.pk).update(num_jobs=token.jobs.count())
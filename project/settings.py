@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -29,12 +30,26 @@ DEBUG = True
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 GIT_REPOS = os.environ.get('GIT_REPOS')
+# Disk budget for the Git mirrors in GIT_REPOS (0 for no limit)
+GIT_REPOS_MAX_SIZE_MB = int(os.environ.get('GIT_REPOS_MAX_SIZE_MB', 0))
 JOB_LOGS = os.environ.get('JOB_LOGS')
 SPDX_FILES = os.environ.get('SPDX_FILES')
+# Collect the sections of GitHub and GitLab raw data at the same time
+RAW_PARALLEL_SECTIONS = os.environ.get('RAW_PARALLEL_SECTIONS', False) in (True, 'True', 'true')
 
 ES_IN_HOST = os.environ.get('ELASTIC_HOST')
 ES_IN_PORT = os.environ.get('ELASTIC_PORT')
 ES_ADMIN_PASSWORD = os.environ.get('ELASTIC_PASS')
+# Items per Elasticsearch bulk write and scroll read, with overrides
+# per backend, e.g. BACKEND_BULK_SIZES='{"git": 1000}'
+BULK_SIZE = int(os.environ.get('BULK_SIZE', 100))
+SCROLL_SIZE = int(os.environ.get('SCROLL_SIZE', 100))
+BACKEND_BULK_SIZES = json.loads(os.environ.get('BACKEND_BULK_SIZES', '{}'))
+BACKEND_SCROLL_SIZES = json.loads(os.environ.get('BACKEND_SCROLL_SIZES', '{}'))
+# Raise the bulk size until Elasticsearch rejects writes or gets slower than the threshold
+ADAPTIVE_BULK_SIZE = os.environ.get('ADAPTIVE_BULK_SIZE', False) in (True, 'True', 'true')
+BULK_SIZE_MAX = int(os.environ.get('BULK_SIZE_MAX', 5000))
+BULK_LATENCY_THRESHOLD_MS = int(os.environ.get('BULK_LATENCY_THRESHOLD_MS', 1000))
 
 KIB_IN_HOST = os.environ.get('KIBANA_HOST')
 KIB_IN_PORT = os.environ.get('KIBANA_PORT')
@@ -45,6 +60,15 @@ SORTINGHAT_HOST = os.environ.get('SORTINGHAT_HOST')
 SORTINGHAT_DATABASE = os.environ.get('SORTINGHAT_DATABASE')
 SORTINGHAT_USER = os.environ.get('SORTINGHAT_USER')
 SORTINGHAT_PASSWORD = os.environ.get('SORTINGHAT_PASSWORD')
+# Identities refreshed at once, progress is saved after each chunk
+AUTOREFRESH_CHUNK_SIZE = int(os.environ.get('AUTOREFRESH_CHUNK_SIZE', 1000))
+# Find the identities to merge with SortingHat ('sortinghat') or Cauldron ('native'),
+# the rules used by the native engine, and its time limit in minutes (0 for no limit)
+MERGE_IDENTITIES_ENGINE = os.environ.get('MERGE_IDENTITIES_ENGINE', 'sortinghat')
+MERGE_IDENTITIES_RULES = os.environ.get('MERGE_IDENTITIES_RULES', 'email,local-part').split(',')
+MERGE_IDENTITIES_TIME_LIMIT = int(os.environ.get('MERGE_IDENTITIES_TIME_LIMIT', 0))
+# Hours since the last refresh of a repository before refreshing it again when replaying actions
+REFRESH_ACTIONS_MIN_AGE = int(os.environ.get('REFRESH_ACTIONS_MIN_AGE', 20))
 
 ALLOWED_HOSTS = []
 